@@ -0,0 +1,242 @@
+# --- analytics.py ---
+"""
+Logging activity across projects: entries per day and per week, streaks and
+gaps, and two PNG renderings (a calendar heatmap of all activity and a
+per-project weekly timeline).
+
+Reports are built from log_day_count, one row per project per active day,
+which triggers keep current on every log insert/update/delete, so nothing
+groups the log table itself. SQLite sums per day and per project; Python
+only walks each project's sorted active-day numbers for streaks and gaps.
+
+    python analytics.py [--workspace NAME] [--from DATE] [--to DATE] [--all] [--project ID ...]
+                        [--heatmap OUT.png] [--timeline OUT.png] [--json]
+"""
+
+import argparse
+import json
+from dataclasses import asdict, dataclass, field
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from PIL import Image, ImageDraw, ImageFont
+
+from db_controller import DatabaseManager
+from db_models import normalize_date
+
+DEFAULT_DAYS = 365
+JULIAN_DAY_OFFSET = 1721424  # int(julianday(d)) - d.toordinal()
+
+# Dark theme colours (see main.apply_dark_theme): empty cell, then four shades up to the orange accent
+BACKGROUND = "#1C1C1C"
+TEXT = "#FFFFFF"
+LEVEL_COLORS = ("#2E2E2E", "#5C3D00", "#8F5F00", "#C78400", "#FFA500")
+WEEKDAY_LABELS = ("Mon", "", "Wed", "", "Fri", "", "")
+
+
+@dataclass(slots=True)
+class ProjectActivity:
+    project_id: int
+    name: str
+    entries: int = 0
+    active_days: int = 0
+    first_day: Optional[str] = None
+    last_day: Optional[str] = None
+    current_streak: int = 0    # Active days in a row up to the report's end (or the day before)
+    longest_streak: int = 0
+    longest_gap: int = 0       # Most idle days between two active days
+    weekly: Dict[str, int] = field(default_factory=dict)  # Monday 'YYYY-MM-DD' -> entries (most active projects only)
+
+
+@dataclass(slots=True)
+class ActivityReport:
+    start: str
+    end: str
+    daily: List[int]                 # Entries per day, all projects, start..end inclusive
+    projects: List[ProjectActivity]  # Most entries first
+
+    @property
+    def total_entries(self) -> int:
+        return sum(self.daily)
+
+    def weekly_totals(self) -> List[Tuple[str, int]]:
+        """(Monday, entries) for every week touching the report range."""
+        first = date.fromisoformat(self.start)
+        totals: Dict[date, int] = {}
+        for offset, count in enumerate(self.daily):
+            day = first + timedelta(days=offset)
+            week = day - timedelta(days=day.weekday())
+            totals[week] = totals.get(week, 0) + count
+        return [(week.isoformat(), totals[week]) for week in sorted(totals)]
+
+    def rolling_mean(self, window: int = 7) -> List[float]:
+        """Mean entries per day over the trailing `window` days (shorter at the start of the range)."""
+        means, running = [], 0
+        for i, count in enumerate(self.daily):
+            running += count
+            if i >= window:
+                running -= self.daily[i - window]
+            means.append(running / min(i + 1, window))
+        return means
+
+
+def build_report(db: DatabaseManager, start: Optional[str] = None, end: Optional[str] = None,
+                 project_ids: Optional[List[int]] = None, weekly_for: int = 25) -> ActivityReport:
+    """
+    Activity between start and end (inclusive 'YYYY-MM-DD'). end defaults to today and start
+    to a year before it; pass start='' for everything since the first entry. Weekly counts are
+    filled in for the `weekly_for` most active projects (what render_timeline draws).
+    """
+    end_day = date.fromisoformat(end) if end else date.today()
+    if start is None:
+        start = (end_day - timedelta(days=DEFAULT_DAYS - 1)).isoformat()
+    with db.instrumentation.timer("analytics", "build_report"):
+        names = {p.id: p.name for p in db.get_projects_sorted()}
+        projects = []
+        end_number = end_day.toordinal() + JULIAN_DAY_OFFSET
+        for project_id, entries, active_days, first_day, last_day, day_numbers in db.get_activity_by_project(start or None, end_day.isoformat(), project_ids):
+            activity = ProjectActivity(project_id, names.get(project_id, f"Project {project_id}"), entries, active_days, first_day, last_day)
+            days = sorted(map(int, day_numbers.split(",")))
+            previous, streak = days[0], 1
+            for day in days[1:]:
+                if day == previous + 1:
+                    streak += 1
+                else:
+                    activity.longest_streak = max(activity.longest_streak, streak)
+                    activity.longest_gap = max(activity.longest_gap, day - previous - 1)
+                    streak = 1
+                previous = day
+            activity.longest_streak = max(activity.longest_streak, streak)
+            activity.current_streak = streak if previous >= end_number - 1 else 0
+            projects.append(activity)
+        projects.sort(key=lambda a: (-a.entries, a.project_id))
+
+        start_day = date.fromisoformat(start or min((a.first_day for a in projects), default=end_day.isoformat()))
+        daily = [0] * ((end_day - start_day).days + 1)
+        start_ordinal = start_day.toordinal()
+        for day, entries in db.get_activity_by_day(start_day.isoformat(), end_day.isoformat(), project_ids):
+            daily[date.fromisoformat(day).toordinal() - start_ordinal] = entries
+
+        top = {a.project_id: a for a in projects[:weekly_for]}
+        if top:
+            for project_id, monday, entries in db.get_activity_by_week(start_day.isoformat(), end_day.isoformat(), list(top)):
+                top[project_id].weekly[monday] = entries
+    return ActivityReport(start_day.isoformat(), end_day.isoformat(), daily, projects)
+
+
+# --- RENDERING ---
+
+def _level_bounds(counts) -> List[int]:
+    """Upper bounds of shades 1-3 (quartiles of the non-zero counts); anything above gets shade 4."""
+    values = sorted(c for c in counts if c > 0)
+    if not values:
+        return [0, 0, 0]
+    return [values[(len(values) - 1) * q // 4] for q in (1, 2, 3)]
+
+
+def _color(count: int, bounds: List[int]) -> str:
+    if count <= 0:
+        return LEVEL_COLORS[0]
+    for level, bound in enumerate(bounds, start=1):
+        if count <= bound:
+            return LEVEL_COLORS[level]
+    return LEVEL_COLORS[4]
+
+
+def render_heatmap(report: ActivityReport, path: Optional[str] = None, cell: int = 12) -> Image.Image:
+    """Calendar heatmap of all entries: one column per week, one row per weekday."""
+    font = ImageFont.load_default()
+    first = date.fromisoformat(report.start)
+    lead = first.weekday()  # Blank cells before the first day in its week
+    weeks = (lead + len(report.daily) + 6) // 7
+    left, top, step = 34, 18, cell + 2
+    image = Image.new("RGB", (left + weeks * step + 8, top + 7 * step + 8), BACKGROUND)
+    draw = ImageDraw.Draw(image)
+    for row, label in enumerate(WEEKDAY_LABELS):
+        if label:
+            draw.text((4, top + row * step), label, fill=TEXT, font=font)
+
+    bounds = _level_bounds(report.daily)
+    last_month = None
+    for offset, count in enumerate(report.daily):
+        column, row = divmod(lead + offset, 7)
+        x, y = left + column * step, top + row * step
+        draw.rectangle((x, y, x + cell - 1, y + cell - 1), fill=_color(count, bounds))
+        day = first + timedelta(days=offset)
+        if offset == 0 or (row == 0 and day.month != last_month):
+            draw.text((x, 2), day.strftime("%b"), fill=TEXT, font=font)
+            last_month = day.month
+    if path:
+        image.save(path)
+    return image
+
+
+def render_timeline(report: ActivityReport, path: Optional[str] = None, top: int = 25, cell: int = 10) -> Image.Image:
+    """Entries per week for the `top` most active projects, one row each."""
+    font = ImageFont.load_default()
+    weeks = [week for week, _count in report.weekly_totals()]
+    column_of = {week: i for i, week in enumerate(weeks)}
+    projects = report.projects[:top]
+    left, header, step = 170, 18, cell + 2
+    image = Image.new("RGB", (left + len(weeks) * step + 8, header + max(1, len(projects)) * step + 8), BACKGROUND)
+    draw = ImageDraw.Draw(image)
+
+    bounds = _level_bounds([count for a in projects for count in a.weekly.values()])
+    last_month = None
+    for i, week in enumerate(weeks):
+        month = week[:7]
+        if month != last_month:
+            draw.text((left + i * step, 2), date.fromisoformat(week).strftime("%b"), fill=TEXT, font=font)
+            last_month = month
+    for row, activity in enumerate(projects):
+        y = header + row * step
+        name = activity.name if len(activity.name) <= 26 else activity.name[:25] + "…"
+        draw.text((4, y - 1), name, fill=TEXT, font=font)
+        for i in range(len(weeks)):
+            x = left + i * step
+            draw.rectangle((x, y, x + cell - 1, y + cell - 1), fill=LEVEL_COLORS[0])
+        for week, count in activity.weekly.items():
+            if week in column_of:
+                x = left + column_of[week] * step
+                draw.rectangle((x, y, x + cell - 1, y + cell - 1), fill=_color(count, bounds))
+    if path:
+        image.save(path)
+    return image
+
+
+def main():
+    from workspaces import WorkspaceConfig
+
+    parser = argparse.ArgumentParser(description="Report logging activity across projects.")
+    parser.add_argument("--workspace", default=None, help="Workspace from proman.json (default: the active one)")
+    parser.add_argument("--from", dest="start", default=None, help=f"First day (default: {DEFAULT_DAYS} days before --to)")
+    parser.add_argument("--to", dest="end", default=None, help="Last day (default: today)")
+    parser.add_argument("--all", action="store_true", help="Everything since the first entry")
+    parser.add_argument("--project", type=int, action="append", help="Only these project ids (repeatable)")
+    parser.add_argument("--heatmap", help="Write the calendar heatmap PNG here")
+    parser.add_argument("--timeline", help="Write the per-project weekly timeline PNG here")
+    parser.add_argument("--json", action="store_true", help="Print the full report as JSON")
+    args = parser.parse_args()
+
+    db = DatabaseManager(db_path=WorkspaceConfig().get(args.workspace).db_path)
+    start = "" if args.all else (normalize_date(args.start) if args.start else None)
+    report = build_report(db, start, normalize_date(args.end) if args.end else None, args.project)
+    if args.heatmap:
+        render_heatmap(report, args.heatmap)
+    if args.timeline:
+        render_timeline(report, args.timeline)
+    if args.json:
+        print(json.dumps(asdict(report), indent=2))
+        return
+
+    active = sum(1 for count in report.daily if count)
+    print(f"{report.start} .. {report.end}: {report.total_entries} entries on {active} of {len(report.daily)} days")
+    print(f"{'entries':>8} {'days':>5} {'streak':>6} {'best':>5} {'gap':>5}  {'last':<10}  project")
+    for a in report.projects[:30]:
+        print(f"{a.entries:>8} {a.active_days:>5} {a.current_streak:>6} {a.longest_streak:>5} {a.longest_gap:>5}  {a.last_day:<10}  {a.name}")
+    if len(report.projects) > 30:
+        print(f"... {len(report.projects) - 30} more projects")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,510 @@
+# --- api_server.py ---
+"""
+Optional localhost HTTP/JSON API over ProjectManagementController, built on
+asyncio streams (standard library only).
+
+    python api_server.py [--workspace NAME] [--port 8765]
+
+or set "api_port" in proman.json (or PROMAN_API_PORT) to run it inside the GUI.
+
+    GET  /api/projects                   ?sort=&desc=&min_priority=&max_priority=&due_from=&due_to=&q=&limit=
+    GET  /api/projects/{id}
+    GET  /api/projects/{id}/dates
+    GET  /api/projects/{id}/logs         ?date=YYYY-MM-DD
+    POST /api/projects/{id}/logs         {"date": "YYYY-MM-DD", "content": "..."}
+    POST /api/logs                       {"project_ids": [1, 2], "date": "YYYY-MM-DD", "content": "..." | "template": "name"}
+    GET  /api/templates                  saved log templates
+    GET  /api/projects/{id}/attachments
+    GET  /api/attachments                ?q=&global=0|1&sort=&desc=&offset=&limit=
+    GET  /api/attachments/{id}/file      raw media bytes
+    GET  /api/search                     ?q=&project_id=&limit=
+    GET  /api/export                     ?project_id=1&project_id=2 (zip archive; everything without ids)
+    GET  /api/changes                    ?since=&limit=&entity= (change journal feed; no 'since' = current head)
+    GET  /api/activity                   ?from=&to=&all=1&project_id= (log activity: per-day totals, per-project streaks)
+
+Lists are streamed as chunked JSON, one database page at a time; media and
+archives stream from disk. Database calls run on a thread pool so requests are
+served concurrently (DatabaseManager opens a connection per call and its
+cache is thread-safe) and never block the event loop.
+
+Only loopback Host headers are accepted, and POSTs must be application/json,
+which keeps web pages in a local browser from driving the API.
+"""
+
+import argparse
+import asyncio
+import functools
+import json
+import mimetypes
+import os
+import re
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict
+from typing import Optional
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from db_controller import DatabaseManager, DatabaseBusyError
+from db_models import ProjectQuery, normalize_date
+from encryption import WorkspaceLockedError, media_size, open_media
+from pm_controller import ProjectManagementController
+
+DEFAULT_PORT = 8765
+MAX_BODY_BYTES = 1024 * 1024
+MAX_HEADER_BYTES = 16 * 1024
+STREAM_CHUNK = 256 * 1024
+LIST_PAGE = 500
+ALLOWED_HOSTS = {"127.0.0.1", "localhost", "[::1]"}
+
+STATUS_TEXT = {
+    200: "OK", 201: "Created", 400: "Bad Request", 403: "Forbidden", 404: "Not Found",
+    405: "Method Not Allowed", 413: "Payload Too Large", 415: "Unsupported Media Type",
+    431: "Request Header Fields Too Large", 500: "Internal Server Error", 503: "Service Unavailable",
+}
+
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class Request:
+    def __init__(self, method, path, query, headers, body):
+        self.method = method
+        self.path = path
+        self.query = query
+        self.headers = headers
+        self.body = body
+
+    def arg(self, name, default=None, cast=str):
+        values = self.query.get(name)
+        if not values or values[0] == "":
+            return default
+        try:
+            return cast(values[0])
+        except ValueError:
+            raise HttpError(400, f"Invalid value for '{name}': {values[0]!r}")
+
+    def json(self) -> dict:
+        try:
+            payload = json.loads(self.body or b"{}")
+        except ValueError as e:
+            raise HttpError(400, f"Invalid JSON body: {e}")
+        if not isinstance(payload, dict):
+            raise HttpError(400, "JSON body must be an object")
+        return payload
+
+
+def _flag(value: str) -> bool:
+    if value.lower() in ("1", "true", "yes"):
+        return True
+    if value.lower() in ("0", "false", "no"):
+        return False
+    raise ValueError(value)
+
+
+def _hostname(host_header: str) -> str:
+    """'localhost:8765' -> 'localhost', '[::1]:8765' -> '[::1]'."""
+    if host_header.startswith("["):
+        return host_header.split("]", 1)[0] + "]"
+    return host_header.rsplit(":", 1)[0]
+
+
+def _attachment_json(attachment) -> dict:
+    data = asdict(attachment)
+    data["file_url"] = f"/api/attachments/{attachment.id}/file"
+    return data
+
+
+class ApiServer:
+    def __init__(self, controller: ProjectManagementController, host: str = "127.0.0.1", port: int = DEFAULT_PORT, workers: int = 8):
+        self.controller = controller
+        self.host = host
+        self.port = port
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="proman-api")
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.server = None
+        self.thread = None
+        self.routes = [
+            ("GET", r"/api/projects", self.list_projects),
+            ("GET", r"/api/projects/(\d+)", self.get_project),
+            ("GET", r"/api/projects/(\d+)/dates", self.get_dates),
+            ("GET", r"/api/projects/(\d+)/logs", self.get_logs),
+            ("POST", r"/api/projects/(\d+)/logs", self.add_log),
+            ("POST", r"/api/logs", self.add_logs),
+            ("GET", r"/api/templates", self.list_templates),
+            ("GET", r"/api/projects/(\d+)/attachments", self.get_project_attachments),
+            ("GET", r"/api/attachments", self.list_attachments),
+            ("GET", r"/api/attachments/(\d+)/file", self.get_attachment_file),
+            ("GET", r"/api/search", self.search),
+            ("GET", r"/api/export", self.export),
+            ("GET", r"/api/changes", self.changes),
+            ("GET", r"/api/activity", self.activity),
+        ]
+        self.routes = [(method, re.compile(pattern + "$"), pattern, handler) for method, pattern, handler in self.routes]
+
+    # --- LIFECYCLE ---
+
+    async def serve_forever(self):
+        self.server = await asyncio.start_server(self._handle_connection, self.host, self.port, limit=MAX_HEADER_BYTES)
+        self.port = self.server.sockets[0].getsockname()[1]
+        print(f"ProMan API listening on http://{self.host}:{self.port}/api/")
+        async with self.server:
+            await self.server.serve_forever()
+
+    def start_in_thread(self) -> int:
+        """Runs the server on its own event loop in a daemon thread; returns the bound port."""
+        ready = threading.Event()
+        errors = []
+
+        def run():
+            self.loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self.loop)
+            try:
+                self.server = self.loop.run_until_complete(
+                    asyncio.start_server(self._handle_connection, self.host, self.port, limit=MAX_HEADER_BYTES)
+                )
+            except OSError as e:
+                errors.append(e)
+                ready.set()
+                return
+            self.port = self.server.sockets[0].getsockname()[1]
+            ready.set()
+            self.loop.run_forever()
+            # Stopped: refuse new connections, cancel open keep-alive ones and let them unwind
+            self.server.close()
+            pending = asyncio.all_tasks(self.loop)
+            for task in pending:
+                task.cancel()
+            self.loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+            self.loop.close()
+
+        self.thread = threading.Thread(target=run, name="proman-api", daemon=True)
+        self.thread.start()
+        ready.wait()
+        if errors:
+            raise errors[0]
+        print(f"ProMan API listening on http://{self.host}:{self.port}/api/")
+        return self.port
+
+    def stop(self):
+        if self.loop is not None and self.loop.is_running():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join(timeout=5)
+        self.executor.shutdown(wait=False)
+
+    # --- HTTP PLUMBING ---
+
+    async def _run(self, fn, *args, **kwargs):
+        """Runs blocking controller/DB work on the pool."""
+        return await asyncio.get_running_loop().run_in_executor(self.executor, functools.partial(fn, *args, **kwargs))
+
+    async def _read_request(self, reader) -> Optional[Request]:
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.IncompleteReadError:
+            return None  # Client closed the (keep-alive) connection
+        except asyncio.LimitOverrunError:
+            raise HttpError(431, "Request headers too large")
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, _version = lines[0].split(" ", 2)
+        except ValueError:
+            raise HttpError(400, "Malformed request line")
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                key, value = line.split(":", 1)
+                headers[key.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get("content-length", 0) or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            raise HttpError(400, f"Invalid Content-Length: {headers['content-length']!r}")
+        if length > MAX_BODY_BYTES:
+            raise HttpError(413, "Request body too large")
+        body = await reader.readexactly(length) if length else b""
+        url = urlsplit(target)
+        return Request(method.upper(), unquote(url.path).rstrip("/") or "/", parse_qs(url.query), headers, body)
+
+    def _head(self, status: int, headers: dict) -> bytes:
+        lines = [f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}"]
+        lines += [f"{key}: {value}" for key, value in headers.items()]
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+    async def _send_json(self, writer, payload, status: int = 200):
+        body = json.dumps(payload).encode("utf-8")
+        writer.write(self._head(status, {"Content-Type": "application/json", "Content-Length": len(body)}) + body)
+        await writer.drain()
+
+    async def _stream_json_array(self, writer, pages):
+        """Writes an async iterator of lists as one chunked JSON array, a page at a time."""
+        writer.write(self._head(200, {"Content-Type": "application/json", "Transfer-Encoding": "chunked"}))
+        first = True
+        async for page in pages:
+            if not page:
+                continue
+            chunk = ("[" if first else ",") + ",".join(json.dumps(item) for item in page)
+            first = False
+            data = chunk.encode("utf-8")
+            writer.write(b"%x\r\n%s\r\n" % (len(data), data))
+            await writer.drain()  # Back-pressure: never buffer more than a page for a slow client
+        tail = b"[]" if first else b"]"
+        writer.write(b"%x\r\n%s\r\n0\r\n\r\n" % (len(tail), tail))
+        await writer.drain()
+
+    async def _send_file(self, writer, path: str, content_type: str, download_name: Optional[str] = None):
+        # Media of encrypted workspaces is decrypted chunk by chunk on the way out
+        headers = {"Content-Type": content_type, "Content-Length": media_size(path)}
+        if download_name:
+            headers["Content-Disposition"] = f'attachment; filename="{download_name}"'
+        with open_media(path, self.controller.db_controller.cipher) as f:  # Fails (locked workspace) before the head goes out
+            writer.write(self._head(200, headers))
+            while True:
+                chunk = await self._run(f.read, STREAM_CHUNK)
+                if not chunk:
+                    break
+                writer.write(chunk)
+                await writer.drain()
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            while True:
+                keep_alive = False  # Errors while reading the request close the connection
+                try:
+                    request = await self._read_request(reader)
+                    if request is None:
+                        break
+                    keep_alive = request.headers.get("connection", "").lower() != "close"
+                    await self._dispatch(request, writer)
+                except HttpError as e:
+                    # Handlers only raise HttpError before they start writing a response
+                    await self._send_json(writer, {"error": str(e)}, e.status)
+                except (DatabaseBusyError, WorkspaceLockedError) as e:
+                    await self._send_json(writer, {"error": str(e)}, 503)
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    break
+                except Exception as e:
+                    print(f"API error: {e!r}")
+                    self.controller.instrumentation.record_error("api", repr(e))
+                    # If the response already began there is no clean way to report it; drop the connection
+                    break
+                if not keep_alive:
+                    break
+        finally:
+            writer.close()
+
+    async def _dispatch(self, request: Request, writer):
+        if _hostname(request.headers.get("host", "")) not in ALLOWED_HOSTS:
+            raise HttpError(403, "Only localhost clients are accepted")
+
+        path_matched = False
+        for method, regex, pattern, handler in self.routes:
+            match = regex.match(request.path)
+            if not match:
+                continue
+            path_matched = True
+            if method != request.method:
+                continue
+            if method == "POST" and not request.headers.get("content-type", "").startswith("application/json"):
+                raise HttpError(415, "POST bodies must be application/json")
+
+            db = self.controller.db_controller
+            if db.cache is not None:
+                await self._run(db.poll_external_changes)  # The GUI may have written since the last request
+            start = time.perf_counter()
+            await handler(request, writer, *(int(g) for g in match.groups()))
+            self.controller.instrumentation.record("api", f"{method} {pattern}", (time.perf_counter() - start) * 1000)
+            return
+        raise HttpError(405 if path_matched else 404, f"No route for {request.method} {request.path}")
+
+    # --- HANDLERS ---
+
+    async def _require_project(self, pid):
+        project = await self._run(self.controller.get_project, pid)
+        if project is None:
+            raise HttpError(404, f"Project {pid} not found")
+        return project
+
+    async def list_projects(self, request, writer):
+        query = ProjectQuery(
+            sort_by=request.arg("sort", "priority"),
+            descending=request.arg("desc", True, _flag),
+            min_priority=request.arg("min_priority", None, int),
+            max_priority=request.arg("max_priority", None, int),
+            due_from=request.arg("due_from"),
+            due_to=request.arg("due_to"),
+            text=request.arg("q"),
+            limit=request.arg("limit", None, int),
+        )
+        try:
+            projects = await self._run(self.controller.get_projects_filtered, query)
+        except ValueError as e:
+            raise HttpError(400, str(e))
+
+        async def pages():
+            for start in range(0, len(projects), LIST_PAGE):
+                yield [asdict(p) for p in projects[start:start + LIST_PAGE]]
+        await self._stream_json_array(writer, pages())
+
+    async def get_project(self, request, writer, pid):
+        await self._send_json(writer, asdict(await self._require_project(pid)))
+
+    async def get_dates(self, request, writer, pid):
+        await self._require_project(pid)
+        await self._send_json(writer, await self._run(self.controller.get_dates_for_project, pid))
+
+    async def get_logs(self, request, writer, pid):
+        date = request.arg("date")
+        if date is None:
+            raise HttpError(400, "Missing 'date' (YYYY-MM-DD)")
+        logs = await self._run(self.controller.get_logs_for_project_date, pid, date)
+        await self._send_json(writer, [asdict(log) for log in logs])
+
+    async def add_log(self, request, writer, pid):
+        payload = request.json()
+        content = payload.get("content")
+        if not isinstance(content, str) or not content.strip():
+            raise HttpError(400, "'content' must be a non-empty string")
+        await self._require_project(pid)
+        date = payload.get("date") or time.strftime("%Y-%m-%d")
+        try:
+            await self._run(self.controller.add_log_entry, pid, date, content)
+        except ValueError as e:
+            raise HttpError(400, str(e))
+        await self._send_json(writer, {"project_id": pid, "date": date}, 201)
+
+    async def add_logs(self, request, writer):
+        """One entry for many projects in one commit; {date}, {weekday} and {project} are filled per project."""
+        payload = request.json()
+        project_ids = payload.get("project_ids")
+        if not isinstance(project_ids, list) or not project_ids or not all(isinstance(pid, int) for pid in project_ids):
+            raise HttpError(400, "'project_ids' must be a non-empty list of integers")
+        content = payload.get("content")
+        if payload.get("template") is not None:
+            templates = {t.name: t for t in await self._run(self.controller.get_log_templates)}
+            if payload["template"] not in templates:
+                raise HttpError(404, f"No template named {payload['template']!r}")
+            content = templates[payload["template"]].content
+        if not isinstance(content, str) or not content.strip():
+            raise HttpError(400, "'content' must be a non-empty string (or name a 'template')")
+        date = payload.get("date") or time.strftime("%Y-%m-%d")
+        try:
+            added = await self._run(self.controller.add_log_entries, project_ids, date, content)
+        except ValueError as e:
+            raise HttpError(400, str(e))
+        await self._send_json(writer, {"added": added, "date": date}, 201)
+
+    async def list_templates(self, request, writer):
+        await self._send_json(writer, [asdict(t) for t in await self._run(self.controller.get_log_templates)])
+
+    async def get_project_attachments(self, request, writer, pid):
+        await self._require_project(pid)
+        attachments = await self._run(self.controller.get_attachments_for_project, pid)
+        await self._send_json(writer, [_attachment_json(a) for a in attachments])
+
+    async def list_attachments(self, request, writer):
+        text, is_global = request.arg("q"), request.arg("global", None, _flag)
+        sort_by, descending = request.arg("sort", "id"), request.arg("desc", False, _flag)
+        offset, limit = request.arg("offset", 0, int), request.arg("limit", None, int)
+        try:
+            first = await self._run(self.controller.get_attachments_page, offset, min(LIST_PAGE, limit or LIST_PAGE), sort_by, descending, text, is_global)
+        except ValueError as e:
+            raise HttpError(400, str(e))
+
+        async def pages():
+            page, sent = first, 0
+            while page:
+                yield [_attachment_json(a) for a in page]
+                sent += len(page)
+                remaining = LIST_PAGE if limit is None else min(LIST_PAGE, limit - sent)
+                if len(page) < LIST_PAGE or remaining <= 0:
+                    return
+                page = await self._run(self.controller.get_attachments_page, offset + sent, remaining, sort_by, descending, text, is_global)
+        await self._stream_json_array(writer, pages())
+
+    async def get_attachment_file(self, request, writer, att_id):
+        attachment = await self._run(self.controller.get_attachment, att_id)
+        if attachment is None or not os.path.exists(attachment.file_path):
+            raise HttpError(404, f"Attachment {att_id} not found")
+        content_type = mimetypes.guess_type(attachment.file_path)[0] or "application/octet-stream"
+        await self._send_file(writer, attachment.file_path, content_type)
+
+    async def search(self, request, writer):
+        text = request.arg("q")
+        if not text:
+            raise HttpError(400, "Missing 'q'")
+        limit = request.arg("limit", 100, int)
+        pid = request.arg("project_id", None, int)
+        projects = await self._run(self.controller.get_projects_filtered, ProjectQuery(text=text, limit=limit))
+        logs = await self._run(self.controller.search_logs, text, pid, limit)
+        await self._send_json(writer, {"projects": [asdict(p) for p in projects], "logs": [asdict(log) for log in logs]})
+
+    async def export(self, request, writer):
+        try:
+            project_ids = [int(v) for v in request.query.get("project_id", [])] or None
+        except ValueError:
+            raise HttpError(400, "project_id must be an integer")
+        fd, path = tempfile.mkstemp(prefix="proman_api_export_", suffix=".zip")
+        os.close(fd)
+        try:
+            await self._run(self.controller.export_archive, path, project_ids)
+            await self._send_file(writer, path, "application/zip", "proman-export.zip")
+        finally:
+            os.remove(path)
+
+    async def changes(self, request, writer):
+        since = request.arg("since", None, int)
+        if since is None:
+            # A fresh consumer gets the head to start from after reading the data it needs
+            await self._send_json(writer, {"changes": [], "next": await self._run(self.controller.get_journal_head)})
+            return
+        limit = min(request.arg("limit", 1000, int), 10_000)
+        entities = request.query.get("entity") or None
+        changes, cursor = await self._run(self.controller.get_changes_since, since, limit, entities)
+        await self._send_json(writer, {"changes": [asdict(c) for c in changes], "next": cursor})
+
+    async def activity(self, request, writer):
+        start = "" if request.arg("all", False, _flag) else request.arg("from", None, normalize_date)
+        end = request.arg("to", None, normalize_date)
+        try:
+            project_ids = [int(v) for v in request.query.get("project_id", [])] or None
+        except ValueError:
+            raise HttpError(400, "project_id must be an integer")
+        report = await self._run(self.controller.get_activity_report, start, end, project_ids)
+        await self._send_json(writer, asdict(report))
+
+
+def create_server(db_path: str, media_dir: str, port: int = DEFAULT_PORT, cache_size: int = 256,
+                  instrumentation=None, workers: int = 8) -> ApiServer:
+    """
+    An ApiServer with its own DatabaseManager. Its writes then look like another process
+    to the GUI's change polling, so open windows refresh when the API appends logs.
+    """
+    db = DatabaseManager(db_path=db_path, cache_size=cache_size, instrumentation=instrumentation)
+    return ApiServer(ProjectManagementController(db, media_dir=media_dir), port=port, workers=workers)
+
+
+def main():
+    from workspaces import WorkspaceConfig
+
+    parser = argparse.ArgumentParser(description="Serve the ProMan JSON API on localhost.")
+    parser.add_argument("--workspace", default=None, help="Workspace from proman.json (default: the active one)")
+    parser.add_argument("--port", type=int, default=None, help=f"Port (default: api_port from the config, else {DEFAULT_PORT})")
+    args = parser.parse_args()
+
+    config = WorkspaceConfig()
+    workspace = config.get(args.workspace)
+    server = create_server(workspace.db_path, workspace.media_dir, args.port or config.api_port or DEFAULT_PORT)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# --- attachment_metadata.py ---
+"""
+Descriptive attachment columns: the source file name, the stored image's
+upright size, the EXIF capture time and the stored file size. Ingest fills
+them while the source is open; attachments from before that (or synced
+from an older peer) get size and dimensions from a parallel backfill that
+only reads file headers, never pixels. The original name cannot be
+recovered from the stored PNG, so it stays empty for those.
+
+    python attachment_metadata.py [--workspace NAME] [--workers N]
+"""
+
+import argparse
+import re
+from typing import Callable, Optional
+
+from PIL import Image
+
+from backfill import run_backfill, run_from_command_line
+from db_controller import DatabaseManager
+from encryption import media_size, open_media
+
+DEFAULT_WORKERS = 8  # Header reads wait on the disk, not the CPU
+
+EXIF_IFD_POINTER = 0x8769
+EXIF_DATETIME_ORIGINAL = 0x9003
+EXIF_DATETIME = 0x0132  # Last modified; only used when the capture time is missing
+EXIF_DATE_PATTERN = re.compile(r"(\d{4}):(\d{2}):(\d{2})[ T](\d{2}):(\d{2}):(\d{2})")
+
+
+def format_byte_size(size: Optional[int]) -> str:
+    if size is None:
+        return ""
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+def taken_at(img: Image.Image) -> Optional[str]:
+    """EXIF capture time as 'YYYY-MM-DDTHH:MM:SS', or None (no EXIF, or the camera wrote zeros)."""
+    try:
+        exif = img.getexif()
+        value = exif.get_ifd(EXIF_IFD_POINTER).get(EXIF_DATETIME_ORIGINAL) or exif.get(EXIF_DATETIME)
+    except Exception:
+        return None
+    match = EXIF_DATE_PATTERN.match(str(value or "").strip())
+    if not match or match.group(1) == "0000":
+        return None
+    year, month, day, hour, minute, second = match.groups()
+    return f"{year}-{month}-{day}T{hour}:{minute}:{second}"
+
+
+def read_file_metadata(path: str, cipher=None) -> dict:
+    """Backfill values for a stored file (header and stat only; thread-safe)."""
+    # Stored files are written upright by ingest, so the header size is the displayed size
+    with open_media(path, cipher) as f, Image.open(f) as img:
+        width, height = img.size
+        # Pillow decodes a whole PNG looking for an eXIf chunk after the pixels; ingest never writes one
+        captured = taken_at(img) if img.format != "PNG" or "exif" in img.info else None
+        return {"width": width, "height": height, "taken_at": captured, "byte_size": media_size(path)}
+
+
+def backfill_metadata(db: DatabaseManager, workers: int = DEFAULT_WORKERS,
+                      progress: Optional[Callable[[int, int], None]] = None) -> dict:
+    """
+    Fills size and dimensions (and the EXIF date when the file has one) for attachments
+    without them, reading only headers (see backfill.run_backfill).
+    """
+    return run_backfill(db, "metadata", db.get_attachments_without_metadata(), lambda path: read_file_metadata(path, db.cipher),
+                        db.save_attachment_metadata, workers, progress)
+
+
+def main():
+    from workspaces import WorkspaceConfig
+
+    parser = argparse.ArgumentParser(description="Fill size, dimensions and EXIF date of older attachments.")
+    parser.add_argument("--workspace", default=None, help="Workspace from proman.json (default: the active one)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    args = parser.parse_args()
+
+    db = DatabaseManager(db_path=WorkspaceConfig().get(args.workspace).db_path)
+    run_from_command_line(backfill_metadata, "Filled", db=db, workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
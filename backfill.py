@@ -0,0 +1,57 @@
+# --- backfill.py ---
+"""
+Shared loop of the attachment backfills (perceptual hashes in image_hash,
+size and dimensions in attachment_metadata): files are read on a thread pool
+(decoding and disk reads release the GIL) and results are written in
+batches from the calling thread, so the database sees one writer.
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Tuple
+
+from db_controller import DatabaseManager
+
+BACKFILL_BATCH = 500
+
+
+def run_backfill(db: DatabaseManager, name: str, pending: List[Tuple[int, str]], read: Callable[[str], object],
+                 save: Callable[[list], None], workers: int, progress: Optional[Callable[[int, int], None]] = None,
+                 batch_size: int = BACKFILL_BATCH) -> dict:
+    """
+    Calls read(path) for each (attachment_id, path) in pending on `workers` threads and
+    save(batch) with (attachment_id, result) pairs every batch_size results. Missing or
+    unreadable files are recorded as errors and skipped. Returns {"saved", "failed", "total"}.
+    """
+    summary = {"saved": 0, "failed": 0, "total": len(pending)}
+
+    def work(item):
+        attachment_id, path = item
+        try:
+            return attachment_id, read(path), None
+        except Exception as e:
+            return attachment_id, None, f"{e} | {path}"
+
+    batch = []
+    with db.instrumentation.timer("image", f"backfill_{name}"), ThreadPoolExecutor(max_workers=workers) as pool:
+        for done, (attachment_id, result, error) in enumerate(pool.map(work, pending), start=1):
+            if error is not None:
+                summary["failed"] += 1
+                db.instrumentation.record_error("image", f"{name}: {error}")
+            else:
+                batch.append((attachment_id, result))
+            if batch and (len(batch) >= batch_size or done == len(pending)):
+                save(batch)
+                summary["saved"] += len(batch)
+                batch = []
+            if progress:
+                progress(done, len(pending))
+    return summary
+
+
+def run_from_command_line(backfill: Callable[..., dict], verb: str, **kwargs) -> dict:
+    """Runs backfill(progress=...) with a done/total counter on stdout and prints the summary."""
+    start = time.perf_counter()
+    summary = backfill(progress=lambda done, total: print(f"\r{done}/{total}", end="", flush=True), **kwargs)
+    print(f"\n{verb} {summary['saved']} of {summary['total']} ({summary['failed']} failed) in {time.perf_counter() - start:.1f}s")
+    return summary
@@ -0,0 +1,146 @@
+# --- benchmarks/api_load_test.py ---
+"""
+Load test for the local JSON API: starts api_server on a synthetic workspace
+(or targets a running server with --url) and hammers it with concurrent
+keep-alive clients, reporting requests/sec and latency percentiles per endpoint.
+
+Run from the repository root:
+    python benchmarks/api_load_test.py [--clients 32] [--seconds 10] [--projects 2000]
+    python benchmarks/api_load_test.py --url http://127.0.0.1:8765 --seconds 10
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api_server import create_server
+from benchmarks.data_generator import generate_workspace
+
+# (weight, name, path template); {pid}/{aid} are filled per request
+MIX = [
+    (30, "project list", "/api/projects?limit=50"),
+    (20, "project", "/api/projects/{pid}"),
+    (15, "dates", "/api/projects/{pid}/dates"),
+    (15, "attachments", "/api/projects/{pid}/attachments"),
+    (10, "search", "/api/search?q=kepler&limit=20"),
+    (5, "attachment page", "/api/attachments?limit=200&offset={aid}"),
+    (5, "media", "/api/attachments/{aid}/file"),
+]
+WRITE = (0, "append log", "/api/projects/{pid}/logs")
+
+
+async def read_response(reader) -> int:
+    """Reads one response (Content-Length or chunked); returns the status code."""
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    status = int(lines[0].split(" ")[1])
+    headers = {k.strip().lower(): v.strip() for k, v in (line.split(":", 1) for line in lines[1:] if ":" in line)}
+    if headers.get("transfer-encoding") == "chunked":
+        while True:
+            size = int((await reader.readline()).strip(), 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    else:
+        await reader.readexactly(int(headers.get("content-length", 0)))
+    return status
+
+
+async def client(host, port, deadline, project_ids, attachment_ids, write_ratio, results, rng):
+    reader, writer = await asyncio.open_connection(host, port)
+    weights = [w for w, _, _ in MIX]
+    try:
+        while time.perf_counter() < deadline:
+            if rng.random() < write_ratio:
+                _w, name, template = WRITE
+                body = json.dumps({"content": "load test entry"}).encode()
+                request = (f"POST {template.format(pid=rng.choice(project_ids))} HTTP/1.1\r\nHost: localhost\r\n"
+                           f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n").encode() + body
+            else:
+                _w, name, template = rng.choices(MIX, weights)[0]
+                path = template.format(pid=rng.choice(project_ids), aid=rng.choice(attachment_ids))
+                request = f"GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode()
+            start = time.perf_counter()
+            writer.write(request)
+            await writer.drain()
+            status = await read_response(reader)
+            results.setdefault(name, []).append(((time.perf_counter() - start) * 1000, status))
+    finally:
+        writer.close()
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+async def run_load(host, port, clients, seconds, project_ids, attachment_ids, write_ratio, seed):
+    results = {}
+    deadline = time.perf_counter() + seconds
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        client(host, port, deadline, project_ids, attachment_ids, write_ratio, results, random.Random(seed + i))
+        for i in range(clients)
+    ))
+    return results, time.perf_counter() - started
+
+
+def report(results, elapsed, clients):
+    total = sum(len(v) for v in results.values())
+    errors = sum(1 for v in results.values() for _ms, status in v if status >= 400)
+    print(f"\n{total} requests in {elapsed:.1f}s with {clients} clients: {total / elapsed:,.0f} req/s, {errors} errors")
+    print(f"{'endpoint':>16} {'count':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for name, samples in sorted(results.items(), key=lambda item: -len(item[1])):
+        latencies = sorted(ms for ms, _status in samples)
+        print(f"{name:>16} {len(samples):>7} {len(samples) / elapsed:>8.0f} {statistics.median(latencies):>8.2f} "
+              f"{percentile(latencies, 0.95):>8.2f} {percentile(latencies, 0.99):>8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the ProMan JSON API.")
+    parser.add_argument("--url", default=None, help="Target a running server instead of starting one")
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--projects", type=int, default=2000)
+    parser.add_argument("--attachments", type=int, default=2000)
+    parser.add_argument("--write-ratio", type=float, default=0.02, help="Fraction of requests that append a log")
+    parser.add_argument("--workers", type=int, default=8, help="Server thread pool size")
+    parser.add_argument("--cache-size", type=int, default=256)
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args()
+
+    server = None
+    if args.url:
+        target = urlsplit(args.url)
+        host, port = target.hostname, target.port
+        project_ids = list(range(1, args.projects + 1))
+        attachment_ids = list(range(1, args.attachments + 1))
+    else:
+        workdir = tempfile.mkdtemp(prefix="proman_api_load_")
+        print(f"Generating workspace in {workdir} ...")
+        db_path = generate_workspace(workdir, projects=args.projects, logs_per_project=10,
+                                     attachments=args.attachments, image_size=(160, 120), seed=args.seed)
+        server = create_server(db_path, os.path.join(workdir, "media"), port=0, cache_size=args.cache_size, workers=args.workers)
+        host, port = "127.0.0.1", server.start_in_thread()
+        project_ids = list(range(1, args.projects + 1))
+        attachment_ids = list(range(1, args.attachments + 1))
+
+    try:
+        results, elapsed = asyncio.run(run_load(host, port, args.clients, args.seconds, project_ids,
+                                                attachment_ids, args.write_ratio, args.seed))
+        report(results, elapsed, args.clients)
+    finally:
+        if server is not None:
+            server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# --- benchmarks/bench_analytics.py ---
+"""
+Activity report cost on a synthetic workspace with years of logs: the report
+built from the trigger-maintained log_day_count table vs. grouping the log
+table directly, plus the time to render both PNGs.
+
+Run from the repository root:
+    python benchmarks/bench_analytics.py [--projects 2000] [--logs 300] [--repeat 5]
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.data_generator import generate_workspace
+from db_controller import DatabaseManager
+import analytics
+
+
+def best_of(repeat: int, fn) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark activity reports over years of logs.")
+    parser.add_argument("--projects", type=int, default=2000)
+    parser.add_argument("--logs", type=int, default=300, help="Log entries per project")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="proman_analytics_bench_")
+    try:
+        print(f"Generating {args.projects} projects x {args.logs} logs in {workdir} ...")
+        db_path = generate_workspace(workdir, args.projects, args.logs, attachments=0, seed=args.seed)
+        # The generator bulk-inserts through plain sqlite3, so the triggers already kept the summary current
+        db = DatabaseManager(db_path)
+        logs = db._execute_query("SELECT COUNT(*) FROM log", row_factory=None, use_cache=False)[0][0]
+        summary_rows = db._execute_query("SELECT COUNT(*) FROM log_day_count", row_factory=None, use_cache=False)[0][0]
+        span = db._execute_query("SELECT MIN(day), MAX(day) FROM log_day_count", row_factory=None, use_cache=False)[0]
+        print(f"{logs} logs, {summary_rows} project-days, {span[0]} .. {span[1]}\n")
+
+        def grouped_log_scan():
+            return db._execute_query("SELECT project_id, timestamp, COUNT(*) FROM log GROUP BY project_id, timestamp",
+                                     row_factory=None, use_cache=False)
+
+        full = analytics.build_report(db, start="", end=span[1])
+        year = analytics.build_report(db, end=span[1])
+        scenarios = [
+            ("GROUP BY over log (baseline)", grouped_log_scan),
+            ("report, all time", lambda: analytics.build_report(db, start="", end=span[1])),
+            ("report, last year", lambda: analytics.build_report(db, end=span[1])),
+            ("render heatmap, all time", lambda: analytics.render_heatmap(full)),
+            ("render timeline, last year", lambda: analytics.render_timeline(year)),
+        ]
+        print(f"{'scenario':<30} {'best ms':>9}")
+        for label, fn in scenarios:
+            print(f"{label:<30} {best_of(args.repeat, fn):>9.1f}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+# --- benchmarks/bench_attachment_metadata.py ---
+"""
+Attachment metadata cost: backfill throughput over real generated images
+(header-only reads, 1 worker vs. several, against a full decode as the
+"open every file" baseline), then search and sort latency over a large
+table of synthetic attachments through the indexed columns.
+
+Run from the repository root:
+    python benchmarks/bench_attachment_metadata.py [--images 1000] [--workers 8] [--rows 100000]
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+
+from benchmarks.data_generator import generate_workspace
+from db_controller import DatabaseManager
+from attachment_metadata import backfill_metadata
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, (time.perf_counter() - start) * 1000
+
+
+def full_decode(db: DatabaseManager):
+    for _, path in db.get_attachments_without_metadata():
+        with Image.open(path) as img:
+            img.load()
+
+
+def synthetic_rows(db: DatabaseManager, count: int, rng: random.Random):
+    words = ["screenshot", "diagram", "photo", "scan", "mockup", "whiteboard", "receipt", "sketch"]
+    rows = []
+    for i in range(1, count + 1):
+        taken = f"20{rng.randint(15, 25):02d}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T12:00:00" if rng.random() < 0.6 else None
+        rows.append((i, f"/synthetic/ref_{i}.png", f"{rng.choice(words)} {i}.jpg", rng.randint(200, 6000), rng.randint(200, 4000),
+                     taken, rng.randint(10_000, 20_000_000)))
+    with db.connect() as conn:
+        conn.executemany("INSERT INTO attachment (attachment_id, file_path, original_name, width, height, taken_at, byte_size) "
+                         "VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+    return len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark attachment metadata backfill, search and sort.")
+    parser.add_argument("--images", type=int, default=1000, help="Real images for the backfill part")
+    parser.add_argument("--workers", type=int, default=8, help="Compared against 1 worker")
+    parser.add_argument("--rows", type=int, default=100_000, help="Synthetic attachments for the query part")
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="proman_metadata_bench_")
+    try:
+        print(f"Generating {args.images} images in {workdir} ...")
+        db = DatabaseManager(generate_workspace(os.path.join(workdir, "images"), 50, 1, args.images, image_size=(1280, 800), seed=args.seed))
+        _, ms = timed(lambda: full_decode(db))
+        print(f"full decode of every file (baseline): {ms / 1000:.2f}s")
+        for workers in sorted({1, args.workers}):
+            db._execute_sql("UPDATE attachment SET width = NULL, height = NULL, byte_size = NULL")
+            summary, ms = timed(lambda: backfill_metadata(db, workers))
+            print(f"backfill, {workers} worker(s): {summary['saved']} files in {ms / 1000:.2f}s ({summary['saved'] / (ms / 1000):.0f} files/s)")
+
+        rng = random.Random(args.seed)
+        db = DatabaseManager(os.path.join(workdir, "rows.db"))
+        count, ms = timed(lambda: synthetic_rows(db, args.rows, rng))
+        print(f"\n{count} synthetic attachments inserted in {ms / 1000:.1f}s")
+        print(f"{'query (first page of 500)':<36} {'avg ms':>8} {'max ms':>8}")
+        scenarios = [(f"sort by {key}", key, None) for key in ("original_name", "taken_at", "size", "dimensions")]
+        scenarios += [("search 'whiteboard', by size", "size", "whiteboard"), ("search '2021-06', by date", "taken_at", "2021-06")]
+        for label, sort_by, text in scenarios:
+            times = []
+            for i in range(args.queries):
+                _, ms = timed(lambda: db.get_attachments_page(0, 500, sort_by, i % 2 == 1, text))
+                times.append(ms)
+            print(f"{label:<36} {sum(times) / len(times):>8.2f} {max(times):>8.2f}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
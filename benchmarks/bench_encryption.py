@@ -0,0 +1,175 @@
+# --- benchmarks/bench_encryption.py ---
+"""
+Cost of encryption at rest (see encryption.py): image ingest (reference and
+thumbnail), display (media pane previews and Tk thumbnails), log reads
+with a cold and a warm plaintext cache, and log search, each in a plain and
+an encrypted workspace. Every timing is the best of --repeats runs, plain and
+encrypted interleaved so drift hits both alike.
+
+Exits with status 1 when ingest or display is slower than plain by more than
+--budget percent (default 10).
+
+Run from the repository root:
+    python benchmarks/bench_encryption.py [--images 40] [--projects 300] [--logs 30] [--budget 10]
+"""
+
+import argparse
+import io
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.data_generator import WORDS, generate_image, generate_workspace
+from db_controller import DatabaseManager
+from encryption import MEDIA_CHUNK, create_key, create_media, encrypt_workspace, forget_key, read_media
+from image_ingest import ingest_image, load_preview
+
+PREVIEW_WIDTH = 200  # As in the media pane
+THUMBNAIL_SIZE = (300, 200)
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, (time.perf_counter() - start) * 1000
+
+
+def best_of(repeats: int, fns: dict) -> dict:
+    """label -> best ms over repeats, running the labels in turn each round."""
+    best = {label: float("inf") for label in fns}
+    for _ in range(repeats):
+        for label, fn in fns.items():
+            best[label] = min(best[label], timed(fn)[1])
+    return best
+
+
+def overhead(plain: float, encrypted: float) -> float:
+    return (encrypted - plain) / plain * 100 if plain else 0.0
+
+
+def stream_throughput(workdir: str, cipher, megabytes: int = 64) -> tuple:
+    """(encrypt MB/s, decrypt MB/s) of the chunked media format alone."""
+    path = os.path.join(workdir, "stream.bin")
+    block = os.urandom(MEDIA_CHUNK)
+
+    def write():
+        with create_media(path, cipher) as f:
+            for _ in range(megabytes * 1024 * 1024 // MEDIA_CHUNK):
+                f.write(block)
+
+    _, write_ms = timed(write)
+    _, read_ms = timed(lambda: read_media(path, cipher))
+    os.remove(path)
+    return megabytes / (write_ms / 1000), megabytes / (read_ms / 1000)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark encryption at rest against plain workspaces.")
+    parser.add_argument("--images", type=int, default=40, help="Source images ingested per mode")
+    parser.add_argument("--image-size", type=int, nargs=2, default=(1600, 1200))
+    parser.add_argument("--projects", type=int, default=300)
+    parser.add_argument("--logs", type=int, default=30, help="Log entries per project")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--budget", type=float, default=10.0, help="Allowed ingest/display slowdown in percent")
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="proman_encryption_bench_")
+    try:
+        rng = random.Random(args.seed)
+        cipher = create_key(os.path.join(workdir, "media.db"), "benchmark")
+        encrypt_rate, decrypt_rate = stream_throughput(workdir, cipher)
+        print(f"chunked stream: {encrypt_rate:.0f} MB/s encrypt, {decrypt_rate:.0f} MB/s decrypt")
+
+        # --- Media ---
+        sources = []
+        for i in range(args.images):
+            sources.append(os.path.join(workdir, f"source_{i}.png"))
+            generate_image(sources[-1], rng, tuple(args.image_size))
+        stored = {"plain": os.path.join(workdir, "plain"), "encrypted": os.path.join(workdir, "encrypted")}
+        for folder in stored.values():
+            os.makedirs(folder)
+        keys = {"plain": None, "encrypted": cipher}
+
+        def ingest(mode, max_size):
+            return lambda: [ingest_image(src, os.path.join(stored[mode], f"{i}.png"), max_size, cipher=keys[mode]) for i, src in enumerate(sources)]
+
+        def previews(mode):
+            return lambda: [load_preview(os.path.join(stored[mode], f"{i}.png"), PREVIEW_WIDTH, cipher=keys[mode]) for i in range(len(sources))]
+
+        def thumbnails(mode):
+            # What load_photo_image() hands to Tk, decoded the way Tk would decode it
+            return lambda: [Image.open(io.BytesIO(read_media(os.path.join(stored[mode], f"thumb_{i}.png"), keys[mode]))).load()
+                            for i in range(len(sources))]
+
+        results = {}
+        for mode in keys:
+            for i, src in enumerate(sources):
+                ingest_image(src, os.path.join(stored[mode], f"thumb_{i}.png"), THUMBNAIL_SIZE, cipher=keys[mode])
+        timings = best_of(args.repeats, {
+            ("ingest reference", "plain"): ingest("plain", None), ("ingest reference", "encrypted"): ingest("encrypted", None),
+            ("ingest thumbnail", "plain"): ingest("plain", THUMBNAIL_SIZE), ("ingest thumbnail", "encrypted"): ingest("encrypted", THUMBNAIL_SIZE),
+        })
+        # The thumbnail runs overwrote the references: ingest them once more for the display part
+        for mode in keys:
+            ingest(mode, None)()
+        timings.update(best_of(args.repeats, {
+            ("preview (media pane)", "plain"): previews("plain"), ("preview (media pane)", "encrypted"): previews("encrypted"),
+            ("thumbnail (Tk)", "plain"): thumbnails("plain"), ("thumbnail (Tk)", "encrypted"): thumbnails("encrypted"),
+        }))
+        stored_mb = sum(os.path.getsize(os.path.join(stored["plain"], f)) for f in os.listdir(stored["plain"])) / 2 ** 20
+        print(f"\n{args.images} images of {args.image_size[0]}x{args.image_size[1]} ({stored_mb:.1f} MB stored per mode)")
+        print(f"{'per image (ms)':<24} {'plain':>8} {'encrypted':>10} {'overhead':>9}")
+        budgeted = ("ingest reference", "ingest thumbnail", "preview (media pane)", "thumbnail (Tk)")
+        for label in budgeted:
+            plain, encrypted = timings[(label, "plain")], timings[(label, "encrypted")]
+            results[label] = overhead(plain, encrypted)
+            print(f"{label:<24} {plain / args.images:>8.2f} {encrypted / args.images:>10.2f} {results[label]:>8.1f}%")
+
+        # --- Logs ---
+        print(f"\nGenerating {args.projects} projects x {args.logs} logs ...")
+        plain_db = DatabaseManager(generate_workspace(os.path.join(workdir, "logs"), args.projects, args.logs, 0, seed=args.seed))
+        encrypted_path = os.path.join(workdir, "logs", "encrypted.db")
+        plain_db.backup(encrypted_path)
+        encrypted_db = DatabaseManager(encrypted_path)
+        log_cipher = create_key(encrypted_path, "benchmark")
+        _, ms = timed(lambda: encrypt_workspace(encrypted_db, log_cipher))
+        print(f"enable (encrypt {args.projects * args.logs} logs in place): {ms / 1000:.2f}s")
+
+        days = [(pid, day) for pid in range(1, args.projects + 1) for day in plain_db.get_log_dates(pid)[:3]]
+        read_days = lambda db: lambda: [db.get_logs_by_date(pid, day) for pid, day in days]
+        plain_reads = best_of(args.repeats, {"plain": read_days(plain_db)})["plain"]
+        log_cipher.clear_cache()
+        _, cold = timed(read_days(encrypted_db))
+        warm = best_of(args.repeats, {"warm": read_days(encrypted_db)})["warm"]
+        print(f"{'log days (ms per day)':<24} {'plain':>8} {'cold':>10} {'warm':>9}")
+        print(f"{'get_logs_by_date':<24} {plain_reads / len(days):>8.3f} {cold / len(days):>10.3f} {warm / len(days):>9.3f}")
+
+        words = rng.sample(WORDS, 5)
+        search = lambda db: lambda: [db.search_logs(word, limit=100) for word in words]
+        plain_search = best_of(args.repeats, {"plain": search(plain_db)})["plain"]
+        log_cipher.clear_cache()
+        _, cold = timed(search(encrypted_db))
+        warm = best_of(args.repeats, {"warm": search(encrypted_db)})["warm"]
+        print(f"{'search_logs':<24} {plain_search / len(words):>8.2f} {cold / len(words):>10.2f} {warm / len(words):>9.2f}")
+        print(f"plaintext cache: {log_cipher.cache_stats()}")
+        forget_key(encrypted_path)
+
+        over = {label: pct for label, pct in results.items() if pct > args.budget}
+        if over:
+            print(f"\nOver the {args.budget:.0f}% budget: " + ", ".join(f"{label} (+{pct:.1f}%)" for label, pct in over.items()))
+            sys.exit(1)
+        print(f"\nIngest and display within the {args.budget:.0f}% budget.")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
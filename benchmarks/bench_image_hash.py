@@ -0,0 +1,90 @@
+# --- benchmarks/bench_image_hash.py ---
+"""
+Perceptual hash cost: backfill throughput over real generated images (1 worker
+vs. several), then lookup latency over a large table of synthetic hashes with
+planted near-duplicate clusters (slice-index path vs. full bit_count scan,
+and the whole-library duplicate grouping).
+
+Run from the repository root:
+    python benchmarks/bench_image_hash.py [--images 1000] [--workers 4] [--hashes 100000]
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.data_generator import generate_workspace
+from db_controller import DatabaseManager
+from image_hash import NEAR_DUPLICATE_DISTANCE, SIMILAR_DISTANCE, backfill_hashes, to_signed64
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, (time.perf_counter() - start) * 1000
+
+
+def synthetic_hashes(db: DatabaseManager, count: int, rng: random.Random):
+    """count attachment rows with random hashes; every 20th seeds a cluster of 1-3 copies a few bits off."""
+    rows, attachment_id = [], 0
+    while attachment_id < count:
+        base = rng.getrandbits(64)
+        copies = rng.randint(1, 3) if attachment_id % 20 == 0 else 0
+        for i in range(copies + 1):
+            value = base
+            for _ in range(rng.randint(0, NEAR_DUPLICATE_DISTANCE) if i else 0):
+                value ^= 1 << rng.randrange(64)
+            attachment_id += 1
+            rows.append((attachment_id, to_signed64(value), to_signed64(rng.getrandbits(64))))
+    with db.connect() as conn:
+        conn.executemany("INSERT INTO attachment (attachment_id, file_path) VALUES (?, ?)", [(r[0], f"/synthetic/{r[0]}.png") for r in rows])
+        conn.executemany("INSERT INTO image_hash (attachment_id, dhash, ahash) VALUES (?, ?, ?)", rows)
+    return len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark perceptual hash backfill and lookups.")
+    parser.add_argument("--images", type=int, default=1000, help="Real images for the backfill part")
+    parser.add_argument("--workers", type=int, default=4, help="Compared against 1 worker")
+    parser.add_argument("--hashes", type=int, default=100_000, help="Synthetic hashes for the lookup part")
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="proman_hash_bench_")
+    try:
+        print(f"Generating {args.images} images in {workdir} ...")
+        db = DatabaseManager(generate_workspace(os.path.join(workdir, "images"), 50, 1, args.images, image_size=(1280, 800), seed=args.seed))
+        for workers in sorted({1, args.workers}):
+            db._execute_sql("DELETE FROM image_hash")
+            summary, ms = timed(lambda: backfill_hashes(db, workers))
+            print(f"backfill, {workers} worker(s): {summary['saved']} images in {ms / 1000:.2f}s ({summary['saved'] / (ms / 1000):.0f} images/s)")
+
+        rng = random.Random(args.seed)
+        db = DatabaseManager(os.path.join(workdir, "hashes.db"))
+        count, ms = timed(lambda: synthetic_hashes(db, args.hashes, rng))
+        print(f"\n{count} synthetic hashes inserted in {ms / 1000:.1f}s")
+        probes = [rng.randrange(1, count + 1) for _ in range(args.queries)]
+        print(f"{'lookup':<36} {'avg ms':>8} {'max ms':>8} {'matches':>8}")
+        for label, distance in ((f"near-duplicates (<= {NEAR_DUPLICATE_DISTANCE} bits, slices)", NEAR_DUPLICATE_DISTANCE),
+                                (f"similar (<= {SIMILAR_DISTANCE} bits, full scan)", SIMILAR_DISTANCE)):
+            times, matches = [], 0
+            for attachment_id in probes:
+                found, ms = timed(lambda: db.find_similar_images(attachment_id, distance))
+                times.append(ms)
+                matches += len(found)
+            print(f"{label:<36} {sum(times) / len(times):>8.2f} {max(times):>8.2f} {matches / len(probes):>8.2f}")
+        groups, ms = timed(db.find_duplicate_groups)
+        print(f"{'duplicate groups (whole library)':<36} {ms:>8.1f} {'':>8} {len(groups):>8}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
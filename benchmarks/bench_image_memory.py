@@ -0,0 +1,118 @@
+# --- benchmarks/bench_image_memory.py ---
+"""
+Peak RSS of image ingest per source size: the old save_image_as_png path
+(full decode, then thumbnail/convert) vs. image_ingest (draft/reduce, first
+frame only). Every measurement runs in a fresh subprocess so peaks don't mask
+each other. Needs the resource module (Linux/macOS).
+
+Run from the repository root:
+    python benchmarks/bench_image_memory.py [--sizes 2 12 48] [--formats JPEG PNG]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+THUMBNAIL_SIZE = (300, 200)
+PREVIEW_WIDTH = 200
+
+
+def make_source(path: str, megapixels: float, fmt: str):
+    from PIL import Image
+    width = int((megapixels * 1e6 * 4 / 3) ** 0.5)
+    height = int(width * 3 / 4)
+    # A resized gradient compresses realistically without costing seconds of Python per pixel
+    Image.linear_gradient("L").resize((width, height)).convert("RGB").save(path, fmt, quality=90)
+
+
+def legacy_ingest(source, destination, thumbnail):
+    """The pre-image_ingest save_image_as_png body, kept only as the 'before' baseline."""
+    from PIL import Image
+    with Image.open(source) as img:
+        if thumbnail:
+            img.thumbnail(THUMBNAIL_SIZE)
+        if img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info):
+            img = img.convert('RGBA')
+        else:
+            img = img.convert('RGB')
+        img.save(destination, "PNG")
+
+
+def bounded_ingest(source, destination, thumbnail):
+    from image_ingest import ingest_image
+    ingest_image(source, destination, THUMBNAIL_SIZE if thumbnail else None, max_pixels=None)
+
+
+def bounded_preview(source, destination, thumbnail):
+    from image_ingest import load_preview
+    load_preview(source, PREVIEW_WIDTH, max_pixels=None)
+
+
+MODES = {"legacy": legacy_ingest, "bounded": bounded_ingest, "preview": bounded_preview}
+
+
+def child(mode, source, thumbnail):
+    """Runs one ingest and prints the peak RSS growth in MiB."""
+    import importlib
+    import resource
+    # Load image_ingest (and Pillow with it) before the baseline so import memory is not measured
+    importlib.import_module("image_ingest")
+    scale = 1 if sys.platform == "darwin" else 1024  # ru_maxrss: bytes on macOS, KiB on Linux
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+    start = time.perf_counter()
+    with tempfile.TemporaryDirectory() as tmp:
+        MODES[mode](source, os.path.join(tmp, "out.png"), thumbnail)
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+    print(json.dumps({"peak_mib": round((peak - before) / 2**20, 1), "seconds": round(elapsed, 3)}))
+
+
+def measure(mode, source, thumbnail):
+    out = subprocess.run(
+        [sys.executable, __file__, "--child", mode, source, "1" if thumbnail else "0"],
+        capture_output=True, text=True, check=True, cwd=ROOT,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Peak RSS per image size for the image ingest path.")
+    parser.add_argument("--sizes", type=float, nargs="+", default=[2, 12, 24, 48], help="Source sizes in megapixels")
+    parser.add_argument("--formats", nargs="+", default=["JPEG", "PNG"])
+    parser.add_argument("--child", nargs=3, help=argparse.SUPPRESS)
+    parser.add_argument("--make", nargs=3, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.make:
+        path, megapixels, fmt = args.make
+        make_source(path, float(megapixels), fmt)
+        return
+    if args.child:
+        mode, source, thumbnail = args.child
+        child(mode, source, thumbnail == "1")
+        return
+
+    cases = [("thumbnail", "legacy", True), ("thumbnail", "bounded", True), ("preview", "preview", True),
+             ("full size", "legacy", False), ("full size", "bounded", False)]
+    print(f"{'source':>14} {'task':>10} {'path':>8} {'peak MiB':>9} {'seconds':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for fmt in args.formats:
+            for mp in args.sizes:
+                source = os.path.join(tmp, f"src_{mp:g}mp.{fmt.lower()}")
+                # Built in a subprocess too: Linux keeps ru_maxrss across exec, so a big
+                # allocation here would leak into every child's baseline
+                subprocess.run([sys.executable, __file__, "--make", source, str(mp), fmt], check=True, cwd=ROOT)
+                for task, mode, thumbnail in cases:
+                    result = measure(mode, source, thumbnail)
+                    print(f"{f'{fmt} {mp:g} MP':>14} {task:>10} {mode:>8} {result['peak_mib']:>9.1f} {result['seconds']:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+# --- benchmarks/bench_row_mapping.py ---
+"""
+Micro-benchmark: sqlite3.Row + keyed @dataclass construction (old path) vs.
+plain tuples unpacked into slotted dataclasses (DatabaseManager._fetch_models).
+
+Run from the repository root:
+    python benchmarks/bench_row_mapping.py [rows]
+"""
+
+import os
+import sys
+import sqlite3
+import tempfile
+import time
+import tracemalloc
+from dataclasses import dataclass
+from itertools import starmap
+from typing import Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db_controller import DatabaseManager, LOG_COLUMNS
+from db_models import LogEntry
+
+
+@dataclass
+class LegacyLogEntry:
+    """The pre-slots model, kept here only as the 'before' baseline."""
+    content: str
+    project_id: int
+    timestamp: str
+    id: Optional[int] = None
+
+
+def build_database(path: str, rows: int):
+    DatabaseManager(db_path=path)
+    with sqlite3.connect(path) as conn:
+        conn.executemany(
+            "INSERT INTO log (project_id, timestamp, content) VALUES (?, ?, ?)",
+            ((i % 100, f"2025-{(i % 12) + 1:02d}-{(i % 28) + 1:02d}", f"Log entry number {i}") for i in range(rows)),
+        )
+
+
+def legacy_fetch(path: str):
+    with sqlite3.connect(path) as conn:
+        conn.row_factory = sqlite3.Row
+        rows = conn.execute("SELECT * FROM log").fetchall()
+    return [LegacyLogEntry(id=r['log_id'], project_id=r['project_id'], timestamp=r['timestamp'], content=r['content']) for r in rows]
+
+
+def fast_fetch(path: str):
+    with sqlite3.connect(path) as conn:
+        rows = conn.execute(f"SELECT {LOG_COLUMNS} FROM log").fetchall()
+    return list(starmap(LogEntry, rows))
+
+
+def measure(label: str, fetch, path: str, rows: int):
+    fetch(path)  # Warm the page cache so both runs read from memory
+
+    start = time.perf_counter()
+    fetch(path)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    result = fetch(path)
+    current, _peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+
+    per_100k = current * 100_000 / rows
+    print(f"{label:<28} {rows / elapsed:>14,.0f} rows/s   {per_100k / 1_048_576:>8.1f} MiB per 100k rows")
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        build_database(path, rows)
+        print(f"Mapping {rows:,} log rows")
+        measure("before: Row + dataclass", legacy_fetch, path, rows)
+        measure("after: tuple + slots", fast_fetch, path, rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+# --- benchmarks/bench_sync.py ---
+"""
+Sync cost on a synthetic workspace: the first sync into an empty database
+(full snapshot) vs. the incremental bundles after "a day's work" on both
+sides, which should stay small and fast however large the database is.
+
+Run from the repository root:
+    python benchmarks/bench_sync.py [--projects 2000] [--logs 20] [--attachments 1000] [--edits 300]
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.data_generator import generate_workspace, generate_image
+from db_controller import DatabaseManager
+from db_models import Project
+from sync_engine import SyncEngine
+
+
+def days_work(db: DatabaseManager, media_dir: str, rng: random.Random, edits: int, tag: str):
+    """New logs, edited logs, a new project and a few new images: the usual mix of a working day."""
+    project_ids = [p.id for p in db.get_projects_sorted()]
+    log_ids = [row[0] for row in db._execute_query("SELECT log_id FROM log", row_factory=None, use_cache=False)]
+    for i in range(edits):
+        roll = rng.random()
+        if roll < 0.6:
+            db.create_log(rng.choice(project_ids), f"{tag} entry {i}", f"2026-03-{rng.randrange(1, 29):02d}")
+        elif roll < 0.95:
+            db.update_log_content(rng.choice(log_ids), f"{tag} rewrote this ({i})")
+        else:
+            path = os.path.join(media_dir, f"{tag}_{i}.png")
+            generate_image(path, rng, (320, 240))
+            db.add_attachment(os.path.abspath(path), rng.choice(project_ids))
+    db.save_project(Project(f"{tag} new project", 2, "2026-06-01"))
+
+
+def timed_sync(label: str, sender: SyncEngine, receiver: SyncEngine, bundle: str, to: str = None):
+    start = time.perf_counter()
+    stats = sender.export_bundle(bundle, to)
+    exported = time.perf_counter() - start
+    start = time.perf_counter()
+    summary = receiver.import_bundle(bundle)
+    imported = time.perf_counter() - start
+    print(f"{label:>22} {stats['changes']:>8} {stats['media']:>6} {os.path.getsize(bundle) / 2**20:>9.2f} "
+          f"{exported:>9.2f} {imported:>9.2f}   {summary['conflicts']} conflicts")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark snapshot vs. incremental sync bundles.")
+    parser.add_argument("--projects", type=int, default=2000)
+    parser.add_argument("--logs", type=int, default=20, help="Log entries per project")
+    parser.add_argument("--attachments", type=int, default=1000)
+    parser.add_argument("--edits", type=int, default=300, help="Edits per side between syncs")
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="proman_sync_bench_")
+    try:
+        desk_dir, lap_dir = os.path.join(workdir, "desk"), os.path.join(workdir, "laptop")
+        print(f"Generating {args.projects} projects x {args.logs} logs, {args.attachments} images in {workdir} ...")
+        desk = DatabaseManager(generate_workspace(desk_dir, args.projects, args.logs, args.attachments, image_size=(320, 240), seed=args.seed))
+        os.makedirs(os.path.join(lap_dir, "media"))
+        laptop = DatabaseManager(os.path.join(lap_dir, "projects.db"))
+        desk_sync = SyncEngine(desk, os.path.join(desk_dir, "media"), "desk")
+        lap_sync = SyncEngine(laptop, os.path.join(lap_dir, "media"), "laptop")
+        rng = random.Random(args.seed)
+
+        print(f"\n{'sync':>22} {'changes':>8} {'media':>6} {'bundle MB':>9} {'export s':>9} {'import s':>9}")
+        timed_sync("first (snapshot)", desk_sync, lap_sync, os.path.join(workdir, "1.zip"))
+        timed_sync("laptop -> desk", lap_sync, desk_sync, os.path.join(workdir, "2.zip"), "desk")
+        for day in (1, 2):
+            days_work(desk, os.path.join(desk_dir, "media"), rng, args.edits, f"desk{day}")
+            days_work(laptop, os.path.join(lap_dir, "media"), rng, args.edits, f"lap{day}")
+            timed_sync(f"day {day}: desk -> laptop", desk_sync, lap_sync, os.path.join(workdir, f"d{day}.zip"), "laptop")
+            timed_sync(f"day {day}: laptop -> desk", lap_sync, desk_sync, os.path.join(workdir, f"l{day}.zip"), "desk")
+
+        query = "SELECT COUNT(*), COALESCE(SUM(length(content)), 0) FROM log"
+        same = desk._execute_query(query, row_factory=None, use_cache=False) == laptop._execute_query(query, row_factory=None, use_cache=False)
+        print(f"\nLog tables {'match' if same else 'DIFFER'} after the last round.")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
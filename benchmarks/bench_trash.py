@@ -0,0 +1,95 @@
+# --- benchmarks/bench_trash.py ---
+"""
+Soft-delete cost: delete and undo latency per project (tombstoning its logs
+and attachments, then restoring the batch), list latency while a large share
+of the rows sits in the trash (partial indexes skip tombstones), and purge
+throughput at a few batch sizes.
+
+Run from the repository root:
+    python benchmarks/bench_trash.py [--projects 2000] [--logs 50] [--trashed 0.3]
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.data_generator import generate_workspace
+from db_controller import DatabaseManager
+from db_models import ProjectQuery
+from undo import PurgeJob
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, (time.perf_counter() - start) * 1000
+
+
+def list_latency(db: DatabaseManager, pids, repeats: int) -> dict:
+    """Average ms of the main list, a project's dates and the first attachment page."""
+    totals = {"projects by due date": 0.0, "log dates of a project": 0.0, "attachment page": 0.0}
+    for i in range(repeats):
+        totals["projects by due date"] += timed(lambda: db.query_projects(ProjectQuery(sort_by="due_date")))[1]
+        totals["log dates of a project"] += timed(lambda: db.get_log_dates(pids[i % len(pids)]))[1]
+        totals["attachment page"] += timed(lambda: db.get_attachments_page(0, 500))[1]
+    return {label: ms / repeats for label, ms in totals.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark soft deletes, undo and the trash purge.")
+    parser.add_argument("--projects", type=int, default=2000)
+    parser.add_argument("--logs", type=int, default=50, help="Log entries per project")
+    parser.add_argument("--attachments", type=int, default=2000)
+    parser.add_argument("--trashed", type=float, default=0.3, help="Share of projects in the trash for the list timings")
+    parser.add_argument("--sample", type=int, default=50, help="Projects deleted and restored for the latency part")
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="proman_trash_bench_")
+    try:
+        print(f"Generating {args.projects} projects x {args.logs} logs in {workdir} ...")
+        db_path = generate_workspace(workdir, args.projects, args.logs, args.attachments, image_size=(32, 32), seed=args.seed)
+        db = DatabaseManager(db_path)
+        rng = random.Random(args.seed)
+        pids = rng.sample(range(1, args.projects + 1), args.projects)
+
+        deletes, restores = [], []
+        for pid in pids[:args.sample]:
+            batch, ms = timed(lambda: db.delete_project(pid))
+            deletes.append(ms)
+            restores.append(timed(lambda: db.restore_batch(batch))[1])
+        print(f"\n{'per project':<28} {'avg ms':>8} {'max ms':>8}")
+        for label, times in (("delete (tombstone)", deletes), ("undo (restore batch)", restores)):
+            print(f"{label:<28} {sum(times) / len(times):>8.2f} {max(times):>8.2f}")
+
+        live = pids[int(len(pids) * args.trashed):]
+        before = list_latency(db, live, 20)
+        trashed = pids[:int(len(pids) * args.trashed)]
+        _, ms = timed(lambda: [db.delete_project(pid) for pid in trashed])
+        print(f"\n{len(trashed)} projects moved to the trash in {ms / 1000:.1f}s")
+        after = list_latency(db, live, 20)
+        print(f"{'list (avg ms)':<28} {'empty':>8} {'trashed':>8}")
+        for label in before:
+            print(f"{label:<28} {before[label]:>8.2f} {after[label]:>8.2f}")
+
+        print(f"\n{'purge batch size':<28} {'rows/s':>8}")
+        for batch_size in (100, 500, 2000):
+            copy_path = os.path.join(workdir, f"purge_{batch_size}.db")
+            db.backup(copy_path)  # The trashed rows may still sit in the WAL
+            copy = DatabaseManager(copy_path)
+            # The media folder is shared with the other copies: keep the files
+            totals, ms = timed(lambda: PurgeJob(copy, os.path.join(workdir, "none"), grace_s=-60, batch_size=batch_size).run_once())
+            rows = totals["projects"] + totals["logs"] + totals["attachments"]
+            print(f"{batch_size:<28} {rows / (ms / 1000):>8.0f}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
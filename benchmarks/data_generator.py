@@ -0,0 +1,116 @@
+# --- benchmarks/data_generator.py ---
+"""
+Deterministic synthetic workspace generator: a projects.db plus a media/
+folder of generated PNGs. The same arguments always produce the same data.
+
+    python benchmarks/data_generator.py OUTPUT_DIR --projects 1000 --logs 20 --attachments 500
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import sys
+from datetime import date, timedelta
+
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db_controller import DatabaseManager, GLOBAL_COLLECTION_ID
+
+WORDS = ("alpha", "bravo", "cobalt", "delta", "ember", "falcon", "granite", "harbor", "iris", "juniper",
+         "kepler", "lumen", "mosaic", "nova", "orbit", "pixel", "quartz", "raven", "sierra", "tundra")
+BASE_DATE = date(2025, 1, 1)
+
+
+def generate_image(path: str, rng: random.Random, size=(320, 240)):
+    """A gradient background with a few random shapes, so PNG sizes resemble real screenshots."""
+    width, height = size
+    top = tuple(rng.randrange(256) for _ in range(3))
+    bottom = tuple(rng.randrange(256) for _ in range(3))
+    img = Image.new("RGB", size)
+    draw = ImageDraw.Draw(img)
+    for y in range(height):
+        t = y / max(height - 1, 1)
+        draw.line([(0, y), (width, y)], fill=tuple(int(a + (b - a) * t) for a, b in zip(top, bottom)))
+    for _ in range(6):
+        x0, y0 = rng.randrange(width), rng.randrange(height)
+        x1, y1 = min(width, x0 + rng.randrange(20, 120)), min(height, y0 + rng.randrange(20, 80))
+        draw.rectangle([x0, y0, x1, y1], fill=tuple(rng.randrange(256) for _ in range(3)))
+    img.save(path, "PNG")
+
+
+def generate_workspace(output_dir: str, projects: int = 1000, logs_per_project: int = 20,
+                       attachments: int = 500, image_size=(320, 240), seed: int = 1234) -> str:
+    """Creates output_dir/projects.db and output_dir/media/*.png. Returns the database path."""
+    rng = random.Random(seed)
+    media_dir = os.path.join(output_dir, "media")
+    os.makedirs(media_dir, exist_ok=True)
+    db_path = os.path.join(output_dir, "projects.db")
+    if os.path.exists(db_path):
+        os.remove(db_path)
+
+    # Let DatabaseManager create the real schema, indexes and migrations
+    DatabaseManager(db_path=db_path)
+
+    project_rows = []
+    for pid in range(1, projects + 1):
+        name = f"{rng.choice(WORDS).title()} {rng.choice(WORDS)} {pid}"
+        due = (BASE_DATE + timedelta(days=rng.randrange(-90, 365))).isoformat()
+        project_rows.append((pid, name, rng.choice((1, 2, 3)), due, due, None))
+
+    log_rows = []
+    for pid in range(1, projects + 1):
+        day = BASE_DATE + timedelta(days=rng.randrange(0, 60))
+        for _ in range(logs_per_project):
+            # Roughly one entry per working day, sometimes two on the same day
+            if rng.random() < 0.8:
+                day += timedelta(days=rng.choice((1, 1, 1, 2, 3)))
+            words = " ".join(rng.choice(WORDS) for _ in range(rng.randrange(8, 40)))
+            if attachments and rng.random() < 0.2:
+                words += f" [ref:{rng.randrange(1, attachments + 1)}]"
+            log_rows.append((pid, day.isoformat(), words))
+
+    attachment_rows = []
+    for aid in range(1, attachments + 1):
+        path = os.path.join(media_dir, f"ref_{seed}_{aid:06d}.png")
+        generate_image(path, rng, image_size)
+        is_global = 1 if rng.random() < 0.1 else 0
+        project_id = rng.randrange(1, projects + 1) if projects else None
+        attachment_rows.append((aid, path, project_id, is_global))
+
+    # Every fourth project gets a thumbnail taken from its own attachment pool
+    thumbnails = [(row[1], row[2]) for row in attachment_rows if row[2] is not None and row[2] % 4 == 0]
+
+    with sqlite3.connect(db_path) as conn:
+        conn.executemany("INSERT INTO project (project_id, name, priority, due_date, due_date_iso, thumbnail_path) VALUES (?, ?, ?, ?, ?, ?)", project_rows)
+        conn.executemany("INSERT INTO log (project_id, timestamp, content) VALUES (?, ?, ?)", log_rows)
+        conn.executemany("INSERT INTO attachment (attachment_id, file_path, project_id, is_global) VALUES (?, ?, ?, ?)", attachment_rows)
+        conn.executemany("UPDATE project SET thumbnail_path = ? WHERE project_id = ?", thumbnails)
+        # Sharing tables: owner links, Global collection membership, every project subscribed to Global
+        conn.executemany("INSERT INTO attachment_project (attachment_id, project_id) VALUES (?, ?)",
+                         [(row[0], row[2]) for row in attachment_rows if row[2] is not None])
+        conn.executemany("INSERT INTO attachment_collection (attachment_id, collection_id) VALUES (?, ?)",
+                         [(row[0], GLOBAL_COLLECTION_ID) for row in attachment_rows if row[3]])
+        conn.execute("INSERT INTO project_collection (project_id, collection_id) SELECT project_id, ? FROM project", (GLOBAL_COLLECTION_ID,))
+        conn.commit()
+    return db_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a deterministic synthetic ProMan workspace.")
+    parser.add_argument("output_dir")
+    parser.add_argument("--projects", type=int, default=1000)
+    parser.add_argument("--logs", type=int, default=20, help="Log entries per project")
+    parser.add_argument("--attachments", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    db_path = generate_workspace(args.output_dir, args.projects, args.logs, args.attachments, seed=args.seed)
+    print(f"Generated {db_path}")
+
+
+if __name__ == "__main__":
+    main()
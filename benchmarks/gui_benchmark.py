@@ -0,0 +1,195 @@
+# --- benchmarks/gui_benchmark.py ---
+"""
+Headless GUI benchmark: drives MainWindow.refresh_project_list,
+ProjectDetailWindow.load_media and AttachmentManager.refresh_list against a
+synthetic workspace and reports wall time per refresh, widget counts, live
+Tk images and memory growth across repeated refreshes.
+
+If $DISPLAY is not set, an Xvfb server is started for the run.
+
+    python benchmarks/gui_benchmark.py --projects 300 --attachments 200 --iterations 10
+    python benchmarks/gui_benchmark.py --check    # exit 1 on leaks / slow refreshes
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tkinter as tk
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.data_generator import generate_workspace
+from db_controller import DatabaseManager
+from pm_controller import ProjectManagementController
+
+
+# --- VIRTUAL DISPLAY ---
+
+def start_virtual_display(display: str = ":99"):
+    """Starts Xvfb when no display is available. Returns the process (or None if not needed)."""
+    if os.environ.get("DISPLAY"):
+        return None
+    try:
+        proc = subprocess.Popen(
+            ["Xvfb", display, "-screen", "0", "1600x1000x24", "-nolisten", "tcp"],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+    except FileNotFoundError:
+        sys.exit("No $DISPLAY and Xvfb is not installed.")
+    time.sleep(1.0)
+    if proc.poll() is not None:
+        sys.exit(f"Xvfb failed to start on {display}.")
+    os.environ["DISPLAY"] = display
+    return proc
+
+
+# --- PROBES ---
+
+def count_widgets(widget) -> int:
+    return 1 + sum(count_widgets(child) for child in widget.winfo_children())
+
+def tk_image_count(root) -> int:
+    """Live Tk images. A PhotoImage stays alive here as long as Python holds a reference."""
+    return len(root.tk.call("image", "names"))
+
+def rss_bytes() -> int:
+    """Current resident set size (Linux); 0 where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return 0
+
+
+def measure(name: str, root, refresh, widget_root, held_refs, iterations: int) -> dict:
+    """Calls refresh() repeatedly and tracks time, widgets, Tk images and memory after each call."""
+    times, widgets, images, refs = [], [], [], []
+    tracemalloc.start()
+    rss_start = rss_bytes()
+    heap_start = tracemalloc.get_traced_memory()[0]
+
+    for _ in range(iterations):
+        start = time.perf_counter()
+        refresh()
+        root.update()  # Include geometry/layout work the user waits for
+        times.append((time.perf_counter() - start) * 1000)
+        widgets.append(count_widgets(widget_root))
+        images.append(tk_image_count(root))
+        refs.append(len(held_refs()))
+
+    heap_end = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    # Ignore the first refresh (caches warming up); after that nothing should keep growing
+    steady = slice(1, None) if iterations > 2 else slice(None)
+    leak = images[steady][-1] > images[steady][0] or refs[steady][-1] > refs[steady][0] or widgets[steady][-1] > widgets[steady][0]
+
+    return {
+        "name": name,
+        "iterations": iterations,
+        "median_ms": round(statistics.median(times), 3),
+        "max_ms": round(max(times), 3),
+        "first_ms": round(times[0], 3),
+        "widgets": widgets[-1],
+        "widget_growth": widgets[-1] - widgets[0],
+        "tk_images": images[-1],
+        "tk_image_growth": images[-1] - images[0],
+        "held_refs": refs[-1],
+        "held_ref_growth": refs[-1] - refs[0],
+        "python_heap_growth_kb": round((heap_end - heap_start) / 1024, 1),
+        "rss_growth_kb": round((rss_bytes() - rss_start) / 1024, 1),
+        "leak_suspected": leak,
+    }
+
+
+# --- DRIVER ---
+
+def run(args) -> list:
+    from main import apply_dark_theme
+    from gui.main_window import MainWindow
+    from gui.project_detail_window import ProjectDetailWindow
+    from gui.attachment_manager import AttachmentManager
+
+    workdir = tempfile.mkdtemp(prefix="proman_gui_bench_")
+    try:
+        db_path = generate_workspace(workdir, args.projects, args.logs, args.attachments, seed=args.seed)
+        controller = ProjectManagementController(DatabaseManager(db_path=db_path, cache_size=args.cache_size))
+
+        root = tk.Tk()
+        root.geometry("1000x600")
+        apply_dark_theme(root)
+        main_window = MainWindow(root, controller=controller)
+        root.update()
+
+        results = [measure("MainWindow.refresh_project_list", root, main_window.refresh_project_list,
+                           main_window.project_display_frame, lambda: main_window.project_image_references, args.iterations)]
+
+        # The project whose media pane shows the most attachments
+        project_id = max((p.id for p in controller.get_all_projects_sorted()),
+                         key=lambda pid: len(controller.get_attachments_for_project(pid)))
+        detail = ProjectDetailWindow(root, controller, controller.db_controller.get_project_by_id(project_id))
+        root.update()
+        results.append(measure("ProjectDetailWindow.load_media", root, detail.load_media,
+                               detail.media_inner_frame, lambda: detail.image_refs, args.iterations))
+        detail.window.destroy()
+
+        manager = AttachmentManager(root, controller)
+        root.update()
+        results.append(measure("AttachmentManager.refresh_list", root, manager.refresh_list,
+                               manager.window, lambda: manager.tree.get_children(), args.iterations))
+        manager.window.destroy()
+
+        root.destroy()
+        return results
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless GUI refresh benchmark.")
+    parser.add_argument("--projects", type=int, default=300)
+    parser.add_argument("--logs", type=int, default=5, help="Log entries per project")
+    parser.add_argument("--attachments", type=int, default=200)
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--cache-size", type=int, default=0)
+    parser.add_argument("--output", help="Write results JSON here")
+    parser.add_argument("--check", action="store_true", help="Exit 1 on suspected leaks or refreshes over --max-ms")
+    parser.add_argument("--max-ms", type=float, default=2000.0, help="Median refresh budget used by --check")
+    args = parser.parse_args()
+
+    xvfb = start_virtual_display()
+    try:
+        results = run(args)
+    finally:
+        if xvfb is not None:
+            xvfb.terminate()
+
+    failed = False
+    for r in results:
+        status = ""
+        if r["leak_suspected"]:
+            status = "  LEAK?"
+        if r["median_ms"] > args.max_ms:
+            status += "  SLOW"
+        failed = failed or bool(status)
+        print(f"{r['name']:<36} median {r['median_ms']:>9.1f} ms  widgets {r['widgets']:>6}  "
+              f"tk images {r['tk_images']:>5} ({r['tk_image_growth']:+d})  rss {r['rss_growth_kb']:+.0f} KiB{status}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"params": vars(args), "results": results}, f, indent=2)
+
+    if args.check and failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
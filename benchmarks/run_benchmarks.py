@@ -0,0 +1,230 @@
+# --- benchmarks/run_benchmarks.py ---
+"""
+Benchmark harness for the data and logic layers.
+
+Generates a synthetic workspace (see data_generator.py), runs each scenario
+several times and writes machine-readable JSON. Pass --compare with an
+earlier results file to print the change per scenario. The exit status is 1
+when a scenario got slower than --threshold.
+
+    python benchmarks/run_benchmarks.py --output bench.json
+    python benchmarks/run_benchmarks.py --output new.json --compare bench.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.data_generator import generate_workspace, generate_image
+from db_controller import DatabaseManager
+from db_models import ProjectQuery
+
+SCENARIOS = {}
+
+def scenario(name):
+    def register(func):
+        SCENARIOS[name] = func
+        return func
+    return register
+
+
+# --- SCENARIOS ---
+# Each scenario gets a context dict and returns (ops, callable). The callable
+# performs `ops` operations; the harness times it once per repeat.
+
+@scenario("project_listing")
+def bench_project_listing(ctx):
+    db = ctx["db"]
+    queries = [
+        ProjectQuery(),
+        ProjectQuery(sort_by="due_date", descending=False, due_from="2025-03-01", due_to="2025-03-31"),
+        ProjectQuery(sort_by="last_activity", min_priority=2),
+        ProjectQuery(text="falcon", has_thumbnail=True),
+    ]
+    return len(queries), lambda: [db.query_projects(q) for q in queries]
+
+
+@scenario("date_loading")
+def bench_date_loading(ctx):
+    db, pids = ctx["db"], ctx["sample_projects"]
+    return len(pids), lambda: [db.get_log_dates(pid) for pid in pids]
+
+
+@scenario("log_display")
+def bench_log_display(ctx):
+    db = ctx["db"]
+    pairs = ctx["sample_project_dates"]
+    return len(pairs), lambda: [db.get_logs_by_date(pid, day) for pid, day in pairs]
+
+
+@scenario("attachment_listing")
+def bench_attachment_listing(ctx):
+    db, pids = ctx["db"], ctx["sample_projects"]
+    def run():
+        db.get_all_attachments()
+        for pid in pids:
+            db.get_viewable_attachments(pid)
+    return len(pids) + 1, run
+
+
+@scenario("image_ingest")
+def bench_image_ingest(ctx):
+    from pm_controller import ProjectManagementController
+    controller = ProjectManagementController(ctx["db"])
+    sources = ctx["ingest_sources"]
+    def run():
+        for i, path in enumerate(sources):
+            controller.save_image_as_png(path, is_thumbnail=(i % 2 == 0))
+    return len(sources), run
+
+
+@scenario("delete_cascade")
+def bench_delete_cascade(ctx):
+    # Works on a fresh copy per repeat so every run deletes the same rows
+    pids = ctx["sample_projects"]
+    def run():
+        copy_path = os.path.join(ctx["workdir"], "delete_copy.db")
+        shutil.copyfile(ctx["db_path"], copy_path)
+        db = DatabaseManager(db_path=copy_path)
+        start = time.perf_counter()
+        for pid in pids:
+            db.delete_project(pid)
+        return time.perf_counter() - start
+    return len(pids), run
+
+
+# --- HARNESS ---
+
+def build_context(workdir: str, args) -> dict:
+    db_path = generate_workspace(workdir, args.projects, args.logs, args.attachments, seed=args.seed)
+    rng = random.Random(args.seed)
+    db = DatabaseManager(db_path=db_path, cache_size=args.cache_size)
+
+    sample_projects = rng.sample(range(1, args.projects + 1), min(args.sample, args.projects))
+    with sqlite3.connect(db_path) as conn:
+        pairs = conn.execute(
+            "SELECT project_id, MIN(timestamp) FROM log WHERE project_id IN (%s) GROUP BY project_id" % ",".join("?" * len(sample_projects)),
+            sample_projects,
+        ).fetchall()
+
+    source_dir = os.path.join(workdir, "ingest_sources")
+    os.makedirs(source_dir, exist_ok=True)
+    ingest_sources = []
+    for i in range(args.ingest):
+        path = os.path.join(source_dir, f"source_{i}.png")
+        generate_image(path, rng, (1920, 1080))
+        ingest_sources.append(path)
+
+    return {
+        "workdir": workdir,
+        "db_path": db_path,
+        "db": db,
+        "sample_projects": sample_projects,
+        "sample_project_dates": pairs,
+        "ingest_sources": ingest_sources,
+    }
+
+
+def run_scenario(name: str, ctx: dict, repeat: int) -> dict:
+    ops, func = SCENARIOS[name](ctx)
+    func()  # Warm-up (page cache, imports)
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        inner = func()
+        elapsed = time.perf_counter() - start
+        # A scenario may return its own timing to exclude setup work
+        samples.append(inner if isinstance(inner, float) else elapsed)
+    samples_ms = sorted(s * 1000 for s in samples)
+    median = statistics.median(samples_ms)
+    return {
+        "ops": ops,
+        "repeat": repeat,
+        "min_ms": round(samples_ms[0], 3),
+        "median_ms": round(median, 3),
+        "mean_ms": round(statistics.mean(samples_ms), 3),
+        "max_ms": round(samples_ms[-1], 3),
+        "ops_per_sec": round(ops / (median / 1000), 1) if median else None,
+    }
+
+
+def compare(results: dict, baseline_path: str, threshold: float) -> bool:
+    """Prints median deltas vs. a previous run. Returns True if anything regressed past threshold."""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)["scenarios"]
+    regressed = False
+    print(f"\n{'scenario':<22}{'baseline ms':>14}{'current ms':>14}{'change':>10}")
+    for name, current in results["scenarios"].items():
+        old = baseline.get(name)
+        if not old:
+            print(f"{name:<22}{'-':>14}{current['median_ms']:>14.3f}{'new':>10}")
+            continue
+        change = (current["median_ms"] - old["median_ms"]) / old["median_ms"] if old["median_ms"] else 0.0
+        flag = "  REGRESSION" if change > threshold else ""
+        regressed = regressed or bool(flag)
+        print(f"{name:<22}{old['median_ms']:>14.3f}{current['median_ms']:>14.3f}{change:>+10.1%}{flag}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run ProMan benchmarks against a synthetic database.")
+    parser.add_argument("--projects", type=int, default=1000)
+    parser.add_argument("--logs", type=int, default=20, help="Log entries per project")
+    parser.add_argument("--attachments", type=int, default=500)
+    parser.add_argument("--ingest", type=int, default=10, help="Source images for the image_ingest scenario")
+    parser.add_argument("--sample", type=int, default=50, help="Projects touched by per-project scenarios")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--cache-size", type=int, default=0, help="DatabaseManager read cache (0 = off)")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS), help="Run only these scenarios")
+    parser.add_argument("--output", help="Write results JSON here")
+    parser.add_argument("--compare", help="Earlier results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Allowed slowdown before flagging (0.10 = 10%%)")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="proman_bench_")
+    previous_cwd = os.getcwd()
+    try:
+        print(f"Generating workspace in {workdir} ...")
+        ctx = build_context(workdir, args)
+        # save_image_as_png writes into ./media, keep that inside the temp workspace
+        os.chdir(workdir)
+
+        results = {
+            "meta": {
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "python": platform.python_version(),
+                "sqlite": sqlite3.sqlite_version,
+                "platform": platform.platform(),
+                "params": {k: getattr(args, k) for k in ("projects", "logs", "attachments", "ingest", "sample", "repeat", "seed", "cache_size")},
+            },
+            "scenarios": {},
+        }
+        for name in args.scenario or SCENARIOS:
+            results["scenarios"][name] = stats = run_scenario(name, ctx, args.repeat)
+            print(f"{name:<22} median {stats['median_ms']:>10.3f} ms  ({stats['ops']} ops, {stats['ops_per_sec']} ops/s)")
+    finally:
+        os.chdir(previous_cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.compare and compare(results, args.compare, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
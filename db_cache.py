@@ -0,0 +1,135 @@
+# --- db_cache.py ---
+
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, FrozenSet, Optional
+
+# Table names following FROM / JOIN / INTO / UPDATE / TABLE (incl. subqueries).
+_TABLE_PATTERN = re.compile(
+    r"\b(?:FROM|JOIN|INTO|UPDATE|TABLE(?:\s+IF\s+(?:NOT\s+)?EXISTS)?)\s+([A-Za-z_][A-Za-z0-9_]*)",
+    re.IGNORECASE,
+)
+
+def tables_in_sql(sql: str) -> FrozenSet[str]:
+    """Every table a statement reads or writes, lower-cased."""
+    return frozenset(name.lower() for name in _TABLE_PATTERN.findall(sql))
+
+
+class QueryCache:
+    """
+    In-process LRU cache of SELECT results keyed by (sql, params).
+
+    Each entry remembers which tables its query touched; any write to one of
+    those tables drops the entry. Cached values are the raw rows (tuples or
+    sqlite3.Row), which are immutable, so callers can't corrupt the cache.
+
+    Every invalidation also bumps a per-table generation (clear() bumps them
+    all). A reader takes generation(sql) before running its query and hands it
+    to put(), which drops the rows if a write invalidated those tables in the
+    meantime: they may predate that write.
+    """
+
+    def __init__(self, max_entries: int = 256, max_rows: int = 100_000):
+        self.max_entries = max_entries
+        self.max_rows = max_rows          # Total rows held across all entries
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()  # key -> (tables, rows)
+        self._by_table: Dict[str, set] = {}
+        self._generations: Dict[str, int] = {}  # table -> invalidation count
+        self._epoch = 0                         # clear() count
+        self._row_count = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+        self.stale_puts = 0
+
+    # --- LOOKUP / STORE ---
+
+    def get(self, key: tuple) -> Optional[list]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return list(entry[1])
+
+    def generation(self, sql: str) -> tuple:
+        """Token for put(): changes whenever a table sql reads is invalidated."""
+        tables = tables_in_sql(sql)
+        with self._lock:
+            return self._generation(tables)
+
+    def _generation(self, tables) -> tuple:
+        return (self._epoch,) + tuple(self._generations.get(table, 0) for table in sorted(tables))
+
+    def put(self, key: tuple, sql: str, rows: list, generation: Optional[tuple] = None):
+        """Stores rows, unless generation (taken before the query ran) shows a write invalidated them since."""
+        if len(rows) > self.max_rows:
+            return  # Too big to be worth keeping
+        tables = tables_in_sql(sql)
+        with self._lock:
+            if generation is not None and generation != self._generation(tables):
+                self.stale_puts += 1
+                return
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (tables, list(rows))
+            self._row_count += len(rows)
+            for table in tables:
+                self._by_table.setdefault(table, set()).add(key)
+            while len(self._entries) > self.max_entries or self._row_count > self.max_rows:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.evictions += 1
+
+    # --- INVALIDATION ---
+
+    def invalidate_sql(self, sql: str):
+        """Drops every entry that depends on a table written by sql. Unknown statements clear everything."""
+        tables = tables_in_sql(sql)
+        if not tables:
+            self.clear()
+            return
+        with self._lock:
+            for table in tables:
+                self._generations[table] = self._generations.get(table, 0) + 1
+                for key in list(self._by_table.get(table, ())):
+                    self._drop(key)
+                    self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._epoch += 1
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+            self._by_table.clear()
+            self._row_count = 0
+
+    def _drop(self, key: tuple):
+        tables, rows = self._entries.pop(key)
+        self._row_count -= len(rows)
+        for table in tables:
+            keys = self._by_table.get(table)
+            if keys is not None:
+                keys.discard(key)
+
+    # --- STATS ---
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "rows": self._row_count,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "invalidations": self.invalidations,
+                "evictions": self.evictions,
+                "stale_puts": self.stale_puts,
+            }
@@ -1,9 +1,44 @@
 # --- db_models.py ---
 
+import re
 from dataclasses import dataclass
+from datetime import datetime
 from typing import Optional
 
-@dataclass
+# Formats accepted for free-text dates, tried in order. Time parts are dropped (logs are per-day).
+DATE_INPUT_FORMATS = (
+    "%Y-%m-%d", "%Y/%m/%d", "%Y.%m.%d", "%d-%m-%Y", "%d/%m/%Y", "%d.%m.%Y", "%Y%m%d",
+    "%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S", "%Y-%m-%d %H:%M",
+)
+
+def to_iso_date(value: Optional[str]) -> Optional[str]:
+    """Best-effort conversion of a free-text date to 'YYYY-MM-DD'. Returns None if unparseable."""
+    if not value:
+        return None
+    text = value.strip()
+    for fmt in DATE_INPUT_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).strftime("%Y-%m-%d")
+        except ValueError:
+            continue
+    return None
+
+def normalize_date(value: Optional[str]) -> str:
+    """Strict version of to_iso_date for user input. Raises ValueError if the date is missing or invalid."""
+    iso = to_iso_date(value)
+    if iso is None:
+        raise ValueError(f"Invalid date '{value or ''}'. Please use YYYY-MM-DD.")
+    return iso
+
+# Placeholders a log template may contain; each entry gets its own values (see render_log_template)
+TEMPLATE_FIELDS = re.compile(r"\{(date|weekday|project)\}")
+
+def render_log_template(content: str, project_name: str, date_iso: str) -> str:
+    """Fills {date}, {weekday} and {project}. Other braces are left as typed."""
+    values = {"date": date_iso, "weekday": datetime.strptime(date_iso, "%Y-%m-%d").strftime("%A"), "project": project_name}
+    return TEMPLATE_FIELDS.sub(lambda match: values[match.group(1)], content)
+
+@dataclass(slots=True)
 class Project:
     name: str
     priority: int
@@ -12,18 +47,60 @@ class Project:
     thumbnail_path: Optional[str] = None 
     id: Optional[int] = None
 
-@dataclass
+@dataclass(slots=True)
 class LogEntry:
     content: str
     project_id: int
     timestamp: str
     id: Optional[int] = None
 
-@dataclass
+@dataclass(slots=True)
 class Attachment:
     file_path: str
     log_id: Optional[int] = None      # Can now be None if linked only to project/global
     project_id: Optional[int] = None  # NEW: Direct link to project
     is_global: bool = False           # NEW: Toggle for global availability
     is_thumbnail: bool = False
-    id: Optional[int] = None
\ No newline at end of file
+    id: Optional[int] = None
+    # Captured at ingest (see image_ingest.read_metadata); None where unknown
+    original_name: Optional[str] = None  # Source file name before it became ref_<time>_<id>.png
+    width: Optional[int] = None          # Stored image, upright
+    height: Optional[int] = None
+    taken_at: Optional[str] = None       # EXIF capture time, 'YYYY-MM-DDTHH:MM:SS'
+    byte_size: Optional[int] = None      # Stored file size
+
+@dataclass(slots=True)
+class Collection:
+    """A named group of attachments (tag). Projects subscribe to collections to see their media."""
+    name: str
+    id: Optional[int] = None
+
+@dataclass(slots=True)
+class LogTemplate:
+    """Reusable log text, e.g. a stand-up skeleton; may contain {date}, {weekday} and {project}."""
+    name: str
+    content: str
+    id: Optional[int] = None
+
+@dataclass(slots=True)
+class Change:
+    """One change_journal entry: a row of `entity` (a table name) was inserted, updated or deleted."""
+    seq: int                  # Monotonic cursor for changes_since()
+    entity: str
+    entity_id: int
+    op: str                   # 'insert' | 'update' | 'delete'
+    changed_at: str           # UTC, ISO 8601
+    payload: dict             # The row after the change (before it, for deletes)
+
+@dataclass(slots=True)
+class ProjectQuery:
+    """Sort and filter options for the project list. None means 'no filter'."""
+    sort_by: str = "priority"             # See DatabaseManager.PROJECT_SORT_KEYS
+    descending: bool = True
+    min_priority: Optional[int] = None
+    max_priority: Optional[int] = None
+    due_from: Optional[str] = None        # Inclusive, 'YYYY-MM-DD'
+    due_to: Optional[str] = None          # Inclusive, 'YYYY-MM-DD'
+    text: Optional[str] = None            # Substring match on the project name
+    has_thumbnail: Optional[bool] = None
+    limit: Optional[int] = None
@@ -0,0 +1,587 @@
+# --- encryption.py ---
+"""
+Optional encryption at rest for a workspace: its media files and the log
+text in its database. Everything else (names, dates, ids) stays plain so
+the existing indexes, sorting and reports keep working.
+
+Key: every encrypted workspace has a random 256-bit data key, stored next
+to the database in <db>.key wrapped with AES-GCM under a key derived from a
+passphrase (scrypt). Changing the passphrase rewraps that key; the data is
+never re-encrypted. The key is unlocked once per process (a prompt in the
+GUI, or PROMAN_PASSPHRASE) and every DatabaseManager of that workspace in
+the process picks it up.
+
+Media files keep their names and are encrypted in 64 KiB chunks with
+AES-256-GCM:
+
+    header   b"PMENC1" + 8-byte random nonce prefix
+    chunk i  ciphertext + 16-byte tag; nonce = prefix + i (4 bytes, big endian),
+             associated data = header + 1 byte "last chunk" flag
+
+Chunks can't be reordered (the index is in the nonce), moved to another
+file (the prefix is per file) or cut off or extended (only the last chunk
+carries the flag). Readers decrypt one chunk at a time and can seek, so
+Pillow reads headers and decodes scaled previews without the whole file in
+memory, exactly as it does with plain files.
+
+Log content is stored as "enc1:" + base64(nonce + ciphertext + tag). Rows
+without that prefix are read as they are, so a workspace can be converted
+in place, a batch at a time. Decrypted text is kept in a bounded in-memory
+cache keyed by the stored value (every write has a fresh nonce, so an entry
+can never go stale); searches scan that cache instead of using LIKE.
+
+Needs the "cryptography" package, only when a workspace is encrypted.
+
+    python encryption.py [--workspace NAME] status
+    python encryption.py [--workspace NAME] enable
+    python encryption.py [--workspace NAME] disable
+    python encryption.py [--workspace NAME] passphrase
+"""
+
+import argparse
+import base64
+import getpass
+import io
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+KEY_SUFFIX = ".key"
+KEY_FORMAT = "proman-key"
+KEY_VERSION = 1
+KEY_AAD = b"proman-key-v1"
+SCRYPT_N, SCRYPT_R, SCRYPT_P = 2 ** 15, 8, 1  # ~32 MiB and ~0.1 s per unlock
+SCRYPT_MAXMEM = 64 * 1024 * 1024
+
+MEDIA_MAGIC = b"PMENC1"
+MEDIA_HEADER_SIZE = len(MEDIA_MAGIC) + 8
+MEDIA_CHUNK = 64 * 1024
+TAG_SIZE = 16
+
+SEALED_PREFIX = "enc1:"
+LOG_AAD = b"proman-log"
+PLAINTEXT_CACHE_BYTES = 32 * 1024 * 1024
+
+CONVERT_BATCH = 500
+
+
+class EncryptionError(Exception):
+    """Base class: the workspace's encryption can't do what was asked."""
+
+
+class WorkspaceLockedError(EncryptionError):
+    """The workspace is encrypted and its key has not been unlocked in this process."""
+
+
+class WrongPassphraseError(EncryptionError):
+    pass
+
+
+class TamperedDataError(EncryptionError):
+    """Encrypted data failed authentication: modified, truncated or from another workspace."""
+
+
+def _aesgcm():
+    try:
+        from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+    except ImportError:
+        raise EncryptionError("Encrypted workspaces need the 'cryptography' package (pip install cryptography).")
+    return AESGCM
+
+
+def _invalid_tag():
+    from cryptography.exceptions import InvalidTag
+    return InvalidTag
+
+
+# --- KEY FILE ---
+
+def key_path_for(db_path: str) -> str:
+    return os.path.abspath(db_path) + KEY_SUFFIX
+
+
+def is_encrypted(db_path: str) -> bool:
+    return os.path.exists(key_path_for(db_path))
+
+
+def _derive(passphrase: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+    import hashlib
+    return hashlib.scrypt(passphrase.encode("utf-8"), salt=salt, n=n, r=r, p=p, maxmem=SCRYPT_MAXMEM, dklen=32)
+
+
+def _write_key_file(key_path: str, data_key: bytes, key_id: str, passphrase: str):
+    salt, nonce = os.urandom(16), os.urandom(12)
+    wrapped = _aesgcm()(_derive(passphrase, salt, SCRYPT_N, SCRYPT_R, SCRYPT_P)).encrypt(nonce, data_key, KEY_AAD)
+    record = {"format": KEY_FORMAT, "version": KEY_VERSION, "key_id": key_id,
+              "kdf": {"name": "scrypt", "n": SCRYPT_N, "r": SCRYPT_R, "p": SCRYPT_P, "salt": base64.b64encode(salt).decode("ascii")},
+              "nonce": base64.b64encode(nonce).decode("ascii"), "wrapped_key": base64.b64encode(wrapped).decode("ascii")}
+    temp_path = key_path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(record, f, indent=4)
+    os.replace(temp_path, key_path)
+
+
+def _read_key_file(key_path: str, passphrase: str) -> tuple:
+    """(data key, key id) from a key file; WrongPassphraseError when the passphrase does not open it."""
+    with open(key_path, "r", encoding="utf-8") as f:
+        record = json.load(f)
+    if record.get("format") != KEY_FORMAT or record.get("version", 0) > KEY_VERSION:
+        raise EncryptionError(f"Not a supported ProMan key file: {key_path}")
+    kdf = record["kdf"]
+    kek = _derive(passphrase, base64.b64decode(kdf["salt"]), kdf["n"], kdf["r"], kdf["p"])
+    try:
+        data_key = _aesgcm()(kek).decrypt(base64.b64decode(record["nonce"]), base64.b64decode(record["wrapped_key"]), KEY_AAD)
+    except _invalid_tag():
+        raise WrongPassphraseError("Wrong passphrase for this workspace.")
+    return data_key, record["key_id"]
+
+
+# Unlocked keys of this process: key file path -> WorkspaceCipher
+_unlocked: Dict[str, "WorkspaceCipher"] = {}
+_unlocked_lock = threading.Lock()
+
+
+def create_key(db_path: str, passphrase: str) -> "WorkspaceCipher":
+    """Makes a new data key for the workspace of db_path (refuses to replace one) and unlocks it."""
+    key_path = key_path_for(db_path)
+    if os.path.exists(key_path):
+        raise EncryptionError(f"{key_path} already exists.")
+    if not passphrase:
+        raise EncryptionError("The passphrase must not be empty.")
+    data_key, key_id = secrets.token_bytes(32), uuid.uuid4().hex
+    _write_key_file(key_path, data_key, key_id, passphrase)
+    cipher = WorkspaceCipher(data_key, key_id)
+    with _unlocked_lock:
+        _unlocked[key_path] = cipher
+    return cipher
+
+
+def unlock(db_path: str, passphrase: str) -> "WorkspaceCipher":
+    key_path = key_path_for(db_path)
+    data_key, key_id = _read_key_file(key_path, passphrase)
+    with _unlocked_lock:
+        if key_path not in _unlocked or _unlocked[key_path].key_id != key_id:
+            _unlocked[key_path] = WorkspaceCipher(data_key, key_id)
+        return _unlocked[key_path]
+
+
+def cipher_for(db_path: str) -> Optional["WorkspaceCipher"]:
+    """The workspace's unlocked key: unlocked earlier in this process, else via PROMAN_PASSPHRASE, else None."""
+    key_path = key_path_for(db_path)
+    with _unlocked_lock:
+        if key_path in _unlocked:
+            return _unlocked[key_path]
+    if os.path.exists(key_path) and os.environ.get("PROMAN_PASSPHRASE"):
+        return unlock(db_path, os.environ["PROMAN_PASSPHRASE"])
+    return None
+
+
+def forget_key(db_path: str):
+    with _unlocked_lock:
+        _unlocked.pop(key_path_for(db_path), None)
+
+
+def change_passphrase(db_path: str, old_passphrase: str, new_passphrase: str):
+    """Rewraps the data key under a new passphrase (the data itself is untouched)."""
+    if not new_passphrase:
+        raise EncryptionError("The passphrase must not be empty.")
+    key_path = key_path_for(db_path)
+    data_key, key_id = _read_key_file(key_path, old_passphrase)
+    _write_key_file(key_path, data_key, key_id, new_passphrase)
+
+
+# --- CIPHER ---
+
+class WorkspaceCipher:
+    """One workspace's data key: log text sealing (with the plaintext cache) and media streams."""
+
+    def __init__(self, data_key: bytes, key_id: str, cache_bytes: int = PLAINTEXT_CACHE_BYTES):
+        self.aead = _aesgcm()(data_key)
+        self.key_id = key_id
+        self.cache_bytes = cache_bytes
+        self._plaintext: "OrderedDict[str, str]" = OrderedDict()
+        self._cached_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    # --- log text ---
+
+    def encrypt_text(self, text: str) -> str:
+        nonce = os.urandom(12)
+        sealed = SEALED_PREFIX + base64.b64encode(nonce + self.aead.encrypt(nonce, text.encode("utf-8"), LOG_AAD)).decode("ascii")
+        self._remember(sealed, text)  # The row is usually read back right away
+        return sealed
+
+    def decrypt_text(self, stored: str) -> str:
+        """Plain text for a stored value; values without the prefix are returned as they are."""
+        if not stored.startswith(SEALED_PREFIX):
+            return stored
+        with self._lock:
+            text = self._plaintext.get(stored)
+            if text is not None:
+                self._plaintext.move_to_end(stored)
+                self.hits += 1
+                return text
+            self.misses += 1
+        raw = base64.b64decode(stored[len(SEALED_PREFIX):])
+        try:
+            text = self.aead.decrypt(raw[:12], raw[12:], LOG_AAD).decode("utf-8")
+        except _invalid_tag():
+            raise TamperedDataError("A log entry failed authentication (modified, or encrypted with another key).")
+        self._remember(stored, text)
+        return text
+
+    def _remember(self, stored: str, text: str):
+        size = len(stored) + len(text)
+        if size > self.cache_bytes:
+            return
+        with self._lock:
+            if stored in self._plaintext:
+                return
+            self._plaintext[stored] = text
+            self._cached_bytes += size
+            while self._cached_bytes > self.cache_bytes:
+                old_stored, old_text = self._plaintext.popitem(last=False)
+                self._cached_bytes -= len(old_stored) + len(old_text)
+
+    def clear_cache(self):
+        with self._lock:
+            self._plaintext.clear()
+            self._cached_bytes = 0
+
+    def cache_stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._plaintext), "bytes": self._cached_bytes, "hits": self.hits, "misses": self.misses}
+
+    # --- media ---
+
+    def _chunk_nonce(self, prefix: bytes, index: int) -> bytes:
+        return prefix + index.to_bytes(4, "big")
+
+    def seal_chunk(self, header: bytes, index: int, data: bytes, last: bool) -> bytes:
+        return self.aead.encrypt(self._chunk_nonce(header[len(MEDIA_MAGIC):], index), data, header + (b"\x01" if last else b"\x00"))
+
+    def open_chunk(self, header: bytes, index: int, sealed: bytes, last: bool) -> bytes:
+        try:
+            return self.aead.decrypt(self._chunk_nonce(header[len(MEDIA_MAGIC):], index), sealed, header + (b"\x01" if last else b"\x00"))
+        except _invalid_tag():
+            raise TamperedDataError(f"Chunk {index} failed authentication (modified, truncated or encrypted with another key).")
+
+
+class MediaWriter(io.RawIOBase):
+    """
+    Encrypts everything written into path. Data goes to path + ".partial" and replaces
+    path on close, so readers never see half a file; an exception inside `with` discards it.
+    """
+
+    def __init__(self, path: str, cipher: WorkspaceCipher):
+        super().__init__()
+        self.name = path
+        self.cipher = cipher
+        self.partial = path + ".partial"
+        self.header = MEDIA_MAGIC + os.urandom(8)
+        self.buffer = bytearray()
+        self.index = 0
+        self.file = open(self.partial, "wb")
+        self.file.write(self.header)
+
+    def writable(self):
+        return True
+
+    def write(self, data) -> int:
+        self.buffer += data
+        # A full chunk is only sealed once more data follows: the last one needs the flag
+        while len(self.buffer) > MEDIA_CHUNK:
+            self.file.write(self.cipher.seal_chunk(self.header, self.index, bytes(self.buffer[:MEDIA_CHUNK]), False))
+            del self.buffer[:MEDIA_CHUNK]
+            self.index += 1
+        return len(data)
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            self.file.write(self.cipher.seal_chunk(self.header, self.index, bytes(self.buffer), True))
+            self.file.close()
+            os.replace(self.partial, self.name)
+        finally:
+            super().close()
+
+    def abort(self):
+        if not self.closed:
+            self.file.close()
+            os.remove(self.partial)
+            super().close()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            self.abort()
+        else:
+            self.close()
+
+
+def _sealed_size_to_plain(stored_size: int) -> int:
+    body = stored_size - MEDIA_HEADER_SIZE
+    chunks = max(1, -(-body // (MEDIA_CHUNK + TAG_SIZE)))
+    return body - chunks * TAG_SIZE
+
+
+class MediaReader(io.RawIOBase):
+    """Seekable plaintext view of an encrypted media file; decrypts (and verifies) one chunk at a time."""
+
+    def __init__(self, path: str, cipher: WorkspaceCipher):
+        super().__init__()
+        self.name = path
+        self.cipher = cipher
+        self.file = open(path, "rb")
+        self.header = self.file.read(MEDIA_HEADER_SIZE)
+        if len(self.header) != MEDIA_HEADER_SIZE or not self.header.startswith(MEDIA_MAGIC):
+            self.file.close()
+            raise TamperedDataError(f"{os.path.basename(path)} is not an encrypted media file.")
+        self.size = _sealed_size_to_plain(os.fstat(self.file.fileno()).st_size)
+        if self.size < 0:
+            self.file.close()
+            raise TamperedDataError(f"{os.path.basename(path)} is truncated.")
+        self.last_index = max(0, -(-self.size // MEDIA_CHUNK) - 1)
+        self.position = 0
+        self.chunk_index = -1
+        self.chunk = b""
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self.position
+        elif whence == io.SEEK_END:
+            offset += self.size
+        if offset < 0:
+            raise ValueError("negative seek position")
+        self.position = offset
+        return offset
+
+    def _load(self, index: int):
+        self.file.seek(MEDIA_HEADER_SIZE + index * (MEDIA_CHUNK + TAG_SIZE))
+        sealed = self.file.read(MEDIA_CHUNK + TAG_SIZE)
+        self.chunk = self.cipher.open_chunk(self.header, index, sealed, index == self.last_index)
+        self.chunk_index = index
+
+    def readinto(self, buffer) -> int:
+        if self.position >= self.size:
+            return 0
+        index, offset = divmod(self.position, MEDIA_CHUNK)
+        if index != self.chunk_index:
+            self._load(index)
+        count = min(len(buffer), len(self.chunk) - offset)
+        buffer[:count] = self.chunk[offset:offset + count]
+        self.position += count
+        return count
+
+    def close(self):
+        if not self.closed:
+            self.file.close()
+        super().close()
+
+
+# --- MEDIA FILES ---
+
+def is_encrypted_file(path: str) -> bool:
+    with open(path, "rb") as f:
+        return f.read(len(MEDIA_MAGIC)) == MEDIA_MAGIC
+
+
+def media_size(path: str) -> int:
+    """The file's plaintext size (its size on disk minus the encryption overhead, if any)."""
+    size = os.path.getsize(path)
+    return _sealed_size_to_plain(size) if is_encrypted_file(path) else size
+
+
+def open_media(path: str, cipher: Optional[WorkspaceCipher] = None):
+    """A binary file object with the plaintext of path, encrypted or not."""
+    if not is_encrypted_file(path):
+        return open(path, "rb")
+    if cipher is None:
+        raise WorkspaceLockedError(f"{os.path.basename(path)} is encrypted and the workspace is locked.")
+    return io.BufferedReader(MediaReader(path, cipher), MEDIA_CHUNK)
+
+
+def create_media(path: str, cipher: Optional[WorkspaceCipher] = None):
+    """A writable binary file object for a new media file: encrypted when cipher is given."""
+    return MediaWriter(path, cipher) if cipher is not None else open(path, "wb")
+
+
+def read_media(path: str, cipher: Optional[WorkspaceCipher] = None) -> bytes:
+    with open_media(path, cipher) as f:
+        return f.read()
+
+
+def _rewrite_file(path: str, reader, cipher: Optional[WorkspaceCipher]):
+    """Streams reader into a new file (encrypted when cipher is given) and swaps it in for path."""
+    converted = path + ".convert"
+    try:
+        with reader as src, create_media(converted, cipher) as dst:
+            for chunk in iter(lambda: src.read(MEDIA_CHUNK), b""):
+                dst.write(chunk)
+    except BaseException:
+        if os.path.exists(converted):
+            os.remove(converted)
+        raise
+    os.replace(converted, path)  # Only once the source is closed (Windows can't replace an open file)
+
+
+def encrypt_file(path: str, cipher: WorkspaceCipher) -> bool:
+    """Encrypts a plain media file in place; False when it already was."""
+    if is_encrypted_file(path):
+        return False
+    _rewrite_file(path, open(path, "rb"), cipher)
+    return True
+
+
+def decrypt_file(path: str, cipher: WorkspaceCipher) -> bool:
+    """Decrypts a media file in place; False when it was plain."""
+    if not is_encrypted_file(path):
+        return False
+    _rewrite_file(path, io.BufferedReader(MediaReader(path, cipher), MEDIA_CHUNK), None)
+    return True
+
+
+# --- CONVERTING A WORKSPACE ---
+
+def _media_files(conn: sqlite3.Connection) -> List[str]:
+    """Every media file rows (including trashed ones) point at."""
+    rows = conn.execute("SELECT file_path FROM attachment UNION SELECT thumbnail_path FROM project WHERE thumbnail_path IS NOT NULL")
+    return sorted({path for (path,) in rows if path and os.path.exists(path)})
+
+
+def _convert(db, transform: Callable[[str], str], sealed: bool, file_step: Callable[[str], bool],
+             progress: Optional[Callable[[str, int, int], None]]) -> dict:
+    """Rewrites log text (and the copies in the journal and sync conflicts) with transform, then every media file."""
+    progress = progress or (lambda stage, done, total: None)
+    summary = {"logs": 0, "journal": 0, "conflicts": 0, "files": 0}
+
+    def todo(expression):
+        # Values still to convert: not sealed yet when encrypting, sealed when decrypting
+        return f"substr({expression}, 1, {len(SEALED_PREFIX)}) {'!=' if sealed else '='} '{SEALED_PREFIX}'"
+
+    def payload_update(table, key, column, condition):
+        content = f"json_extract({column}, '$.content')"
+        return (f"UPDATE {table} SET {column} = json_set({column}, '$.content', proman_convert({content})) WHERE {key} IN "
+                f"(SELECT {key} FROM {table} WHERE {condition} AND {content} IS NOT NULL AND {todo(content)} LIMIT {CONVERT_BATCH})")
+
+    with db.connect() as conn:
+        conn.execute("PRAGMA secure_delete = ON")  # Overwrite the old text instead of leaving it in free space
+        conn.create_function("proman_convert", 1, transform)
+        statements = [
+            ("logs", f"UPDATE log SET content = proman_convert(content) WHERE log_id IN "
+                     f"(SELECT log_id FROM log WHERE {todo('content')} LIMIT {CONVERT_BATCH})"),
+            ("journal", payload_update("change_journal", "seq", "payload", "entity = 'log'")),
+            ("conflicts", payload_update("sync_conflict", "conflict_id", "local_payload", "entity = 'log'")),
+            ("conflicts", payload_update("sync_conflict", "conflict_id", "remote_payload", "entity = 'log'")),
+        ]
+        for key, sql in statements:
+            while True:
+                changed = conn.execute(sql).rowcount
+                conn.commit()
+                summary[key] += changed
+                progress(key, summary[key], 0)
+                if changed < CONVERT_BATCH:
+                    break
+        paths = _media_files(conn)
+    for done, path in enumerate(paths, start=1):
+        summary["files"] += file_step(path)
+        progress("files", done, len(paths))
+    with db.connect() as conn:
+        conn.execute("VACUUM")  # Pages freed before encryption was enabled may still hold old text
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    if db.cache is not None:
+        db.cache.clear()
+    return summary
+
+
+def encrypt_workspace(db, cipher: WorkspaceCipher, progress=None) -> dict:
+    """Encrypts every log text and media file of db's workspace that is still plain (safe to re-run)."""
+    db.set_cipher(cipher)
+    return _convert(db, cipher.encrypt_text, True, lambda path: encrypt_file(path, cipher), progress)
+
+
+def decrypt_workspace(db, cipher: WorkspaceCipher, progress=None) -> dict:
+    """Turns an encrypted workspace back into plain files and text; the key file is removed last."""
+    summary = _convert(db, cipher.decrypt_text, False, lambda path: decrypt_file(path, cipher), progress)
+    os.remove(key_path_for(db.db_path))
+    forget_key(db.db_path)
+    db.set_cipher(None)
+    return summary
+
+
+def workspace_status(db) -> dict:
+    with db.connect() as conn:
+        sealed, total = conn.execute(
+            f"SELECT TOTAL(substr(content, 1, {len(SEALED_PREFIX)}) = '{SEALED_PREFIX}'), COUNT(*) FROM log").fetchone()
+        paths = _media_files(conn)
+    encrypted_files = sum(is_encrypted_file(path) for path in paths)
+    return {"encrypted": is_encrypted(db.db_path), "key_file": key_path_for(db.db_path),
+            "logs_encrypted": int(sealed), "logs_plain": total - int(sealed), "files_encrypted": encrypted_files, "files_plain": len(paths) - encrypted_files}
+
+
+def main():
+    from db_controller import DatabaseManager
+    from workspaces import WorkspaceConfig
+
+    parser = argparse.ArgumentParser(description="Encrypt a workspace's media and log text at rest.")
+    parser.add_argument("--workspace", default=None, help="Workspace from proman.json (default: the active one)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("status", help="Show whether the workspace is encrypted and what is still plain")
+    commands.add_parser("enable", help="Create the key and encrypt everything (re-run to finish an interrupted run)")
+    commands.add_parser("disable", help="Decrypt everything and remove the key")
+    commands.add_parser("passphrase", help="Change the passphrase")
+    args = parser.parse_args()
+
+    workspace = WorkspaceConfig().get(args.workspace)
+    db = DatabaseManager(db_path=workspace.db_path)
+
+    def ask(prompt, confirm=False):
+        passphrase = os.environ.get("PROMAN_PASSPHRASE") if not confirm else None
+        if passphrase:
+            return passphrase
+        passphrase = getpass.getpass(prompt)
+        if confirm and getpass.getpass("Repeat it: ") != passphrase:
+            raise SystemExit("The passphrases differ.")
+        return passphrase
+
+    def report(stage, done, total):
+        print(f"\r{stage}: {done}" + (f"/{total}" if total else ""), end="", flush=True)
+
+    if args.command == "status":
+        for key, value in workspace_status(db).items():
+            print(f"{key:<16} {value}")
+    elif args.command == "enable":
+        if is_encrypted(db.db_path):
+            cipher = db.cipher or unlock(db.db_path, ask("Passphrase: "))
+        else:
+            cipher = create_key(db.db_path, ask("New passphrase: ", confirm=True))
+            print(f"Key written to {key_path_for(db.db_path)}. Without the passphrase the data can't be recovered.")
+        print(f"\nEncrypted: {encrypt_workspace(db, cipher, report)}")
+    elif args.command == "disable":
+        if not is_encrypted(db.db_path):
+            raise SystemExit("This workspace is not encrypted.")
+        cipher = db.cipher or unlock(db.db_path, ask("Passphrase: "))
+        print(f"\nDecrypted: {decrypt_workspace(db, cipher, report)}")
+    elif args.command == "passphrase":
+        change_passphrase(db.db_path, getpass.getpass("Current passphrase: "), ask("New passphrase: ", confirm=True))
+        print("Passphrase changed.")
+
+
+if __name__ == "__main__":
+    main()
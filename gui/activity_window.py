@@ -0,0 +1,110 @@
+# --- gui/activity_window.py ---
+
+import tkinter as tk
+from tkinter import ttk, filedialog, messagebox
+from datetime import date, timedelta
+
+from PIL import ImageTk
+
+from analytics import render_heatmap, render_timeline
+
+# Label -> days back from today (None = since the first entry)
+RANGES = {"Last 3 months": 91, "Last year": 365, "Last 2 years": 730, "All time": None}
+
+class ActivityWindow:
+    """Logging activity across projects: calendar heatmap, weekly timeline and per-project streaks."""
+
+    def __init__(self, parent, controller):
+        self.controller = controller
+        self.window = tk.Toplevel(parent)
+        self.window.title("ProMan - Activity")
+        self.window.geometry("980x620")
+
+        # --- TOP BAR ---
+        top_bar = ttk.Frame(self.window)
+        top_bar.pack(fill='x', padx=10, pady=(10, 0))
+        ttk.Label(top_bar, text="Range:").pack(side='left')
+        self.range_var = tk.StringVar(value="Last year")
+        range_box = ttk.Combobox(top_bar, textvariable=self.range_var, values=list(RANGES), state="readonly", width=14)
+        range_box.pack(side='left', padx=5)
+        range_box.bind("<<ComboboxSelected>>", lambda e: self.refresh())
+        self.summary_label = ttk.Label(top_bar, text="", style="Orange.TLabel")
+        self.summary_label.pack(side='left', padx=15)
+
+        # --- IMAGES ---
+        notebook = ttk.Notebook(self.window)
+        notebook.pack(fill='x', padx=10, pady=10)
+        self.heatmap_label = ttk.Label(notebook)
+        self.timeline_label = ttk.Label(notebook)
+        notebook.add(self.heatmap_label, text="Calendar")
+        notebook.add(self.timeline_label, text="Timeline")
+        self.notebook = notebook
+
+        # --- PER-PROJECT TABLE ---
+        cols = ("Project", "Entries", "Active days", "Streak", "Best streak", "Longest gap", "Last entry")
+        self.tree = ttk.Treeview(self.window, columns=cols, show='headings')
+        for col in cols:
+            self.tree.heading(col, text=col)
+            self.tree.column(col, width=90, anchor='e')
+        self.tree.column("Project", width=300, anchor='w')
+        self.tree.column("Last entry", width=100, anchor='w')
+        self.tree.pack(fill='both', expand=True, padx=10)
+        self.tree.bind('<Double-1>', self.open_selected)
+
+        # --- FOOTER ---
+        btn_frame = ttk.Frame(self.window)
+        btn_frame.pack(fill='x', pady=10)
+        ttk.Button(btn_frame, text="Close", command=self.close).pack(side='right', padx=10)
+        ttk.Button(btn_frame, text="Save Image...", command=self.save_clicked).pack(side='right')
+        ttk.Button(btn_frame, text="Refresh", command=self.refresh).pack(side='right', padx=10)
+
+        self.report = None
+        self.images = {}
+        self.photos = []  # Tk drops images without a Python reference
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+        # New logs from other instances, the API or a sync show up without reopening
+        self.controller.add_change_listener(self.refresh)
+        self.refresh()
+
+    def refresh(self):
+        days = RANGES[self.range_var.get()]
+        start = "" if days is None else (date.today() - timedelta(days=days - 1)).isoformat()
+        self.report = self.controller.get_activity_report(start)
+
+        self.images = {"Calendar": render_heatmap(self.report), "Timeline": render_timeline(self.report)}
+        self.photos = [ImageTk.PhotoImage(self.images["Calendar"]), ImageTk.PhotoImage(self.images["Timeline"])]
+        self.heatmap_label.config(image=self.photos[0])
+        self.timeline_label.config(image=self.photos[1])
+
+        active = sum(1 for count in self.report.daily if count)
+        self.summary_label.config(text=f"{self.report.total_entries} entries on {active} of {len(self.report.daily)} days")
+        self.tree.delete(*self.tree.get_children())
+        for a in self.report.projects:
+            self.tree.insert("", "end", iid=str(a.project_id), values=(
+                a.name, a.entries, a.active_days, a.current_streak, a.longest_streak, a.longest_gap, a.last_day))
+
+    def open_selected(self, event=None):
+        selection = self.tree.selection()
+        if selection:
+            self.close()
+            self.controller.open_project_detail_window(int(selection[0]))
+
+    def save_clicked(self):
+        tab = self.notebook.tab(self.notebook.select(), "text")
+        path = filedialog.asksaveasfilename(
+            parent=self.window,
+            title=f"Save {tab} Image",
+            defaultextension=".png",
+            filetypes=[("PNG Image", "*.png")]
+        )
+        if not path:
+            return
+        try:
+            self.images[tab].save(path)
+        except OSError as e:
+            print(f"Activity image save failed: {e}")
+            messagebox.showerror("Save Error", f"Could not save the image:\n{e}", parent=self.window)
+
+    def close(self):
+        self.controller.remove_change_listener(self.refresh)
+        self.window.destroy()
@@ -1,62 +1,272 @@
 # --- gui/attachment_manager.py ---
 
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, simpledialog
 import os
+import threading
+
+from attachment_metadata import format_byte_size
+from image_hash import SIMILAR_DISTANCE
+
+PAGE_SIZE = 500          # Rows fetched per SQL page
+LOAD_MORE_AT = 0.9       # Fetch the next page once the scrollbar passes this fraction
+
+# Column heading -> sort key understood by DatabaseManager.get_attachments_page
+SORT_COLUMNS = {"ID": "id", "Filename": "filename", "Original Name": "original_name", "Taken": "taken_at",
+                "Size": "size", "Dimensions": "dimensions", "Scope": "scope", "Project ID": "project_id"}
+SCOPE_FILTERS = {"All": None, "Global": True, "Project Specific": False}
 
 class AttachmentManager:
     def __init__(self, parent, controller):
         self.controller = controller
         self.window = tk.Toplevel(parent)
         self.window.title("Attachment Manager (Batch Edit)")
-        self.window.geometry("600x400")
-        
-        # Table (Treeview)
-        cols = ("ID", "Filename", "Scope", "Project ID")
-        self.tree = ttk.Treeview(self.window, columns=cols, show='headings')
+        self.window.geometry("980x450")
+
+        # Paging / sorting state. Rows are only fetched as the user scrolls.
+        self.sort_by = "id"
+        self.sort_descending = False
+        self.loaded_rows = 0
+        self.total_rows = 0
+        self._filter_after_id = None
+
+        # Filter bar
+        filter_frame = ttk.Frame(self.window)
+        filter_frame.pack(fill='x', padx=10, pady=(10, 0))
+
+        # Matches the stored name, the original name and the date taken
+        ttk.Label(filter_frame, text="Search:").pack(side='left')
+        self.filter_var = tk.StringVar()
+        ttk.Entry(filter_frame, textvariable=self.filter_var, width=25).pack(side='left', padx=(2, 10))
+        self.filter_var.trace_add("write", lambda *args: self._schedule_refresh())
+
+        ttk.Label(filter_frame, text="Scope:").pack(side='left')
+        self.scope_var = tk.StringVar(value="All")
+        scope_combo = ttk.Combobox(filter_frame, textvariable=self.scope_var, values=list(SCOPE_FILTERS), state="readonly", width=16)
+        scope_combo.pack(side='left', padx=2)
+        scope_combo.bind("<<ComboboxSelected>>", lambda e: self.refresh_list())
+
+        # Table (Treeview) - multi-select, sortable headings, item id = attachment id
+        cols = ("ID", "Filename", "Original Name", "Taken", "Size", "Dimensions", "Scope", "Project ID", "Match")
+        table_frame = ttk.Frame(self.window)
+        table_frame.pack(fill='both', expand=True, padx=10, pady=10)
+
+        self.tree = ttk.Treeview(table_frame, columns=cols, show='headings', selectmode='extended')
         for col in cols:
-            self.tree.heading(col, text=col)
+            self.tree.heading(col, text=col, command=(lambda c=col: self.sort_by_column(c)) if col in SORT_COLUMNS else "")
             self.tree.column(col, width=100)
-        self.tree.pack(fill='both', expand=True, padx=10, pady=10)
-        
+        self.tree.column("ID", width=50)
+        self.tree.column("Filename", width=170)
+        self.tree.column("Original Name", width=170)
+        self.tree.column("Taken", width=130)
+        self.tree.column("Size", width=70, anchor='e')
+        self.tree.column("Dimensions", width=80, anchor='e')
+        self.tree.column("Match", width=70)  # Filled in by Find Similar / Find Duplicates
+
+        self.scrollbar = ttk.Scrollbar(table_frame, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=self.on_tree_scrolled)
+        self.tree.pack(side='left', fill='both', expand=True)
+        self.scrollbar.pack(side='right', fill='y')
+
         # Buttons
         btn_frame = ttk.Frame(self.window)
         btn_frame.pack(fill='x', pady=10)
-        
+
         ttk.Button(btn_frame, text="Toggle Global or Project", command=self.toggle_scope).pack(side='left', padx=10)
         ttk.Button(btn_frame, text="Delete Selected", command=self.delete_selected).pack(side='left', padx=10)
         ttk.Button(btn_frame, text="Refresh", command=self.refresh_list).pack(side='right', padx=10)
 
+        self.status_label = ttk.Label(btn_frame, text="")
+        self.status_label.pack(side='right', padx=10)
+
+        # Sharing: link to more projects / tag into collections without copying anything
+        share_frame = ttk.Frame(self.window)
+        share_frame.pack(fill='x', pady=(0, 10))
+        ttk.Button(share_frame, text="Link to Project...", command=self.link_selected).pack(side='left', padx=10)
+        ttk.Button(share_frame, text="Add to Collection...", command=self.add_selected_to_collection).pack(side='left', padx=10)
+        # Perceptual hash search; "Refresh" returns to the full list
+        ttk.Button(share_frame, text="Find Duplicates", command=self.find_duplicates_clicked).pack(side='right', padx=10)
+        ttk.Button(share_frame, text="Find Similar", command=self.find_similar_clicked).pack(side='right')
+
         self.refresh_list()
 
+        # Reload when another instance changes the database; stop listening once closed
+        self.controller.add_change_listener(self.refresh_list)
+        self.window.bind("<Destroy>", self._on_destroy)
+
+    def _on_destroy(self, event):
+        if event.widget is self.window:
+            self.controller.remove_change_listener(self.refresh_list)
+
+    # --- LOADING (virtualized) ---
+
+    def _current_filter(self):
+        return self.filter_var.get().strip() or None, SCOPE_FILTERS.get(self.scope_var.get())
+
     def refresh_list(self):
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-            
-        atts = self.controller.get_all_attachments_for_manager()
+        """Clears the table and loads only the first page; more pages load on scroll."""
+        self.tree.delete(*self.tree.get_children())  # One Tcl call instead of one per row
+        text, is_global = self._current_filter()
+        self.total_rows = self.controller.count_attachments(text, is_global)
+        self.loaded_rows = 0
+        self.load_next_page()
+
+    def load_next_page(self):
+        if self.loaded_rows >= self.total_rows:
+            return
+        text, is_global = self._current_filter()
+        atts = self.controller.get_attachments_page(self.loaded_rows, PAGE_SIZE, self.sort_by, self.sort_descending, text, is_global)
         for a in atts:
-            scope = "GLOBAL" if a.is_global else "Project Specific"
-            fname = os.path.basename(a.file_path)
-            self.tree.insert("", "end", values=(a.id, fname, scope, a.project_id if a.project_id else "N/A"))
+            self.tree.insert("", "end", iid=str(a.id), values=self._row_values(a))
+        self.loaded_rows += len(atts)
+        if not atts:
+            self.total_rows = self.loaded_rows  # Rows vanished underneath us
+        self._update_status()
 
-    def toggle_scope(self):
-        selected = self.tree.selection()
-        if not selected: return
-        
-        item = self.tree.item(selected[0])
-        att_id = item['values'][0]
-        scope_text = item['values'][2]
-        is_global = (scope_text == "GLOBAL")
-        
-        self.controller.toggle_attachment_global(att_id, is_global)
+    def _row_values(self, a, match=""):
+        scope = "GLOBAL" if a.is_global else "Project Specific"
+        dimensions = f"{a.width}x{a.height}" if a.width else ""
+        return (a.id, os.path.basename(a.file_path), a.original_name or "", (a.taken_at or "").replace("T", " "),
+                format_byte_size(a.byte_size), dimensions, scope, a.project_id if a.project_id else "N/A", match)
+
+    def on_tree_scrolled(self, first, last):
+        self.scrollbar.set(first, last)
+        if float(last) >= LOAD_MORE_AT and self.loaded_rows < self.total_rows:
+            self.load_next_page()
+
+    def _update_status(self):
+        self.status_label.config(text=f"Showing {self.loaded_rows} of {self.total_rows}")
+
+    def _schedule_refresh(self):
+        # Debounce typing in the filter box
+        if self._filter_after_id is not None:
+            self.window.after_cancel(self._filter_after_id)
+        self._filter_after_id = self.window.after(250, self._run_scheduled_refresh)
+
+    def _run_scheduled_refresh(self):
+        self._filter_after_id = None
         self.refresh_list()
 
+    def sort_by_column(self, column):
+        key = SORT_COLUMNS[column]
+        if self.sort_by == key:
+            self.sort_descending = not self.sort_descending
+        else:
+            self.sort_by, self.sort_descending = key, False
+        self.refresh_list()
+
+    # --- BATCH ACTIONS (one transaction each, rows updated in place) ---
+
+    def _selected_ids(self):
+        return [int(iid) for iid in self.tree.selection()]
+
+    def toggle_scope(self):
+        att_ids = self._selected_ids()
+        if not att_ids: return
+
+        self.controller.toggle_attachments_scope(att_ids)
+
+        for att_id in att_ids:
+            values = list(self.tree.item(str(att_id), 'values'))
+            values[6] = "Project Specific" if values[6] == "GLOBAL" else "GLOBAL"
+            self.tree.item(str(att_id), values=values)
+
     def delete_selected(self):
-        selected = self.tree.selection()
-        if not selected: return
-        
-        if messagebox.askyesno("Confirm", "Delete selected attachment?"):
-            item = self.tree.item(selected[0])
-            att_id = item['values'][0]
-            self.controller.delete_attachment(att_id)
-            self.refresh_list()
\ No newline at end of file
+        att_ids = self._selected_ids()
+        if not att_ids: return
+
+        noun = "attachment" if len(att_ids) == 1 else f"{len(att_ids)} attachments"
+        if messagebox.askyesno("Confirm", f"Delete selected {noun}?", parent=self.window):
+            self.controller.delete_attachments(att_ids)
+            self.tree.delete(*self.tree.selection())
+            self.loaded_rows -= len(att_ids)
+            self.total_rows -= len(att_ids)
+            self._update_status()
+
+    def link_selected(self):
+        att_ids = self._selected_ids()
+        if not att_ids: return
+
+        pid = simpledialog.askinteger("Link to Project", "Project ID to share the selected attachments with:", parent=self.window)
+        if pid is None: return
+        try:
+            self.controller.link_attachments_to_project(att_ids, pid)
+        except ValueError as e:
+            messagebox.showerror("Link Failed", str(e), parent=self.window)
+            return
+        self.status_label.config(text=f"Linked {len(att_ids)} to project {pid}")
+
+    def add_selected_to_collection(self):
+        att_ids = self._selected_ids()
+        if not att_ids: return
+
+        existing = ", ".join(c.name for c in self.controller.get_collections())
+        name = simpledialog.askstring("Add to Collection", f"Collection name (new or existing):\n{existing}", parent=self.window)
+        if not name or not name.strip(): return
+        self.controller.add_attachments_to_collection(att_ids, name.strip())
+        # Adding to "Global" changes the Scope column
+        self.refresh_list()
+
+    # --- SIMILARITY (perceptual hashes) ---
+
+    def find_similar_clicked(self):
+        att_ids = self._selected_ids()
+        if len(att_ids) != 1:
+            messagebox.showinfo("Find Similar", "Select one attachment first.", parent=self.window)
+            return
+        self._with_hashes(lambda: self._show_similar(att_ids[0]))
+
+    def find_duplicates_clicked(self):
+        self._with_hashes(self._show_duplicates)
+
+    def _with_hashes(self, then):
+        """Hashes attachments that have no hash yet on a worker thread (progress in the status line), then calls then()."""
+        progress = {"done": 0, "total": 0}
+        result = {}
+
+        def worker():
+            try:
+                result["summary"] = self.controller.backfill_image_hashes(lambda done, total: progress.update(done=done, total=total))
+            except Exception as e:
+                result["error"] = e
+
+        thread = threading.Thread(target=worker, daemon=True)
+        thread.start()
+
+        def poll():
+            if not self.window.winfo_exists():
+                return
+            if thread.is_alive():
+                if progress["total"]:
+                    self.status_label.config(text=f"Hashing images {progress['done']}/{progress['total']}...")
+                self.window.after(200, poll)
+                return
+            if "error" in result:
+                print(f"Image hashing failed: {result['error']}")
+                messagebox.showerror("Hashing Failed", str(result["error"]), parent=self.window)
+                return
+            then()
+
+        poll()
+
+    def _show_results(self, rows, status):
+        """Replaces the table with (Attachment, match) rows. Batch actions work on them; Refresh restores the list."""
+        self.tree.delete(*self.tree.get_children())
+        for a, match in rows:
+            self.tree.insert("", "end", iid=str(a.id), values=self._row_values(a, match))
+        self.loaded_rows = self.total_rows = len(rows)
+        self.status_label.config(text=status)
+
+    def _show_similar(self, att_id):
+        matches = self.controller.find_similar_attachments(att_id, SIMILAR_DISTANCE)
+        if matches is None:
+            messagebox.showwarning("Find Similar", f"Attachment {att_id} could not be hashed (is its file missing?).", parent=self.window)
+            return
+        probe = self.controller.get_attachment(att_id)
+        rows = ([(probe, "selected")] if probe else []) + [(a, f"{distance} bits") for a, distance in matches]
+        self._show_results(rows, f"{len(matches)} similar to #{att_id}")
+
+    def _show_duplicates(self):
+        groups = self.controller.find_duplicate_attachments()
+        rows = [(a, f"group {number}") for number, group in enumerate(groups, start=1) for a in group]
+        self._show_results(rows, f"{len(groups)} duplicate groups, {len(rows)} files")
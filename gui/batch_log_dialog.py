@@ -0,0 +1,152 @@
+# --- gui/batch_log_dialog.py ---
+
+import tkinter as tk
+from datetime import datetime
+from tkinter import ttk, messagebox, simpledialog
+
+NO_TEMPLATE = "(none)"
+
+class BatchLogDialog:
+    """
+    Writes one log entry to one or many projects in a single commit, optionally starting
+    from a saved template. {date}, {weekday} and {project} are filled in per project.
+    """
+
+    def __init__(self, parent, controller, projects, selected_ids=(), on_done=None):
+        self.controller = controller
+        self.projects = list(projects)
+        self.on_done = on_done
+        self.templates = {}
+
+        self.dialog = tk.Toplevel(parent)
+        self.dialog.title("New Log Entry" if len(self.projects) == 1 else "Batch Log Entry")
+        self.dialog.transient(parent)
+        self.dialog.grab_set()
+
+        main_frame = ttk.Frame(self.dialog, padding="15")
+        main_frame.pack(fill='both', expand=True)
+
+        # Project picker (hidden when the entry is for one given project)
+        self.project_list = None
+        if len(self.projects) > 1:
+            list_frame = ttk.Frame(main_frame)
+            list_frame.pack(side='left', fill='y', padx=(0, 15))
+            ttk.Label(list_frame, text="Projects:").pack(anchor='w')
+            self.project_list = tk.Listbox(list_frame, selectmode=tk.EXTENDED, exportselection=False, width=32, height=18)
+            scrollbar = ttk.Scrollbar(list_frame, orient='vertical', command=self.project_list.yview)
+            self.project_list.config(yscrollcommand=scrollbar.set)
+            select_frame = ttk.Frame(list_frame)
+            select_frame.pack(side='bottom', fill='x', pady=(5, 0))
+            ttk.Button(select_frame, text="All", command=lambda: self.select_projects(True)).pack(side='left')
+            ttk.Button(select_frame, text="None", command=lambda: self.select_projects(False)).pack(side='left', padx=5)
+            self.project_list.pack(side='left', fill='y')
+            scrollbar.pack(side='left', fill='y')
+            selected = set(selected_ids)
+            for i, project in enumerate(self.projects):
+                self.project_list.insert(tk.END, project.name)
+                if project.id in selected:
+                    self.project_list.selection_set(i)
+            self.project_list.bind("<<ListboxSelect>>", lambda e: self.update_add_button())
+
+        entry_frame = ttk.Frame(main_frame)
+        entry_frame.pack(side='left', fill='both', expand=True)
+
+        top = ttk.Frame(entry_frame)
+        top.pack(fill='x')
+        ttk.Label(top, text="Date:").pack(side='left')
+        self.date_var = tk.StringVar(value=datetime.now().strftime("%Y-%m-%d"))
+        ttk.Entry(top, textvariable=self.date_var, width=12).pack(side='left', padx=(5, 15))
+        ttk.Label(top, text="Template:").pack(side='left')
+        self.template_var = tk.StringVar(value=NO_TEMPLATE)
+        self.template_combo = ttk.Combobox(top, textvariable=self.template_var, state="readonly", width=22)
+        self.template_combo.pack(side='left', padx=5)
+        self.template_combo.bind("<<ComboboxSelected>>", lambda e: self.apply_template())
+
+        self.text = tk.Text(entry_frame, width=60, height=14, wrap='word', undo=True)
+        self.text.pack(fill='both', expand=True, pady=(10, 5))
+        ttk.Label(entry_frame, text="{date}, {weekday} and {project} are filled in for each project.").pack(anchor='w')
+
+        btn_frame = ttk.Frame(entry_frame)
+        btn_frame.pack(fill='x', pady=(10, 0))
+        ttk.Button(btn_frame, text="Save as Template...", command=self.save_template).pack(side='left')
+        ttk.Button(btn_frame, text="Delete Template", command=self.delete_template).pack(side='left', padx=5)
+        ttk.Button(btn_frame, text="Cancel", command=self.dialog.destroy).pack(side='right')
+        self.add_btn = ttk.Button(btn_frame, text="Add", command=self.add_clicked)
+        self.add_btn.pack(side='right', padx=5)
+
+        self.load_templates()
+        self.update_add_button()
+        self.text.focus_set()
+
+    # --- Templates ---
+
+    def load_templates(self):
+        self.templates = {t.name: t for t in self.controller.get_log_templates()}
+        self.template_combo.config(values=[NO_TEMPLATE] + list(self.templates))
+        if self.template_var.get() not in self.templates:
+            self.template_var.set(NO_TEMPLATE)
+
+    def apply_template(self):
+        template = self.templates.get(self.template_var.get())
+        if template is None:
+            return
+        if self.current_text() and not messagebox.askyesno("Replace Text", "Replace the current text with the template?", parent=self.dialog):
+            return
+        self.text.delete("1.0", tk.END)
+        self.text.insert("1.0", template.content)
+
+    def save_template(self):
+        content = self.current_text()
+        if not content:
+            messagebox.showwarning("Empty Template", "Type the template text first.", parent=self.dialog)
+            return
+        current = self.template_var.get()
+        name = simpledialog.askstring("Save Template", "Template name:", parent=self.dialog,
+                                      initialvalue="" if current == NO_TEMPLATE else current)
+        if not name or not name.strip():
+            return
+        self.controller.save_log_template(name.strip(), content)
+        self.template_var.set(name.strip())
+        self.load_templates()
+
+    def delete_template(self):
+        template = self.templates.get(self.template_var.get())
+        if template and messagebox.askyesno("Delete Template", f"Delete the template '{template.name}'?", parent=self.dialog):
+            self.controller.delete_log_template(template.id)
+            self.load_templates()
+
+    # --- Entry ---
+
+    def current_text(self) -> str:
+        return self.text.get("1.0", "end-1c").strip()
+
+    def selected_projects(self):
+        if self.project_list is None:
+            return self.projects
+        return [self.projects[i] for i in self.project_list.curselection()]
+
+    def select_projects(self, everything):
+        if everything:
+            self.project_list.selection_set(0, tk.END)
+        else:
+            self.project_list.selection_clear(0, tk.END)
+        self.update_add_button()
+
+    def update_add_button(self):
+        count = len(self.selected_projects())
+        self.add_btn.config(text="Add" if self.project_list is None else f"Add to {count} Project{'s' if count != 1 else ''}",
+                            state="normal" if count else "disabled")
+
+    def add_clicked(self):
+        content = self.current_text()
+        if not content:
+            messagebox.showwarning("Empty Entry", "Please enter the log text.", parent=self.dialog)
+            return
+        try:
+            added = self.controller.add_log_entries([p.id for p in self.selected_projects()], self.date_var.get(), content)
+        except ValueError as e:
+            messagebox.showerror("Invalid Entry", str(e), parent=self.dialog)
+            return
+        self.dialog.destroy()
+        if self.on_done:
+            self.on_done(added)
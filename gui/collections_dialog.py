@@ -0,0 +1,40 @@
+# --- gui/collections_dialog.py ---
+
+import tkinter as tk
+from tkinter import ttk
+
+class CollectionsDialog:
+    """Lets a project subscribe/unsubscribe to attachment collections (including 'Global')."""
+
+    def __init__(self, parent, controller, project, on_close=None):
+        self.controller = controller
+        self.project = project
+        self.on_close = on_close
+
+        self.dialog = tk.Toplevel(parent)
+        self.dialog.title(f"Collections: {project.name}")
+        self.dialog.transient(parent)
+        self.dialog.grab_set()
+        self.dialog.protocol("WM_DELETE_WINDOW", self.close)
+
+        main_frame = ttk.Frame(self.dialog, padding="15")
+        main_frame.pack(fill='both', expand=True)
+        ttk.Label(main_frame, text="Show media from these collections:").pack(anchor='w', pady=(0, 5))
+
+        subscribed = set(self.controller.get_project_collection_ids(project.id))
+        self.vars = {}
+        for collection in self.controller.get_collections():
+            var = tk.BooleanVar(value=collection.id in subscribed)
+            self.vars[collection.id] = var
+            ttk.Checkbutton(main_frame, text=collection.name, variable=var,
+                            command=lambda cid=collection.id: self.toggle(cid)).pack(anchor='w')
+
+        ttk.Button(main_frame, text="Close", command=self.close).pack(pady=(10, 0))
+
+    def toggle(self, collection_id):
+        self.controller.set_project_subscription(self.project.id, collection_id, self.vars[collection_id].get())
+
+    def close(self):
+        self.dialog.destroy()
+        if self.on_close:
+            self.on_close()
@@ -0,0 +1,108 @@
+# --- gui/debug_panel.py ---
+
+import tkinter as tk
+from tkinter import ttk, filedialog, messagebox
+
+class DebugPanel:
+    """Read-only view of the instrumentation data: timings, slow queries, errors and cache stats."""
+
+    def __init__(self, parent, controller):
+        self.controller = controller
+        self.window = tk.Toplevel(parent)
+        self.window.title("ProMan - Debug Panel")
+        self.window.geometry("900x500")
+
+        notebook = ttk.Notebook(self.window)
+        notebook.pack(fill='both', expand=True, padx=10, pady=(10, 0))
+
+        # --- TAB 1: TIMINGS ---
+        timing_cols = ("Category", "Name", "Count", "Avg ms", "Max ms", "Total ms")
+        self.timing_tree = ttk.Treeview(notebook, columns=timing_cols, show='headings')
+        for col in timing_cols:
+            self.timing_tree.heading(col, text=col)
+            self.timing_tree.column(col, width=80, anchor='e')
+        self.timing_tree.column("Category", anchor='w')
+        self.timing_tree.column("Name", width=420, anchor='w')
+        notebook.add(self.timing_tree, text="Timings")
+
+        # --- TAB 2: SLOW QUERIES (plan shown below the list) ---
+        slow_frame = ttk.Frame(notebook)
+        self.slow_tree = ttk.Treeview(slow_frame, columns=("ms", "At", "SQL"), show='headings', height=10)
+        self.slow_tree.heading("ms", text="ms")
+        self.slow_tree.heading("At", text="At")
+        self.slow_tree.heading("SQL", text="SQL")
+        self.slow_tree.column("ms", width=70, anchor='e')
+        self.slow_tree.column("At", width=140)
+        self.slow_tree.column("SQL", width=600)
+        self.slow_tree.pack(fill='both', expand=True)
+        self.slow_tree.bind('<<TreeviewSelect>>', self.on_slow_query_selected)
+        self.plan_text = tk.Text(slow_frame, height=6, bg="#3E3E3E", fg="white", font=("Consolas", 10))
+        self.plan_text.pack(fill='x', pady=(5, 0))
+        notebook.add(slow_frame, text="Slow Queries")
+
+        # --- TAB 3: ERRORS ---
+        self.error_tree = ttk.Treeview(notebook, columns=("At", "Category", "Message"), show='headings')
+        for col, width in (("At", 140), ("Category", 80), ("Message", 600)):
+            self.error_tree.heading(col, text=col)
+            self.error_tree.column(col, width=width)
+        notebook.add(self.error_tree, text="Errors")
+
+        # --- FOOTER ---
+        btn_frame = ttk.Frame(self.window)
+        btn_frame.pack(fill='x', pady=10)
+        self.cache_label = ttk.Label(btn_frame, text="")
+        self.cache_label.pack(side='left', padx=10)
+        ttk.Button(btn_frame, text="Export JSON", command=self.export_clicked).pack(side='right', padx=10)
+        ttk.Button(btn_frame, text="Reset", command=self.reset_clicked).pack(side='right')
+        ttk.Button(btn_frame, text="Refresh", command=self.refresh).pack(side='right', padx=10)
+
+        self.slow_queries = []
+        self.refresh()
+
+    def refresh(self):
+        report = self.controller.get_profiling_report()
+
+        self.timing_tree.delete(*self.timing_tree.get_children())
+        for category, metrics in report["timings"].items():
+            # Slowest first inside each category
+            for name, stats in sorted(metrics.items(), key=lambda kv: kv[1]["total_ms"], reverse=True):
+                self.timing_tree.insert("", "end", values=(category, name, stats["count"], stats["avg_ms"], stats["max_ms"], stats["total_ms"]))
+
+        self.slow_queries = list(reversed(report["slow_queries"]))
+        self.slow_tree.delete(*self.slow_tree.get_children())
+        for i, entry in enumerate(self.slow_queries):
+            self.slow_tree.insert("", "end", iid=str(i), values=(entry["ms"], entry["at"], entry["sql"]))
+        self.plan_text.delete("1.0", tk.END)
+
+        self.error_tree.delete(*self.error_tree.get_children())
+        for entry in reversed(report["errors"]):
+            self.error_tree.insert("", "end", values=(entry["at"], entry["category"], entry["message"]))
+
+        cache = report.get("cache") or {}
+        if cache:
+            self.cache_label.config(text=f"Cache: {cache['entries']} entries, hit rate {cache['hit_rate']:.0%} ({cache['hits']}/{cache['hits'] + cache['misses']})")
+        else:
+            self.cache_label.config(text="Cache: disabled")
+
+    def on_slow_query_selected(self, event):
+        selected = self.slow_tree.selection()
+        if not selected: return
+        entry = self.slow_queries[int(selected[0])]
+        self.plan_text.delete("1.0", tk.END)
+        self.plan_text.insert(tk.END, f"params: {', '.join(entry['params'])}\n")
+        self.plan_text.insert(tk.END, "\n".join(entry["plan"]) or "(no plan captured)")
+
+    def reset_clicked(self):
+        self.controller.instrumentation.reset()
+        self.refresh()
+
+    def export_clicked(self):
+        path = filedialog.asksaveasfilename(
+            parent=self.window,
+            title="Export Profiling Report",
+            defaultextension=".json",
+            filetypes=(("JSON", "*.json"), ("All files", "*.*"))
+        )
+        if path:
+            self.controller.export_profiling_report(path)
+            messagebox.showinfo("Exported", f"Profiling report saved to:\n{path}", parent=self.window)
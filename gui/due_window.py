@@ -0,0 +1,88 @@
+# --- gui/due_window.py ---
+
+import tkinter as tk
+from tkinter import ttk
+
+TOAST_MS = 12000
+
+class DueWindow:
+    """Overdue projects and those due in the next 7 days. Double-click opens a project."""
+
+    def __init__(self, parent, controller):
+        self.controller = controller
+        self.window = tk.Toplevel(parent)
+        self.window.title("ProMan - Due Dates")
+        self.window.geometry("560x460")
+
+        self.trees = {}
+        for key, title in (("overdue", "Overdue"), ("this_week", "Due this week")):
+            label = ttk.Label(self.window, text=title, style="Orange.TLabel")
+            label.pack(anchor='w', padx=10, pady=(10, 2))
+            tree = ttk.Treeview(self.window, columns=("Due", "Priority", "Name"), show='headings', height=7)
+            for col, width, anchor in (("Due", 100, 'w'), ("Priority", 70, 'e'), ("Name", 360, 'w')):
+                tree.heading(col, text=col)
+                tree.column(col, width=width, anchor=anchor)
+            tree.pack(fill='both', expand=True, padx=10)
+            tree.bind('<Double-1>', lambda e, t=tree: self.open_selected(t))
+            self.trees[key] = (tree, label, title)
+
+        btn_frame = ttk.Frame(self.window)
+        btn_frame.pack(fill='x', pady=10)
+        ttk.Button(btn_frame, text="Close", command=self.close).pack(side='right', padx=10)
+        ttk.Button(btn_frame, text="Refresh", command=self.refresh).pack(side='right')
+
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+        # Projects edited elsewhere (other instance, API, sync) move between the lists
+        self.controller.add_change_listener(self.refresh)
+        self.refresh()
+
+    def refresh(self):
+        overview = self.controller.get_due_overview()
+        for key, (tree, label, title) in self.trees.items():
+            tree.delete(*tree.get_children())
+            for project in overview[key]:
+                tree.insert("", "end", iid=str(project.id), values=(project.due_date, project.priority, project.name))
+            label.config(text=f"{title} ({len(overview[key])})")
+
+    def open_selected(self, tree):
+        selection = tree.selection()
+        if selection:
+            self.close()
+            self.controller.open_project_detail_window(int(selection[0]))
+
+    def close(self):
+        self.controller.remove_change_listener(self.refresh)
+        self.window.destroy()
+
+
+class ReminderToast:
+    """Small borderless popup in the bottom-right corner listing reminders that just fired."""
+
+    def __init__(self, root, reminders, on_open=None):
+        self.window = tk.Toplevel(root)
+        self.window.overrideredirect(True)
+        self.window.attributes("-topmost", True)
+
+        frame = ttk.Frame(self.window, style="ProjectTile.TFrame", padding=10)
+        frame.pack(fill='both', expand=True)
+        ttk.Label(frame, text="⏰ Due date reminder", style="Orange.TLabel").pack(anchor='w')
+        for reminder in reminders[:5]:
+            ttk.Label(frame, text=reminder.describe()).pack(anchor='w')
+        if len(reminders) > 5:
+            ttk.Label(frame, text=f"... and {len(reminders) - 5} more").pack(anchor='w')
+
+        btn_frame = ttk.Frame(frame)
+        btn_frame.pack(fill='x', pady=(8, 0))
+        ttk.Button(btn_frame, text="Dismiss", command=self.window.destroy).pack(side='right')
+        if on_open:
+            ttk.Button(btn_frame, text="Show", command=lambda: (self.window.destroy(), on_open())).pack(side='right', padx=5)
+
+        self.window.update_idletasks()
+        x = root.winfo_screenwidth() - self.window.winfo_reqwidth() - 20
+        y = root.winfo_screenheight() - self.window.winfo_reqheight() - 60
+        self.window.geometry(f"+{x}+{y}")
+        self.window.after(TOAST_MS, self.dismiss)
+
+    def dismiss(self):
+        if self.window.winfo_exists():
+            self.window.destroy()
@@ -1,10 +1,27 @@
 import tkinter as tk
-from tkinter import ttk, messagebox
-from tkinter import PhotoImage
+from tkinter import ttk, messagebox, filedialog, simpledialog
 import os 
+import time
+import threading
+from datetime import date, timedelta
 # Assuming ttkthemes is available, but using standard ttk.Style commands
 from ttkthemes import ThemedStyle 
 
+from db_models import ProjectQuery
+from encryption import EncryptionError
+
+# Filter bar choices: label -> (sort key, descending by default)
+SORT_OPTIONS = {
+    "Priority": ("priority", True),
+    "Due Date": ("due_date", False),
+    "Name": ("name", False),
+    "Log Count": ("log_count", True),
+    "Last Activity": ("last_activity", True),
+    "Attachments": ("attachment_count", True),
+}
+DUE_WINDOW_OPTIONS = ("Any", "Overdue", "Due in 7 days", "Due in 30 days")
+MIN_PRIORITY_OPTIONS = ("Any", "3", "2", "1")
+
 class MainWindow:
     def __init__(self, root, controller):
         self.root = root
@@ -47,18 +64,21 @@ class MainWindow:
         # CRITICAL: We save self.left_frame so we can identify it in the scroll handler
         self.left_frame = ttk.Frame(outer_frame)
         self.left_frame.grid(row=0, column=0, sticky="nsew", padx=(0, 0)) 
-        self.left_frame.grid_rowconfigure(1, weight=1) 
+        self.left_frame.grid_rowconfigure(2, weight=1) 
         self.left_frame.grid_columnconfigure(0, weight=1) 
         
         ttk.Label(self.left_frame, text="Your Projects (Click to Select):").grid(row=0, column=0, sticky="w", pady=(0, 5))
         
+        # --- FILTER BAR (Row 1) ---
+        self.create_filter_bar()
+        
         # Scrollable Canvas setup (self.canvas is created here!)
         self.canvas = tk.Canvas(self.left_frame, borderwidth=0, bg=LIST_BG_COLOR)
         self.scrollbar = ttk.Scrollbar(self.left_frame, orient="vertical", command=self.canvas.yview)
         self.project_display_frame = ttk.Frame(self.canvas, style="DarkList.TFrame")
         
-        self.canvas.grid(row=1, column=0, sticky="nsew") 
-        self.scrollbar.grid(row=1, column=1, sticky="ns")
+        self.canvas.grid(row=2, column=0, sticky="nsew") 
+        self.scrollbar.grid(row=2, column=1, sticky="ns")
         
         self.canvas.configure(yscrollcommand=self.scrollbar.set)
         self.canvas_window = self.canvas.create_window((0, 0), 
@@ -84,6 +104,10 @@ class MainWindow:
         buttons_container = ttk.Frame(outer_frame)
         buttons_container.grid(row=0, column=1, sticky="nw", padx=2, pady=(25, 0)) 
 
+        # 0. Workspace switcher (only when the app was started with a workspace config)
+        if self.controller.workspaces:
+            self.create_workspace_bar(buttons_container)
+
         # 1. Open Project Button
         self.open_project_btn = ttk.Button(
             buttons_container, 
@@ -121,6 +145,14 @@ class MainWindow:
         )
         self.edit_project_btn.pack(fill='x', pady=(0, 5), padx=10)
 
+        # One log entry (or a template) for many projects at once, e.g. stand-up notes
+        ttk.Button(
+            buttons_container,
+            text="📝 Batch Log Entry",
+            command=self.batch_log_clicked,
+            style="LeftAnchor.TButton"
+        ).pack(fill='x', pady=(0, 5), padx=10)
+
         # 5. Delete Project Button
         self.delete_project_btn = ttk.Button(
             buttons_container, 
@@ -131,8 +163,192 @@ class MainWindow:
         )
         self.delete_project_btn.pack(fill='x', pady=(0, 5), padx=10)
 
+        # Undo / redo deletions (projects, log dates, attachments); also Ctrl+Z / Ctrl+Y
+        undo_row = ttk.Frame(buttons_container)
+        undo_row.pack(fill='x', pady=(0, 5), padx=10)
+        self.undo_btn = ttk.Button(undo_row, text="↶ Undo", command=self.undo_clicked, state="disabled")
+        self.undo_btn.pack(side='left', fill='x', expand=True)
+        self.redo_btn = ttk.Button(undo_row, text="↷ Redo", command=self.redo_clicked, state="disabled")
+        self.redo_btn.pack(side='left', fill='x', expand=True, padx=(5, 0))
+        self.root.bind("<Control-z>", lambda e: self.undo_clicked())
+        self.root.bind("<Control-y>", lambda e: self.redo_clicked())
+        self.root.bind("<Control-Z>", lambda e: self.redo_clicked())  # Ctrl+Shift+Z
+
+        # Overdue / due this week
+        ttk.Button(
+            buttons_container,
+            text="⏰ Due Dates",
+            command=self.controller.open_due_window,
+            style="LeftAnchor.TButton"
+        ).pack(fill='x', pady=(0, 5), padx=10)
+
+        # Logging activity over time
+        ttk.Button(
+            buttons_container,
+            text="📊 Activity",
+            command=self.controller.open_activity_window,
+            style="LeftAnchor.TButton"
+        ).pack(fill='x', pady=(0, 5), padx=10)
+
+        # 6. Archives: move projects + media between machines
+        ttk.Button(
+            buttons_container,
+            text="📦 Export Archive",
+            command=self.export_archive_clicked,
+            style="LeftAnchor.TButton"
+        ).pack(fill='x', pady=(0, 5), padx=10)
+
+        ttk.Button(
+            buttons_container,
+            text="📥 Import Archive",
+            command=self.import_archive_clicked,
+            style="LeftAnchor.TButton"
+        ).pack(fill='x', pady=(0, 5), padx=10)
+
+        # 7. Sync with another ProMan (desktop <-> laptop) through bundle files
+        ttk.Button(
+            buttons_container,
+            text="🔄 Export Sync Bundle",
+            command=self.export_sync_clicked,
+            style="LeftAnchor.TButton"
+        ).pack(fill='x', pady=(0, 5), padx=10)
+
+        ttk.Button(
+            buttons_container,
+            text="🔄 Import Sync Bundle",
+            command=self.import_sync_clicked,
+            style="LeftAnchor.TButton"
+        ).pack(fill='x', pady=(0, 5), padx=10)
+
+        # Hidden developer tool: timings, slow queries and cache stats
+        self.root.bind("<F12>", lambda e: self.controller.open_debug_panel())
+
         self.refresh_project_list() 
 
+        # Another instance (or a script) changed the database: redraw, keeping the selection
+        self.controller.add_change_listener(self.on_external_change)
+
+    # --- Filter Bar ---
+
+    def create_filter_bar(self):
+        """Search, priority, due-window, thumbnail and sort controls. Every change re-queries SQLite."""
+        filter_frame = ttk.Frame(self.left_frame)
+        filter_frame.grid(row=1, column=0, columnspan=2, sticky="ew", pady=(0, 5))
+
+        self.search_var = tk.StringVar()
+        self.min_priority_var = tk.StringVar(value=MIN_PRIORITY_OPTIONS[0])
+        self.due_window_var = tk.StringVar(value=DUE_WINDOW_OPTIONS[0])
+        self.sort_var = tk.StringVar(value="Priority")
+        self.reverse_sort_var = tk.BooleanVar(value=False)
+        self.thumbnail_only_var = tk.BooleanVar(value=False)
+        self._search_after_id = None
+
+        ttk.Label(filter_frame, text="Search:").pack(side='left')
+        search_entry = ttk.Entry(filter_frame, textvariable=self.search_var, width=18)
+        search_entry.pack(side='left', padx=(2, 8))
+        # Debounce typing so we run one query per pause, not one per keystroke
+        self.search_var.trace_add("write", lambda *args: self._schedule_filter_refresh())
+
+        ttk.Label(filter_frame, text="Min Priority:").pack(side='left')
+        ttk.Combobox(filter_frame, textvariable=self.min_priority_var, values=MIN_PRIORITY_OPTIONS,
+                     state="readonly", width=4).pack(side='left', padx=(2, 8))
+
+        ttk.Label(filter_frame, text="Due:").pack(side='left')
+        ttk.Combobox(filter_frame, textvariable=self.due_window_var, values=DUE_WINDOW_OPTIONS,
+                     state="readonly", width=13).pack(side='left', padx=(2, 8))
+
+        ttk.Label(filter_frame, text="Sort:").pack(side='left')
+        ttk.Combobox(filter_frame, textvariable=self.sort_var, values=list(SORT_OPTIONS),
+                     state="readonly", width=12).pack(side='left', padx=(2, 2))
+        ttk.Checkbutton(filter_frame, text="Reverse", variable=self.reverse_sort_var,
+                        command=self.refresh_project_list).pack(side='left', padx=(0, 8))
+
+        ttk.Checkbutton(filter_frame, text="Has Thumbnail", variable=self.thumbnail_only_var,
+                        command=self.refresh_project_list).pack(side='left')
+
+        for combo in filter_frame.winfo_children():
+            if isinstance(combo, ttk.Combobox):
+                combo.bind("<<ComboboxSelected>>", lambda e: self.refresh_project_list())
+
+    def _schedule_filter_refresh(self):
+        if self._search_after_id is not None:
+            self.root.after_cancel(self._search_after_id)
+        self._search_after_id = self.root.after(250, self._run_scheduled_refresh)
+
+    def _run_scheduled_refresh(self):
+        self._search_after_id = None
+        self.refresh_project_list()
+
+    def build_project_query(self) -> ProjectQuery:
+        """Collects the filter bar state into a ProjectQuery."""
+        sort_key, descending = SORT_OPTIONS.get(self.sort_var.get(), SORT_OPTIONS["Priority"])
+        if self.reverse_sort_var.get():
+            descending = not descending
+
+        query = ProjectQuery(sort_by=sort_key, descending=descending)
+        query.text = self.search_var.get().strip() or None
+        if self.min_priority_var.get() != "Any":
+            query.min_priority = int(self.min_priority_var.get())
+        if self.thumbnail_only_var.get():
+            query.has_thumbnail = True
+
+        today = date.today()
+        window = self.due_window_var.get()
+        if window == "Overdue":
+            query.due_to = (today - timedelta(days=1)).isoformat()
+        elif window == "Due in 7 days":
+            query.due_from, query.due_to = today.isoformat(), (today + timedelta(days=7)).isoformat()
+        elif window == "Due in 30 days":
+            query.due_from, query.due_to = today.isoformat(), (today + timedelta(days=30)).isoformat()
+        return query
+
+    # --- Workspaces ---
+
+    def create_workspace_bar(self, parent):
+        ttk.Label(parent, text="Workspace:").pack(anchor='w', padx=10)
+        self.workspace_var = tk.StringVar(value=self.controller.get_active_workspace())
+        self.workspace_combo = ttk.Combobox(
+            parent, textvariable=self.workspace_var, values=self.controller.get_workspace_names(), state="readonly"
+        )
+        self.workspace_combo.pack(fill='x', pady=(0, 5), padx=10)
+        self.workspace_combo.bind("<<ComboboxSelected>>", lambda e: self.switch_workspace(self.workspace_var.get()))
+
+        ttk.Button(
+            parent,
+            text="➕ New Workspace",
+            command=self.new_workspace_clicked,
+            style="LeftAnchor.TButton"
+        ).pack(fill='x', pady=(0, 15), padx=10)
+
+    def switch_workspace(self, name):
+        if name == self.controller.get_active_workspace():
+            return
+        try:
+            self.controller.switch_workspace(name)
+        except Exception as e:
+            print(f"Workspace switch failed: {e}")
+            messagebox.showerror("Workspace Error", f"Could not open workspace '{name}':\n{e}")
+            self.workspace_var.set(self.controller.get_active_workspace())
+            return
+        self.root.title(f"ProMan - Project Selector [{name}]")
+        self.refresh_project_list()
+
+    def new_workspace_clicked(self):
+        name = simpledialog.askstring("New Workspace", "Workspace name:", parent=self.root)
+        if not name or not name.strip(): return
+        folder = filedialog.askdirectory(title="Folder for the workspace database and media")
+        if not folder: return
+        try:
+            self.controller.create_workspace(name.strip(), folder)
+        except Exception as e:
+            print(f"Workspace creation failed: {e}")
+            messagebox.showerror("Workspace Error", str(e))
+            return
+        self.workspace_combo.config(values=self.controller.get_workspace_names())
+        self.workspace_var.set(name.strip())
+        self.root.title(f"ProMan - Project Selector [{name.strip()}]")
+        self.refresh_project_list()
+
     # --- Button Handlers ---
 
     def open_project_clicked(self):
@@ -145,6 +361,73 @@ class MainWindow:
         else:
             messagebox.showwarning("No Selection", "Please select a project tile to edit.")
 
+    def export_archive_clicked(self):
+        """Exports the selected project, or every project when nothing is selected."""
+        scope = f"Project {self.selected_project_id}" if self.selected_project_id else "ALL projects"
+        path = filedialog.asksaveasfilename(
+            title=f"Export {scope}", defaultextension=".zip",
+            filetypes=[("ProMan Archive", "*.zip")]
+        )
+        if not path: return
+        project_ids = [self.selected_project_id] if self.selected_project_id else None
+        self._run_archive_job(lambda: self.controller.export_archive(path, project_ids), "Export")
+
+    def import_archive_clicked(self):
+        path = filedialog.askopenfilename(title="Import Archive", filetypes=[("ProMan Archive", "*.zip")])
+        if not path: return
+        self._run_archive_job(lambda: self.controller.import_archive(path), "Import")
+
+    def export_sync_clicked(self):
+        """Asks which peer the bundle is for; a blank answer makes a full snapshot (first sync)."""
+        peers = self.controller.get_sync_peer_names()
+        hint = f"Known: {', '.join(peers)}" if peers else "No peers yet"
+        peer = simpledialog.askstring("Export Sync Bundle", f"Bundle for which peer? Leave blank for a full bundle.\n({hint})", parent=self.root)
+        if peer is None: return
+        path = filedialog.asksaveasfilename(title="Export Sync Bundle", defaultextension=".zip",
+                                            filetypes=[("ProMan Sync Bundle", "*.zip")])
+        if not path: return
+        self._run_archive_job(lambda: self.controller.export_sync_bundle(path, peer.strip() or None), "Sync Export",
+                              lambda s: f"Changes: {s['changes']}\nMedia files: {s['media']}" + ("\n(full snapshot)" if s["snapshot"] else ""))
+
+    def import_sync_clicked(self):
+        path = filedialog.askopenfilename(title="Import Sync Bundle", filetypes=[("ProMan Sync Bundle", "*.zip")])
+        if not path: return
+        self._run_archive_job(lambda: self.controller.import_sync_bundle(path), "Sync Import",
+                              lambda s: f"Applied: {s['applied']}\nDeleted: {s['deleted']}\nUnchanged: {s['unchanged']}\n"
+                                        f"Skipped: {s['skipped']}\nConflicts: {s['conflicts']}"
+                                        + ("\n\nThe newer edit was kept; see 'python sync_engine.py conflicts'." if s["conflicts"] else ""))
+
+    def _run_archive_job(self, job, label, describe=None):
+        """Runs an archive or sync job off the Tk thread and polls for its result with after()."""
+        result = {}
+
+        def worker():
+            try:
+                result["summary"] = job()
+            except Exception as e:
+                result["error"] = e
+
+        thread = threading.Thread(target=worker, daemon=True)
+        thread.start()
+        self.root.config(cursor="watch")
+
+        def poll():
+            if thread.is_alive():
+                self.root.after(200, poll)
+                return
+            self.root.config(cursor="")
+            if "error" in result:
+                print(f"{label} failed: {result['error']}")
+                messagebox.showerror(f"{label} Failed", f"{result['error']}\n\nRe-running an interrupted import resumes where it stopped.")
+                return
+            summary = result["summary"]
+            text = describe(summary) if describe else f"Projects: {summary['projects']}\nLogs: {summary['logs']}\nAttachments: {summary['attachments']}"
+            messagebox.showinfo(f"{label} Complete", text)
+            if label in ("Import", "Sync Import"):
+                self.refresh_project_list()
+
+        self.root.after(200, poll)
+
     # --- Layout and Selection Logic ---
 
     def on_canvas_resize(self, event):
@@ -238,25 +521,64 @@ class MainWindow:
         """Prompts for confirmation and calls the delete flow."""
         if self.selected_project_id is not None:
             
-            if messagebox.askyesno("Confirm Deletion", f"Are you sure you want to permanently delete Project ID {self.selected_project_id} and ALL related data?"):
+            if messagebox.askyesno("Confirm Deletion", f"Delete Project ID {self.selected_project_id} and ALL related data?\n\nYou can undo this with Ctrl+Z."):
                 self.controller.delete_project_flow(self.selected_project_id)
         else:
             messagebox.showwarning("No Selection", "Please select a project tile to delete first.")
 
+    def batch_log_clicked(self):
+        """Offers the projects currently listed (filters apply), with the selected one ticked."""
+        projects = self.controller.get_projects_filtered(self.build_project_query())
+        if not projects:
+            messagebox.showwarning("No Projects", "No projects match the current filters.")
+            return
+        selected = [self.selected_project_id] if self.selected_project_id is not None else []
+        self.controller.open_batch_log_dialog(self.root, projects, selected, on_done=self.batch_log_done)
+
+    def batch_log_done(self, added):
+        print(f"Batch log entry added to {added} project(s).")
+        self.on_external_change()  # Log counts and last activity may reorder the list
+
+    def undo_clicked(self):
+        label = self.controller.undo()
+        if label:
+            print(f"Undone: {label}")
+        self.update_undo_buttons()
+
+    def redo_clicked(self):
+        label = self.controller.redo()
+        if label:
+            print(f"Redone: {label}")
+        self.update_undo_buttons()
+
+    def update_undo_buttons(self):
+        """Deletions from every window share one stack, so the controller calls this after each."""
+        self.undo_btn.config(state="normal" if self.controller.get_undo_label() else "disabled")
+        self.redo_btn.config(state="normal" if self.controller.get_redo_label() else "disabled")
+
 
     # --- Data Retrieval and Rendering ---
 
+    def on_external_change(self):
+        selected = self.selected_project_id
+        self.refresh_project_list()
+        if selected in self.project_frames:
+            self.select_project(selected, self.project_frames[selected])
+
     def refresh_project_list(self):
+        refresh_start = time.perf_counter()
         
         # 1. Clear existing frames and reset state
         for widget in self.project_display_frame.winfo_children():
             widget.destroy()
         self.project_image_references = [] 
+        self.project_frames = {}
         self.selected_project_id = None 
         self.last_selected_frame = None
         
         # Disable Buttons
         self.delete_project_btn.config(state="disabled")
+        self.update_undo_buttons()
 
         if hasattr(self, 'open_project_btn'):
             self.open_project_btn.config(state="disabled")
@@ -264,7 +586,7 @@ class MainWindow:
         if hasattr(self, 'edit_project_btn'):
             self.edit_project_btn.config(state="disabled")
         
-        projects = self.controller.get_all_projects_sorted()
+        projects = self.controller.get_projects_filtered(self.build_project_query())
         
         # 2. Draw a frame for each project
         for p in projects:
@@ -272,6 +594,7 @@ class MainWindow:
             project_frame = ttk.Frame(self.project_display_frame, 
                                       style="ProjectTile.TFrame") 
             project_frame.pack(fill='x', padx=5, pady=5)
+            self.project_frames[p.id] = project_frame
             
             # --- Image Display (Packed Right) ---
             image_label = tk.Label(project_frame) 
@@ -280,7 +603,7 @@ class MainWindow:
             if p.thumbnail_path and os.path.exists(p.thumbnail_path):
                 try:
                     # **CRITICAL: Load the image, then store the reference defensively**
-                    photo_obj = PhotoImage(file=p.thumbnail_path)
+                    photo_obj = self.controller.load_photo_image(p.thumbnail_path)
                     
                     # Store the reference on the widget itself
                     image_label.image = photo_obj 
@@ -291,7 +614,7 @@ class MainWindow:
                     
                     image_loaded = True
                     
-                except tk.TclError as e:
+                except (tk.TclError, EncryptionError) as e:
                     print(f"FATAL IMAGE LOAD ERROR (ID {p.id}): {e}")
                     pass 
 
@@ -363,4 +686,6 @@ class MainWindow:
 
         # 3. Update the scroll region
         self.project_display_frame.update_idletasks()
-        self.canvas.config(scrollregion=self.canvas.bbox("all"))
\ No newline at end of file
+        self.canvas.config(scrollregion=self.canvas.bbox("all"))
+        
+        self.controller.instrumentation.record("ui", "refresh_project_list", (time.perf_counter() - refresh_start) * 1000)
\ No newline at end of file
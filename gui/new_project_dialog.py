@@ -1,7 +1,7 @@
 # --- gui/new_project_dialog.py ---
 
 import tkinter as tk
-from tkinter import ttk, filedialog
+from tkinter import ttk, filedialog, messagebox
 from typing import Optional
 
 class NewProjectDialog:
@@ -118,7 +118,11 @@ class NewProjectDialog:
         image_path: Optional[str] = self.image_path_var.get() or None 
         
         if name and due_date:
-            self.controller.create_new_project(name, priority, due_date, image_path)
+            try:
+                self.controller.create_new_project(name, priority, due_date, image_path)
+            except ValueError as e:
+                messagebox.showerror("Invalid Date", str(e), parent=self.dialog)
+                return
             self.dialog.destroy()
         else:
             print("Error: Name and Due Date are required.")
\ No newline at end of file
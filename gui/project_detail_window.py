@@ -1,10 +1,29 @@
 import tkinter as tk
-from tkinter import ttk, PhotoImage, simpledialog, messagebox, filedialog
+from tkinter import ttk, PhotoImage, messagebox, filedialog
 import os
 import re 
 import platform
 import subprocess
-from datetime import datetime
+import time
+import queue
+from concurrent.futures import ThreadPoolExecutor
+from PIL import ImageTk
+
+from attachment_metadata import format_byte_size
+
+MEDIA_THUMB_WIDTH = 200      # Max width of a media pane preview
+MEDIA_PLACEHOLDER_HEIGHT = 120
+PRELOAD_MARGIN_PX = 400      # Also decode items this far outside the visible area
+DECODE_WORKERS = 2
+# Media pane order -> (DatabaseManager.ATTACHMENT_SORT_KEYS key, descending)
+MEDIA_SORTS = {
+    "Added": ("id", False),
+    "Newest": ("id", True),
+    "Name": ("original_name", False),
+    "Date taken": ("taken_at", True),
+    "Largest": ("size", True),
+    "Smallest": ("size", False),
+}
 
 class ProjectDetailWindow:
     def __init__(self, parent, controller, project):
@@ -15,6 +34,18 @@ class ProjectDetailWindow:
         # Map Attachment ID -> Widget Frame
         self.media_widgets = {} 
         
+        # --- Progressive media decoding state ---
+        # Decoding runs on worker threads; finished PIL images come back through
+        # decoded_queue and become PhotoImages on the Tk thread.
+        self.decode_executor = ThreadPoolExecutor(max_workers=DECODE_WORKERS)
+        self.decoded_queue = queue.Queue()
+        self.media_generation = 0      # Bumped on every load_media; stale results are dropped
+        self.pending_decodes = {}      # att_id -> Future
+        self.media_items = {}          # att_id -> (file_path, image label) still showing a placeholder
+        self._poll_after_id = None
+        self._visible_check_pending = False
+        self._media_filter_after_id = None
+        
         self.current_log_id = None 
         
         self.window = tk.Toplevel(parent)
@@ -24,10 +55,16 @@ class ProjectDetailWindow:
         self.style = ttk.Style()
         self.bg_color = self.style.lookup('TFrame', 'background')
         
+        # Cancel outstanding decodes as soon as the window goes away
+        self.window.bind("<Destroy>", self._on_window_destroyed, add="+")
+        
         self.create_layout()
         self.load_dates()
         self.load_media()
 
+        # Reload after undo/redo and when another instance changes the database; stop once closed
+        self.controller.add_change_listener(self.on_external_change)
+
     def create_layout(self):
         # Main Container
         main_frame = ttk.Frame(self.window, padding=10)
@@ -82,8 +119,20 @@ class ProjectDetailWindow:
         media_btn_frame = ttk.Frame(self.media_frame_container)
         media_btn_frame.pack(side='bottom', fill='x', pady=(5, 0))
         ttk.Button(media_btn_frame, text="➕ Add Media", command=self.add_media_clicked).pack(fill='x')
+        ttk.Button(media_btn_frame, text="📚 Collections", command=self.collections_clicked).pack(fill='x', pady=(2, 0))
         
-        # 2. Canvas Area (Top)
+        # 2. Search / Sort Bar (Top): matches the stored name, original name and date taken
+        media_filter_frame = ttk.Frame(self.media_frame_container)
+        media_filter_frame.pack(side='top', fill='x', pady=(0, 5))
+        self.media_search_var = tk.StringVar()
+        ttk.Entry(media_filter_frame, textvariable=self.media_search_var, width=12).pack(side='left', fill='x', expand=True)
+        self.media_search_var.trace_add("write", lambda *args: self._schedule_media_reload())
+        self.media_sort_var = tk.StringVar(value="Added")
+        sort_combo = ttk.Combobox(media_filter_frame, textvariable=self.media_sort_var, values=list(MEDIA_SORTS), state="readonly", width=10)
+        sort_combo.pack(side='right', padx=(5, 0))
+        sort_combo.bind("<<ComboboxSelected>>", lambda e: self.load_media())
+
+        # 3. Canvas Area
         canvas_area = ttk.Frame(self.media_frame_container)
         canvas_area.pack(side='top', fill='both', expand=True)
         
@@ -95,10 +144,13 @@ class ProjectDetailWindow:
         self.media_canvas.pack(side="left", fill="both", expand=True)
         media_scrollbar.pack(side="right", fill="y")
         
-        self.media_canvas.configure(yscrollcommand=media_scrollbar.set)
+        self.media_scrollbar = media_scrollbar
+        self.media_canvas.configure(yscrollcommand=self._on_media_scrolled)
         self.media_canvas.create_window((0, 0), window=self.media_inner_frame, anchor="nw")
         
-        self.media_inner_frame.bind("<Configure>", lambda e: self.media_canvas.configure(scrollregion=self.media_canvas.bbox("all")))
+        self.media_inner_frame.bind("<Configure>", self._on_media_frame_configured)
+        self.media_inner_frame.bind("<Map>", lambda e: self._schedule_visible_check())
+        self.media_canvas.bind("<Configure>", lambda e: self._schedule_visible_check())
 
         # --- SCROLLING LOGIC ---
         self.media_canvas.bind("<Button-4>", lambda e: self.on_mousewheel(e, 1))
@@ -165,6 +217,10 @@ class ProjectDetailWindow:
             # Reload to show the new PNG
             self.load_media()
 
+    def collections_clicked(self):
+        # Subscriptions decide which shared media this project sees
+        self.controller.open_collections_dialog(self.window, self.project, on_close=self.load_media)
+
     def load_dates(self):
         dates = self.controller.get_dates_for_project(self.project.id)
         self.date_listbox.delete(0, tk.END)
@@ -175,6 +231,22 @@ class ProjectDetailWindow:
             self.log_text_area.delete("1.0", tk.END)
             self.current_log_id = None
 
+    def on_external_change(self):
+        """Reloads dates, the selected day's log and the media; unsaved edits in the text stay."""
+        selection = self.date_listbox.curselection()
+        selected = self.date_listbox.get(selection[0]) if selection else None
+        self.load_dates()
+        dates = self.date_listbox.get(0, tk.END)
+        if selected in dates:
+            self.date_listbox.selection_set(dates.index(selected))
+            if not self.log_text_area.edit_modified():
+                self.on_date_selected(None)
+        elif selected is not None:
+            # The selected day's logs are gone (deleted here via undo, or elsewhere)
+            self.log_text_area.delete("1.0", tk.END)
+            self.current_log_id = None
+        self.load_media()
+
     def on_date_selected(self, event):
         selection = self.date_listbox.curselection()
         if not selection: return
@@ -190,6 +262,7 @@ class ProjectDetailWindow:
             latest_log = logs[0]
             self.current_log_id = latest_log.id
             self.insert_text_with_links(latest_log.content)
+        self.log_text_area.edit_modified(False)  # Tells on_external_change whether there are unsaved edits
 
     def insert_text_with_links(self, content):
         pattern = re.compile(r'\[ref:(\d+)\]')
@@ -216,6 +289,9 @@ class ProjectDetailWindow:
         """Finds the media widget, Highlights it, and JUMPS (scrolls) to it."""
         try:
             att_id = int(attachment_id)
+            if att_id not in self.media_widgets and self.media_search_var.get():
+                self.media_search_var.set("")  # The search hid it
+                self._run_media_reload()
             if att_id in self.media_widgets:
                 target_frame = self.media_widgets[att_id]
                 
@@ -251,6 +327,7 @@ class ProjectDetailWindow:
         """Opens the image using the default OS viewer."""
         if os.path.exists(file_path):
             try:
+                file_path = self.controller.viewable_media_path(file_path)  # Decrypted copy in encrypted workspaces
                 if platform.system() == 'Darwin':       # macOS
                     subprocess.call(('open', file_path))
                 elif platform.system() == 'Windows':    # Windows
@@ -266,6 +343,7 @@ class ProjectDetailWindow:
         if self.current_log_id is not None:
             content = self.log_text_area.get("1.0", "end-1c")
             self.controller.save_log_text(self.current_log_id, content)
+            self.log_text_area.edit_modified(False)
             self.status_label.config(text="Changes saved successfully!", foreground="#00FF00")
             self.window.after(3000, lambda: self.status_label.config(text=""))
         else:
@@ -273,14 +351,8 @@ class ProjectDetailWindow:
             self.window.after(3000, lambda: self.status_label.config(text=""))
 
     def add_entry_clicked(self):
-        today = datetime.now().strftime("%Y-%m-%d")
-        date_str = simpledialog.askstring("New Entry", "Enter Date (YYYY-MM-DD):", initialvalue=today, parent=self.window)
-        if not date_str: return 
-        
-        content = simpledialog.askstring("New Entry", "Enter Log Content:", parent=self.window)
-        if content:
-            self.controller.add_log_entry(self.project.id, date_str, content)
-            self.load_dates()
+        # Same dialog as the batch entry, for this project only (date, template, multi-line text)
+        self.controller.open_batch_log_dialog(self.window, [self.project], [self.project.id], on_done=lambda added: self.load_dates())
 
     def delete_date_clicked(self):
         selection = self.date_listbox.curselection()
@@ -294,15 +366,28 @@ class ProjectDetailWindow:
             self.load_dates()
             self.log_text_area.delete("1.0", tk.END)
             self.current_log_id = None
-            self.status_label.config(text="Date deleted.", foreground="orange")
+            self.status_label.config(text="Date deleted (Undo in the main window).", foreground="orange")
 
     def load_media(self):
-        attachments = self.controller.get_attachments_for_project(self.project.id)
+        """
+        Builds a lightweight placeholder per attachment, then decodes only the
+        previews that are (nearly) scrolled into view on background threads.
+        """
+        load_start = time.perf_counter()
+        sort_by, descending = MEDIA_SORTS[self.media_sort_var.get()]
+        text = self.media_search_var.get().strip() or None
+        attachments = self.controller.get_attachments_for_project(self.project.id, sort_by, descending, text)
         
+        self.cancel_pending_decodes()
         for widget in self.media_inner_frame.winfo_children():
             widget.destroy()
         
         self.media_widgets = {} 
+        self.media_items = {}
+        self.image_refs = [] # Drop the old PhotoImages, otherwise every reload leaks them
+        
+        # One shared blank image keeps every placeholder the same size, so scroll positions are stable
+        self.placeholder_image = PhotoImage(width=MEDIA_THUMB_WIDTH, height=MEDIA_PLACEHOLDER_HEIGHT)
 
         for att in attachments:
             if os.path.exists(att.file_path):
@@ -315,27 +400,132 @@ class ProjectDetailWindow:
                 # ID Label
                 ttk.Label(item_frame, text=f"ID: {att.id}", font=("EASVHS", 9, "bold"), foreground="gray").pack(anchor='w')
                 
-                # Image Label
-                img_lbl = ttk.Label(item_frame)
+                # Image Label (placeholder until its preview is decoded)
+                img_lbl = ttk.Label(item_frame, image=self.placeholder_image, text="Loading...", compound="center")
                 img_lbl.pack()
+                self.media_items[att.id] = (att.file_path, img_lbl)
                 
                 # NEW: Bind click on the image to open the file
                 # Use cursor="hand2" to indicate clickability
                 img_lbl.bind("<Button-1>", lambda e, path=att.file_path: self.open_image_file(path))
-                img_lbl.bind("<Enter>", lambda e: img_lbl.config(cursor="hand2"))
-                img_lbl.bind("<Leave>", lambda e: img_lbl.config(cursor="arrow"))
-
-                try:
-                    photo = PhotoImage(file=att.file_path)
-                    if photo.width() > 200:
-                        photo = photo.subsample(photo.width() // 200)
-                    img_lbl.config(image=photo)
-                    img_lbl.image = photo 
-                    self.image_refs.append(photo)
-                except:
-                    img_lbl.config(text="[Image Error]", foreground="red")
+                img_lbl.bind("<Enter>", lambda e, lbl=img_lbl: lbl.config(cursor="hand2"))
+                img_lbl.bind("<Leave>", lambda e, lbl=img_lbl: lbl.config(cursor="arrow"))
                 
-                # Filename Label (also clickable optionally)
-                name_lbl = ttk.Label(item_frame, text=os.path.basename(att.file_path), font=("EASVHS", 8))
+                # Filename Label (also clickable optionally); the name it had before ingest when known
+                name_lbl = ttk.Label(item_frame, text=att.original_name or os.path.basename(att.file_path), font=("EASVHS", 8))
                 name_lbl.pack()
-                name_lbl.bind("<Button-1>", lambda e, path=att.file_path: self.open_image_file(path))
\ No newline at end of file
+                name_lbl.bind("<Button-1>", lambda e, path=att.file_path: self.open_image_file(path))
+
+                details = [f"{att.width}x{att.height}" if att.width else "", format_byte_size(att.byte_size), (att.taken_at or "")[:10]]
+                if any(details):
+                    ttk.Label(item_frame, text="  ·  ".join(d for d in details if d), font=("EASVHS", 8), foreground="gray").pack()
+        
+        self._schedule_visible_check()
+        self.controller.instrumentation.record("ui", "load_media", (time.perf_counter() - load_start) * 1000)
+
+    def _schedule_media_reload(self):
+        # Debounce typing in the media search box
+        if self._media_filter_after_id is not None:
+            self.window.after_cancel(self._media_filter_after_id)
+        self._media_filter_after_id = self.window.after(250, self._run_media_reload)
+
+    def _run_media_reload(self):
+        if self._media_filter_after_id is not None:
+            self.window.after_cancel(self._media_filter_after_id)
+        self._media_filter_after_id = None
+        self.load_media()
+
+    # --- PROGRESSIVE MEDIA DECODING ---
+
+    def _on_media_scrolled(self, first, last):
+        self.media_scrollbar.set(first, last)
+        self._schedule_visible_check()
+
+    def _on_media_frame_configured(self, event):
+        self.media_canvas.configure(scrollregion=self.media_canvas.bbox("all"))
+        self._schedule_visible_check()
+
+    def _schedule_visible_check(self):
+        # Collapse bursts of scroll/configure events into one check per idle cycle
+        if not self._visible_check_pending:
+            self._visible_check_pending = True
+            self.window.after_idle(self._request_visible_decodes)
+
+    def _request_visible_decodes(self):
+        """Submits decode jobs for placeholders inside the viewport (plus a preload margin)."""
+        self._visible_check_pending = False
+        if not self.media_items:
+            return
+        if not self.media_inner_frame.winfo_ismapped():
+            return # Not laid out yet, every item would report y=0. <Configure> calls us again.
+        
+        inner_height = self.media_inner_frame.winfo_height()
+        top_fraction, bottom_fraction = self.media_canvas.yview()
+        view_top = top_fraction * inner_height - PRELOAD_MARGIN_PX
+        view_bottom = bottom_fraction * inner_height + PRELOAD_MARGIN_PX
+        
+        generation = self.media_generation
+        for att_id, (path, _lbl) in self.media_items.items():
+            if att_id in self.pending_decodes:
+                continue
+            frame = self.media_widgets[att_id]
+            y = frame.winfo_y()
+            if y + frame.winfo_height() < view_top or y > view_bottom:
+                continue
+            future = self.decode_executor.submit(self._decode_worker, generation, att_id, path)
+            self.pending_decodes[att_id] = future
+        
+        if self.pending_decodes and self._poll_after_id is None:
+            self._poll_after_id = self.window.after(30, self._drain_decoded)
+
+    def _decode_worker(self, generation, att_id, path):
+        """Runs on a worker thread: decode only, never touch Tk here."""
+        try:
+            image = self.controller.decode_preview(path, MEDIA_THUMB_WIDTH)
+        except Exception as e:
+            image = e
+        self.decoded_queue.put((generation, att_id, image))
+
+    def _drain_decoded(self):
+        """Tk thread: turns decoded PIL images into PhotoImages and swaps out the placeholders."""
+        self._poll_after_id = None
+        while True:
+            try:
+                generation, att_id, image = self.decoded_queue.get_nowait()
+            except queue.Empty:
+                break
+            if generation != self.media_generation:
+                continue # Result from before a reload/close
+            self.pending_decodes.pop(att_id, None)
+            item = self.media_items.pop(att_id, None)
+            if item is None:
+                continue
+            _path, img_lbl = item
+            if isinstance(image, Exception):
+                img_lbl.config(image="", text="[Image Error]", foreground="red")
+                continue
+            photo = ImageTk.PhotoImage(image)
+            img_lbl.config(image=photo, text="")
+            img_lbl.image = photo 
+            self.image_refs.append(photo)
+        
+        if self.pending_decodes:
+            self._poll_after_id = self.window.after(30, self._drain_decoded)
+
+    def cancel_pending_decodes(self):
+        """Drops queued decode jobs and ignores results of any that are already running."""
+        self.media_generation += 1
+        for future in self.pending_decodes.values():
+            future.cancel()
+        self.pending_decodes = {}
+        if self._poll_after_id is not None:
+            self.window.after_cancel(self._poll_after_id)
+            self._poll_after_id = None
+
+    def _on_window_destroyed(self, event):
+        # <Destroy> also fires for every child widget; only react to the window itself
+        if event.widget is self.window:
+            self.controller.remove_change_listener(self.on_external_change)
+            self.media_items = {}
+            self.cancel_pending_decodes()
+            self.decode_executor.shutdown(wait=False, cancel_futures=True)
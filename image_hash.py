@@ -0,0 +1,110 @@
+# --- image_hash.py ---
+"""
+Perceptual hashes for attachment images: 64-bit dHash (brightness gradient
+between neighbouring cells of a 9x8 grid) and aHash (cells above/below the
+mean of an 8x8 grid). Re-encoded, resized or slightly edited copies of an
+image differ in only a few bits, so similarity is the Hamming distance.
+
+Hashes are stored signed (SQLite integers are 64-bit signed). Lookups use
+four 16-bit slices of the dHash, each indexed: two hashes within distance 3
+always share at least one slice exactly (pigeonhole), so near-duplicate
+queries only look at the few rows matching a slice. Looser queries scan
+every hash with int.bit_count(), which is still cheap at 100k images.
+
+Pillow does the heavy part (decode, downscale, grey 9x8/8x8 grids); the
+thresholding left over is 64 comparisons per hash, so it is plain Python
+rather than NumPy, which would only add a dependency and array overhead.
+
+    python image_hash.py [--workspace NAME] backfill [--workers N]
+    python image_hash.py [--workspace NAME] similar ATTACHMENT_ID [--distance 10]
+"""
+
+import argparse
+import os
+from typing import Callable, Optional, Tuple
+
+from PIL import Image
+
+from backfill import run_backfill, run_from_command_line
+from db_controller import DatabaseManager, HASH_BAND_DISTANCE, MASK64
+from encryption import open_media
+
+NEAR_DUPLICATE_DISTANCE = HASH_BAND_DISTANCE  # Largest distance the slice indexes answer exactly
+SIMILAR_DISTANCE = 10
+HASH_DECODE_SIZE = (256, 256)  # Backfill decodes stored images at most this large
+DEFAULT_WORKERS = min(4, os.cpu_count() or 1)
+
+
+def to_signed64(value: int) -> int:
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def hamming(a: int, b: int) -> int:
+    return ((a ^ b) & MASK64).bit_count()
+
+
+def image_hashes(img: Image.Image) -> Tuple[int, int]:
+    """(dhash, ahash) of a decoded image, both signed 64-bit. img itself is left untouched."""
+    # Same downscale as image_ingest.decode_scaled, so a file hashed at ingest (full size in memory)
+    # and later by backfill (decoded at HASH_DECODE_SIZE) gets the same bits
+    factor = min(img.width // HASH_DECODE_SIZE[0], img.height // HASH_DECODE_SIZE[1])
+    small = img.reduce(factor) if factor >= 2 else img.copy()
+    small.thumbnail(HASH_DECODE_SIZE, Image.Resampling.LANCZOS)
+    grid = small.resize((9, 8), Image.Resampling.BOX).convert("L")
+    pixels = list(grid.getdata())
+    dhash = 0
+    for row in range(8):
+        for col in range(8):
+            dhash = (dhash << 1) | (pixels[row * 9 + col] < pixels[row * 9 + col + 1])
+    cells = list(small.resize((8, 8), Image.Resampling.BOX).convert("L").getdata())
+    mean = sum(cells) / len(cells)
+    ahash = 0
+    for value in cells:
+        ahash = (ahash << 1) | (value >= mean)
+    return to_signed64(dhash), to_signed64(ahash)
+
+
+def hash_file(path: str, max_pixels: Optional[int] = None, cipher=None) -> Tuple[int, int]:
+    """Hashes an image file, decoding it scaled down (thread-safe; Pillow releases the GIL while decoding)."""
+    from image_ingest import decode_scaled, open_bounded, to_storable_mode  # image_ingest imports this module
+    with open_media(path, cipher) as f, open_bounded(f, max_pixels) as img:
+        return image_hashes(to_storable_mode(decode_scaled(img, HASH_DECODE_SIZE)))
+
+
+def backfill_hashes(db: DatabaseManager, workers: int = DEFAULT_WORKERS, max_pixels: Optional[int] = None,
+                    progress: Optional[Callable[[int, int], None]] = None) -> dict:
+    """Hashes every attachment that has no hash yet (see backfill.run_backfill)."""
+    return run_backfill(db, "hashes", db.get_unhashed_attachments(), lambda path: hash_file(path, max_pixels, db.cipher),
+                        lambda batch: db.save_image_hashes([(attachment_id, *hashes) for attachment_id, hashes in batch]),
+                        workers, progress)
+
+
+def main():
+    from image_ingest import max_pixels_from_env
+    from workspaces import WorkspaceConfig
+
+    parser = argparse.ArgumentParser(description="Perceptual hashes for attachment images.")
+    parser.add_argument("--workspace", default=None, help="Workspace from proman.json (default: the active one)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    backfill = commands.add_parser("backfill", help="Hash attachments that have no hash yet")
+    backfill.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    similar = commands.add_parser("similar", help="List attachments that look like one attachment")
+    similar.add_argument("attachment_id", type=int)
+    similar.add_argument("--distance", type=int, default=SIMILAR_DISTANCE, help="Max differing bits (0-64)")
+    args = parser.parse_args()
+
+    db = DatabaseManager(db_path=WorkspaceConfig().get(args.workspace).db_path)
+    if args.command == "backfill":
+        run_from_command_line(backfill_hashes, "Hashed", db=db, workers=args.workers, max_pixels=max_pixels_from_env())
+    elif args.command == "similar":
+        matches = db.find_similar_images(args.attachment_id, args.distance)
+        if matches is None:
+            print(f"Attachment {args.attachment_id} has no hash; run 'backfill' first.")
+            return
+        for attachment_id, distance in matches:
+            attachment = db.get_attachment_by_id(attachment_id)
+            print(f"{distance:>3}  #{attachment_id}  {attachment.file_path if attachment else '?'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+# --- image_ingest.py ---
+"""
+Memory-bounded image decoding for attachments, thumbnails and previews.
+
+- The pixel count is checked from the header before any pixel data is decoded.
+- JPEGs are decoded through draft() so the DCT produces a 1/2, 1/4 or 1/8
+  scale image directly. Other formats shrink with reduce() before resampling.
+- EXIF orientation is applied after downscaling, on the small image, but the
+  target box is rotated first so the result fits the requested size.
+- Multi-frame files (GIF, TIFF, ...) only ever decode the first frame.
+
+Nothing here touches Tk, so every function is safe to call from worker threads.
+"""
+
+import os
+from contextlib import nullcontext
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+from PIL import Image, ImageOps
+
+from attachment_metadata import taken_at
+from encryption import create_media, media_size, open_media
+from image_hash import image_hashes
+
+DEFAULT_MAX_PIXELS = 100_000_000  # ~100 MP; larger sources are refused before decoding
+
+# EXIF orientations that swap width and height (transpose / rotate 90 / transverse / rotate 270)
+SWAPPED_ORIENTATIONS = {5, 6, 7, 8}
+EXIF_ORIENTATION_TAG = 0x0112
+
+
+# open_bounded() enforces the (configurable) limit itself; Pillow's fixed global guard
+# would otherwise warn at 89 MP and hard-fail at 179 MP regardless of that setting.
+Image.MAX_IMAGE_PIXELS = None
+
+
+class ImageTooLargeError(ValueError):
+    """The source image exceeds the configured pixel limit."""
+
+
+@dataclass(slots=True)
+class IngestedImage:
+    path: str
+    dhash: int  # Perceptual hashes of the stored image, see image_hash.py
+    ahash: int
+    original_name: str  # Descriptive columns, see attachment_metadata.py
+    width: int
+    height: int
+    taken_at: Optional[str]
+    byte_size: int
+
+    def metadata(self) -> dict:
+        return {"original_name": self.original_name, "width": self.width, "height": self.height,
+                "taken_at": self.taken_at, "byte_size": self.byte_size}
+
+
+def max_pixels_from_env(default: int = DEFAULT_MAX_PIXELS) -> int:
+    value = os.environ.get("PROMAN_MAX_IMAGE_PIXELS")
+    return int(value) if value else default
+
+
+def open_bounded(path, max_pixels: Optional[int] = DEFAULT_MAX_PIXELS) -> Image.Image:
+    """
+    Opens an image lazily (header only) and refuses it if it has too many pixels. path may
+    also be an open binary file (e.g. from encryption.open_media); the caller closes it.
+    """
+    img = Image.open(path)
+    width, height = img.size
+    if max_pixels and width * height > max_pixels:
+        img.close()
+        raise ImageTooLargeError(
+            f"{os.path.basename(getattr(path, 'name', path))} is {width}x{height} ({width * height / 1e6:.0f} MP); "
+            f"the limit is {max_pixels / 1e6:.0f} MP."
+        )
+    if getattr(img, "n_frames", 1) > 1:
+        img.seek(0)  # Only the first frame is ever decoded
+    return img
+
+
+def _orientation(img: Image.Image) -> int:
+    try:
+        return img.getexif().get(EXIF_ORIENTATION_TAG, 1)
+    except Exception:
+        return 1
+
+
+def decode_scaled(img: Image.Image, max_size: Optional[Tuple[int, int]]) -> Image.Image:
+    """
+    Decodes img, scaled to fit max_size (after orientation) when given, and returns
+    the upright result (which may be img itself). Peak memory scales with the output size for JPEGs and with one
+    full frame for everything else.
+    """
+    orientation = _orientation(img)
+
+    if max_size is not None:
+        # max_size applies to the upright image; the decoder works in stored orientation
+        box = (max_size[1], max_size[0]) if orientation in SWAPPED_ORIENTATIONS else max_size
+        if img.format == "JPEG":
+            img.draft("RGB" if img.mode == "RGB" else img.mode, box)  # DCT-domain downscale, no full-size buffer
+        factor = min(img.width // box[0], img.height // box[1])
+        if factor >= 2:
+            img = img.reduce(factor)  # Cheap integer box filter before the quality resample
+        img.thumbnail(box, Image.Resampling.LANCZOS)
+
+    if orientation != 1:
+        img = ImageOps.exif_transpose(img)
+    return img
+
+
+def to_storable_mode(img: Image.Image) -> Image.Image:
+    """Converts to RGB, or RGBA when the source has transparency (what PNG output expects)."""
+    if img.mode in ('RGB', 'RGBA'):
+        return img  # convert() would make a full-size copy for nothing
+    if img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info):
+        return img.convert('RGBA')
+    return img.convert('RGB')
+
+
+def ingest_image(source_path: str, destination_path: str, max_size: Optional[Tuple[int, int]] = None,
+                 max_pixels: Optional[int] = DEFAULT_MAX_PIXELS, instrumentation=None, cipher=None) -> IngestedImage:
+    """
+    Decodes source_path within the memory bounds above, writes it to destination_path as PNG
+    (encrypted as it is written when the workspace's cipher is given) and hashes the decoded
+    pixels while they are in memory. The source's name and EXIF date are kept too: the PNG
+    carries neither.
+    """
+    timer = instrumentation.timer if instrumentation is not None else (lambda category, name: nullcontext())
+    with open_bounded(source_path, max_pixels) as img:
+        captured = taken_at(img)  # Header only, read before decoding
+        with timer("image", "decode"):  # Image.open is lazy, so the pixel decode happens in here
+            out = to_storable_mode(decode_scaled(img, max_size))
+        with timer("image", "hash"):
+            dhash, ahash = image_hashes(out)
+        with timer("image", "encode_png"), create_media(destination_path, cipher) as f:
+            out.save(f, "PNG")
+        width, height = out.size
+    return IngestedImage(destination_path, dhash, ahash, os.path.basename(source_path), width, height,
+                         captured, media_size(destination_path))
+
+
+def load_preview(path: str, max_width: int, max_pixels: Optional[int] = DEFAULT_MAX_PIXELS, cipher=None) -> Image.Image:
+    """Decodes a preview at most max_width wide (and 4x that tall) from a stored file, encrypted or not."""
+    with open_media(path, cipher) as f, open_bounded(f, max_pixels) as img:
+        preview = decode_scaled(img, (max_width, max_width * 4))
+        preview.load()
+        return preview.copy() if preview is img else preview
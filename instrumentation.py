@@ -0,0 +1,135 @@
+# --- instrumentation.py ---
+
+import json
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+# Histogram bucket upper bounds in milliseconds (the last bucket catches everything else).
+BUCKET_BOUNDS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, float("inf"))
+
+def normalize_sql(sql: str) -> str:
+    """Collapses whitespace so the same statement always maps to the same metric name."""
+    return re.sub(r"\s+", " ", sql).strip()
+
+
+class TimingStats:
+    """Count/total/min/max plus a fixed-bucket histogram for one metric."""
+
+    __slots__ = ("count", "total_ms", "min_ms", "max_ms", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.min_ms = float("inf")
+        self.max_ms = 0.0
+        self.buckets = [0] * len(BUCKET_BOUNDS_MS)
+
+    def add(self, ms: float):
+        self.count += 1
+        self.total_ms += ms
+        self.min_ms = min(self.min_ms, ms)
+        self.max_ms = max(self.max_ms, ms)
+        for i, bound in enumerate(BUCKET_BOUNDS_MS):
+            if ms <= bound:
+                self.buckets[i] += 1
+                break
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "total_ms": round(self.total_ms, 3),
+            "avg_ms": round(self.total_ms / self.count, 3) if self.count else 0.0,
+            "min_ms": round(self.min_ms, 3) if self.count else 0.0,
+            "max_ms": round(self.max_ms, 3),
+            "histogram": {("inf" if b == float("inf") else str(b)): n for b, n in zip(BUCKET_BOUNDS_MS, self.buckets)},
+        }
+
+
+class Instrumentation:
+    """
+    Collects timings grouped by category ("db", "image", "ui", ...) and name,
+    keeps a bounded slow-query log, and forwards every sample to optional
+    listeners so other sinks (files, consoles, tests) can be plugged in.
+    """
+
+    def __init__(self, slow_query_ms: float = 50.0, slow_log_size: int = 100, enabled: bool = True):
+        self.enabled = enabled
+        self.slow_query_ms = slow_query_ms
+        self.slow_queries = deque(maxlen=slow_log_size)
+        self.errors = deque(maxlen=slow_log_size)
+        self._stats: Dict[tuple, TimingStats] = {}
+        self._listeners: List[Callable[[str, str, float], None]] = []
+        self._lock = threading.Lock()
+
+    # --- RECORDING ---
+
+    def record(self, category: str, name: str, ms: float):
+        if not self.enabled:
+            return
+        with self._lock:
+            stats = self._stats.get((category, name))
+            if stats is None:
+                stats = self._stats[(category, name)] = TimingStats()
+            stats.add(ms)
+        for listener in self._listeners:
+            listener(category, name, ms)
+
+    @contextmanager
+    def timer(self, category: str, name: str):
+        """with instrumentation.timer("ui", "refresh_project_list"): ..."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(category, name, (time.perf_counter() - start) * 1000)
+
+    def record_slow_query(self, sql: str, params: tuple, ms: float, plan: List[str]):
+        self.slow_queries.append({
+            "sql": normalize_sql(sql),
+            "params": [repr(p) for p in params],
+            "ms": round(ms, 3),
+            "plan": plan,
+            "at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        })
+
+    def record_error(self, category: str, message: str):
+        self.errors.append({"category": category, "message": message, "at": time.strftime("%Y-%m-%d %H:%M:%S")})
+
+    # --- PLUGGABLE SINKS ---
+
+    def add_listener(self, listener: Callable[[str, str, float], None]):
+        """listener(category, name, ms) is called for every recorded sample."""
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[str, str, float], None]):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    # --- EXPORT ---
+
+    def snapshot(self, extra: Optional[dict] = None) -> dict:
+        with self._lock:
+            timings = {}
+            for (category, name), stats in sorted(self._stats.items()):
+                timings.setdefault(category, {})[name] = stats.to_dict()
+        data = {"timings": timings, "slow_queries": list(self.slow_queries), "errors": list(self.errors)}
+        if extra:
+            data.update(extra)
+        return data
+
+    def to_json(self, extra: Optional[dict] = None, indent: int = 2) -> str:
+        return json.dumps(self.snapshot(extra), indent=indent)
+
+    def export_json(self, path: str, extra: Optional[dict] = None):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.to_json(extra))
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self.slow_queries.clear()
+            self.errors.clear()
@@ -2,12 +2,15 @@ import ctypes
 import sys
 import os
 import time 
+import traceback
 import tkinter as tk
-from tkinter import ttk
+from tkinter import ttk, messagebox, simpledialog
 # Import ThemedStyle
 from ttkthemes import ThemedStyle 
 
-from db_controller import DatabaseManager
+from db_controller import DatabaseBusyError
+from workspaces import WorkspaceConfig, WorkspaceManager, app_path
+from image_ingest import DEFAULT_MAX_PIXELS, max_pixels_from_env
 from pm_controller import ProjectManagementController
 from gui.main_window import MainWindow 
 
@@ -17,7 +20,7 @@ try:
     # The ID can be anything, but it must be a unique string
     myappid = 'chisp2000.proman.projectmanager.v1' 
     ctypes.windll.shell32.SetCurrentProcessExplicitAppUserModelID(myappid)
-except ImportError:
+except (ImportError, AttributeError): # ctypes.windll only exists on Windows
     pass
 
 def show_splash(root):
@@ -47,21 +50,8 @@ def show_splash(root):
     splash.destroy()
 
 
-def startup_application():
-    # 2. CREATE THE TKINTER ROOT OBJECT
-    root = tk.Tk()
-
-    root.withdraw() # Hides the main window initially
-
-
-    # 3. SET THE WINDOW ICON (Fixes Top-Left Window Icon)
-    icon_path = "proman_icon.ico" 
-    if os.path.exists(icon_path):
-        try:
-            root.iconbitmap(icon_path)
-        except Exception as e:
-            print(f"Icon error: {e}")
-
+def apply_dark_theme(root):
+    """Configures the ttk styles every window relies on (also used by the headless GUI benchmark)."""
     # Use ThemedStyle for better theme control
     style = ThemedStyle(root) 
     
@@ -110,26 +100,101 @@ def startup_application():
     style.configure("OrangeBold.TLabel", 
                     background=DARK_BG, 
                     foreground=ORANGE_COLOR, 
-                    font=("EASVHS", 18, )) 
+                    font=("EASVHS", 18, ))
+
+
+def ask_passphrase(root, workspace_name, wrong):
+    """Passphrase prompt for encrypted workspaces (see encryption.py); None when cancelled."""
+    prompt = f"Passphrase for workspace '{workspace_name}':"
+    if wrong:
+        prompt = "Wrong passphrase. " + prompt
+    return simpledialog.askstring("Encrypted Workspace", prompt, show="*", parent=root)
+
+
+def report_callback_exception(root, exc_type, exc_value, exc_traceback):
+    """Tk callback errors go to stderr by default; a locked database should reach the user."""
+    if issubclass(exc_type, DatabaseBusyError):
+        print(f"Database busy: {exc_value}")
+        messagebox.showwarning("Database Busy", str(exc_value), parent=root)
+        return
+    traceback.print_exception(exc_type, exc_value, exc_traceback)
+
+
+def startup_application():
+    # 2. CREATE THE TKINTER ROOT OBJECT
+    root = tk.Tk()
+
+    root.withdraw() # Hides the main window initially
+
+
+    # 3. SET THE WINDOW ICON (Fixes Top-Left Window Icon)
+    icon_path = app_path("proman_icon.ico")
+    if os.path.exists(icon_path):
+        try:
+            root.iconbitmap(icon_path)
+        except Exception as e:
+            print(f"Icon error: {e}")
+
+    apply_dark_theme(root)
     
     # 4. SHOW THE SPLASH SCREEN and LOAD DATA
     try:
         show_splash(root) 
-        db_manager = DatabaseManager(db_path='projects.db')
+        # DB / media locations come from proman.json and PROMAN_* environment variables
+        workspaces = WorkspaceManager(WorkspaceConfig(), cache_size=512,
+                                      ask_passphrase=lambda name, wrong: ask_passphrase(root, name, wrong))
+        db_manager = workspaces.open()
         
     except Exception as e:
         print(f"FATAL ERROR: Could not initialize database. {e}")
         sys.exit(1)
 
     # 5. INITIALIZE CONTROLLER (Logic Layer)
-    pm_controller = ProjectManagementController(db_manager=db_manager)
+    pm_controller = ProjectManagementController(
+        db_manager=db_manager, media_dir=workspaces.config.get().media_dir, workspaces=workspaces,
+        max_image_pixels=max_pixels_from_env(workspaces.config.max_image_pixels or DEFAULT_MAX_PIXELS)
+    )
 
     # 6. OPEN THE MAIN WINDOW
+    root.report_callback_exception = lambda *exc: report_callback_exception(root, *exc)
     root.deiconify() 
     MainWindow(root, controller=pm_controller)
+
+    # Pick up changes made by other ProMan instances / scripts
+    pm_controller.start_change_polling()
+
+    # Toasts for projects coming due / going overdue
+    pm_controller.start_reminders()
+
+    # Sizes and dimensions for attachments ingested before they were recorded
+    pm_controller.start_metadata_backfill()
+
+    # Deleted items stay restorable (Ctrl+Z) until this removes them for good
+    pm_controller.start_purge_job()
+
+    # Optional local JSON API ("api_port" in proman.json or PROMAN_API_PORT)
+    api = None
+    if workspaces.config.api_port:
+        from api_server import create_server
+        workspace = workspaces.config.get()
+        try:
+            api = create_server(workspace.db_path, workspace.media_dir, workspaces.config.api_port, instrumentation=workspaces.instrumentation)
+            api.start_in_thread()
+        except OSError as e:
+            print(f"API server could not start: {e}")
+            api = None
     
     # 7. Start the main application event loop
     root.mainloop()
+    if api is not None:
+        api.stop()
+
+    # 8. Refresh planner statistics on the way out (cheap; only touches tables that need it)
+    for opened in workspaces.all_open():
+        try:
+            opened.optimize()
+        except Exception as e:
+            print(f"Optimize on exit failed for {opened.db_path}: {e}")
 
 if __name__ == "__main__":
     startup_application()
\ No newline at end of file
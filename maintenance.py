@@ -0,0 +1,74 @@
+# --- maintenance.py ---
+"""
+Command line access to DatabaseManager's maintenance API. Safe to run while
+ProMan is open (the backup uses SQLite's online backup API).
+
+    python maintenance.py stats
+    python maintenance.py vacuum [--pages N]
+    python maintenance.py optimize [--full]
+    python maintenance.py check [--quick]
+    python maintenance.py backup backups/projects-2025-01-01.db
+    python maintenance.py prune-journal 12000
+    python maintenance.py --workspace archive stats
+"""
+
+import argparse
+import sys
+
+from db_controller import DatabaseManager
+from workspaces import WorkspaceConfig
+
+def print_progress(status, remaining, total):
+    done = total - remaining
+    percent = (done / total * 100) if total else 100
+    print(f"\rBackup: {done}/{total} pages ({percent:5.1f}%)", end="", flush=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="ProMan database maintenance.")
+    parser.add_argument("--db", default=None, help="Database file (default: the workspace's database)")
+    parser.add_argument("--workspace", default=None, help="Workspace from proman.json (default: the active one)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("stats", help="Show file size and free pages")
+
+    vacuum = commands.add_parser("vacuum", help="Release free pages (incremental vacuum)")
+    vacuum.add_argument("--pages", type=int, default=None, help="Release at most this many pages")
+
+    optimize = commands.add_parser("optimize", help="Refresh query planner statistics")
+    optimize.add_argument("--full", action="store_true", help="Run a full ANALYZE instead of PRAGMA optimize")
+
+    check = commands.add_parser("check", help="Run an integrity check")
+    check.add_argument("--quick", action="store_true", help="Use quick_check (skips index consistency)")
+
+    backup = commands.add_parser("backup", help="Hot backup to a new file")
+    backup.add_argument("destination")
+    backup.add_argument("--pages-per-step", type=int, default=256)
+
+    prune = commands.add_parser("prune-journal", help="Drop change journal entries up to a cursor")
+    prune.add_argument("before_seq", type=int, help="Last cursor every consumer has processed")
+
+    args = parser.parse_args()
+    db = DatabaseManager(db_path=args.db or WorkspaceConfig().get(args.workspace).db_path)
+
+    if args.command == "stats":
+        for key, value in db.database_stats().items():
+            print(f"{key:>12}: {value}")
+    elif args.command == "vacuum":
+        print(f"Released {db.incremental_vacuum(args.pages)} pages.")
+    elif args.command == "optimize":
+        db.optimize(full_analyze=args.full)
+        print("Done.")
+    elif args.command == "check":
+        problems = db.integrity_check(quick=args.quick)
+        if problems:
+            print("\n".join(problems))
+            sys.exit(1)
+        print("ok")
+    elif args.command == "backup":
+        db.backup(args.destination, args.pages_per_step, progress=print_progress)
+        print(f"\nBackup written to {args.destination}")
+    elif args.command == "prune-journal":
+        print(f"Removed {db.prune_journal(args.before_seq)} journal entries (head is {db.journal_head()}).")
+
+if __name__ == "__main__":
+    main()
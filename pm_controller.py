@@ -1,37 +1,53 @@
+import atexit
+import base64
 import os
+import shutil
+import tempfile
 import tkinter as tk
 from tkinter import messagebox
 import uuid 
 import time
+import threading
 from typing import Optional
-from PIL import Image # CRITICAL: Ensure Pillow is imported
 
-from db_models import Project
+from db_models import Project, normalize_date, render_log_template
 from db_controller import DatabaseManager 
+from encryption import is_encrypted_file, open_media, read_media
+from image_ingest import IngestedImage, ingest_image, load_preview, max_pixels_from_env
+from undo import DeleteAttachmentsCommand, DeleteLogsCommand, DeleteProjectCommand, PurgeJob, UndoStack
 
 class ProjectManagementController:
-    def __init__(self, db_manager: DatabaseManager):
+    def __init__(self, db_manager: DatabaseManager, media_dir: str = "media", workspaces=None, max_image_pixels: Optional[int] = None):
         self.db_controller = db_manager 
+        self.instrumentation = db_manager.instrumentation
+        self.media_dir = os.path.abspath(media_dir)
+        self.workspaces = workspaces  # Optional WorkspaceManager; enables switching in the GUI
+        # Sources above this many pixels are refused before decoding (PROMAN_MAX_IMAGE_PIXELS)
+        self.max_image_pixels = max_image_pixels or max_pixels_from_env()
         self.main_window = None 
         self.root = None        
+        self.change_listeners = []  # Called when another process changed the database
+        self.reminders = None  # ReminderScheduler once start_reminders() ran
+        self.undo_stack = UndoStack()  # Deletions of this session in this workspace
+        self.purge_job = None  # PurgeJob once start_purge_job() ran
+        self._view_dir = None  # Decrypted copies handed to external viewers, see viewable_media_path
 
     def set_root(self, root):
         self.root = root
 
     # --- IMAGE CONVERSION UTILITY ---
     
-    def save_image_as_png(self, source_path: str, is_thumbnail: bool = False) -> Optional[str]:
+    def _ingest_image(self, source_path: str, is_thumbnail: bool = False) -> Optional[IngestedImage]:
         """
         Takes a source image, converts it to PNG, optionally resizes it,
-        saves it to the 'media' folder, and returns the new file path.
+        saves it to the workspace's media folder and returns the stored file's path and hashes.
         """
         if not source_path or not os.path.exists(source_path):
             return None
 
         # 1. Prepare Directory
-        save_dir = "media"
-        if not os.path.exists(save_dir):
-            os.makedirs(save_dir)
+        save_dir = self.media_dir
+        os.makedirs(save_dir, exist_ok=True)
 
         # 2. Generate Unique Filename
         unique_id = uuid.uuid4().hex[:8]
@@ -41,29 +57,60 @@ class ProjectManagementController:
         destination_path = os.path.join(save_dir, new_filename)
 
         try:
-            with Image.open(source_path) as img:
-                # 3. Resize if it is a Project Thumbnail
-                if is_thumbnail:
-                    img.thumbnail((300, 200))
-                
-                # 4. Convert and Save as PNG
-                if img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info):
-                    img = img.convert('RGBA')
-                else:
-                    img = img.convert('RGB')
-                
-                img.save(destination_path, "PNG")
-                print(f"Image converted and saved to: {destination_path}")
-                return destination_path
+            # Thumbnails are decoded straight at thumbnail scale; references keep full resolution
+            max_size = (300, 200) if is_thumbnail else None
+            ingested = ingest_image(source_path, destination_path, max_size, self.max_image_pixels, self.instrumentation,
+                                    self.db_controller.cipher)
+            print(f"Image converted and saved to: {destination_path}")
+            return ingested
 
         except Exception as e:
             print(f"Error converting image: {e}")
+            self.instrumentation.record_error("image", f"{e} | {source_path}")
             messagebox.showerror("Image Error", f"Failed to process image:\n{e}")
             return None
 
+    def save_image_as_png(self, source_path: str, is_thumbnail: bool = False) -> Optional[str]:
+        """Ingests an image into the media folder (see _ingest_image) and returns the new file path."""
+        ingested = self._ingest_image(source_path, is_thumbnail)
+        return ingested.path if ingested else None
+
+    def decode_preview(self, path: str, max_width: int = 200):
+        """
+        Decodes an image scaled down to at most max_width pixels wide and returns
+        the PIL image. Safe to call from a worker thread (no Tk calls).
+        """
+        with self.instrumentation.timer("image", "decode_preview"):
+            return load_preview(path, max_width, self.max_image_pixels, self.db_controller.cipher)
+
+    def load_photo_image(self, path: str):
+        """A Tk PhotoImage of a stored PNG; encrypted files are decrypted in memory (Tk thread only)."""
+        if not is_encrypted_file(path):
+            return tk.PhotoImage(file=path)
+        with self.instrumentation.timer("image", "decrypt_thumbnail"):
+            data = read_media(path, self.db_controller.cipher)
+        return tk.PhotoImage(data=base64.b64encode(data))
+
+    def viewable_media_path(self, path: str) -> str:
+        """
+        A path an external viewer can open: the file itself, or for an encrypted file a
+        decrypted copy in a private temp folder that is removed when ProMan exits.
+        """
+        if not is_encrypted_file(path):
+            return path
+        if self._view_dir is None:
+            self._view_dir = tempfile.mkdtemp(prefix="proman_view_")
+            atexit.register(shutil.rmtree, self._view_dir, True)
+        copy_path = os.path.join(self._view_dir, os.path.basename(path))
+        with open_media(path, self.db_controller.cipher) as src, open(copy_path, "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        return copy_path
+
     # --- CONTROLLER ACTIONS ---
 
     def create_new_project(self, name: str, priority: int, due_date:str, image_path: Optional[str] = None):
+        # Raises ValueError on a bad date, before any image is written to disk
+        due_date = normalize_date(due_date)
         final_image_path = self.save_image_as_png(image_path, is_thumbnail=True)
         
         new_project = Project(
@@ -73,31 +120,39 @@ class ProjectManagementController:
             thumbnail_path=final_image_path 
         )
         self.db_controller.save_project(new_project)
+        self._refresh_reminders()
         
         if self.main_window:
             self.main_window.refresh_project_list() 
         return new_project
 
     def update_existing_project(self, pid, name, priority, due, img):
+        due = normalize_date(due)
         final_image_path = self.save_image_as_png(img, is_thumbnail=True)
         
         self.db_controller.update_project(Project(id=pid, name=name, priority=priority, due_date=due, thumbnail_path=final_image_path))
+        self._refresh_reminders()
         if self.main_window: self.main_window.refresh_project_list()
 
     def add_attachment(self, source_path, project_id, is_global=False):
-        final_path = self.save_image_as_png(source_path, is_thumbnail=False)
+        ingested = self._ingest_image(source_path, is_thumbnail=False)
         
-        if final_path:
-            self.db_controller.add_attachment(final_path, project_id, is_global)
+        if ingested:
+            self.db_controller.add_attachment(ingested.path, project_id, is_global, (ingested.dhash, ingested.ahash), ingested.metadata())
             print(f"Attachment added for project {project_id}")
 
     # --- GUI LINKING & PASS-THROUGHS ---
 
     def get_all_projects_sorted(self): 
         return self.db_controller.get_projects_sorted()
+
+    def get_projects_filtered(self, query):
+        return self.db_controller.query_projects(query)
     
     def delete_project_flow(self, pid):
-        self.db_controller.delete_project(pid)
+        project = self.db_controller.get_project_by_id(pid)
+        self._run_command(DeleteProjectCommand(pid, project.name if project else ""))
+        self._refresh_reminders()
         if self.main_window: self.main_window.refresh_project_list()
         
     def open_new_project_dialog(self):
@@ -116,16 +171,56 @@ class ProjectManagementController:
         return self.db_controller.get_logs_by_date(pid, date)
     
     def add_log_entry(self, pid, date, content): 
-        self.db_controller.create_log(pid, content, date)
+        self.db_controller.create_log(pid, content, normalize_date(date))
+
+    def add_log_entries(self, pids, date, content):
+        """
+        Writes content to every project in pids in one commit, with {date}, {weekday} and
+        {project} filled in per project. Returns how many entries were added.
+        """
+        date = normalize_date(date)
+        if not content or not content.strip():
+            raise ValueError("The log entry is empty.")
+        entries = []
+        for pid in dict.fromkeys(pids):
+            project = self.db_controller.get_project_by_id(pid)
+            if project:
+                entries.append((pid, render_log_template(content, project.name, date), date))
+        return self.db_controller.create_logs(entries) if entries else 0
+
+    def get_log_templates(self):
+        return self.db_controller.get_log_templates()
+
+    def save_log_template(self, name, content):
+        return self.db_controller.save_log_template(name, content)
+
+    def delete_log_template(self, template_id):
+        self.db_controller.delete_log_template(template_id)
+
+    def open_batch_log_dialog(self, parent, projects, selected_ids=(), on_done=None):
+        from gui.batch_log_dialog import BatchLogDialog
+        BatchLogDialog(parent, self, projects, selected_ids, on_done)
+
+    def get_invalid_dates(self):
+        return self.db_controller.find_invalid_dates()
+
+    def get_cache_stats(self):
+        return self.db_controller.cache_stats()
+
+    def get_profiling_report(self):
+        return self.db_controller.profiling_report()
+
+    def export_profiling_report(self, path):
+        self.instrumentation.export_json(path, extra=self.db_controller.cache_report())
     
     def save_log_text(self, log_id, text): 
         self.db_controller.update_log_content(log_id, text)
     
     def delete_date_logs(self, pid, date): 
-        self.db_controller.delete_logs_for_date(pid, date)
+        self._run_command(DeleteLogsCommand(pid, date))
     
-    def get_attachments_for_project(self, pid): 
-        return self.db_controller.get_viewable_attachments(pid)
+    def get_attachments_for_project(self, pid, sort_by="id", descending=False, text=None):
+        return self.db_controller.get_viewable_attachments(pid, sort_by, descending, text)
     
     def get_all_attachments_for_manager(self): 
         return self.db_controller.get_all_attachments()
@@ -134,7 +229,286 @@ class ProjectManagementController:
         self.db_controller.update_attachment_scope(att_id, not current_state)
     
     def delete_attachment(self, att_id): 
-        self.db_controller.delete_attachment(att_id)
+        self.delete_attachments([att_id])
+
+    def count_attachments(self, text=None, is_global=None):
+        return self.db_controller.count_attachments(text, is_global)
+
+    def get_attachments_page(self, offset, limit, sort_by="id", descending=False, text=None, is_global=None):
+        return self.db_controller.get_attachments_page(offset, limit, sort_by, descending, text, is_global)
+
+    def toggle_attachments_scope(self, att_ids):
+        self.db_controller.toggle_attachments_scope(att_ids)
+
+    def delete_attachments(self, att_ids):
+        self._run_command(DeleteAttachmentsCommand(att_ids))
+
+    def get_project(self, pid):
+        return self.db_controller.get_project_by_id(pid)
+
+    def get_attachment(self, att_id):
+        return self.db_controller.get_attachment_by_id(att_id)
+
+    def search_logs(self, text, pid=None, limit=100):
+        return self.db_controller.search_logs(text, pid, limit)
+
+    # --- UNDO / REDO & TRASH ---
+
+    def _run_command(self, command):
+        self.undo_stack.run(command, self.db_controller)
+        if self.main_window: self.main_window.update_undo_buttons()
+
+    def undo(self):
+        """Reverts the last deletion; returns its label, or None when there is nothing to undo."""
+        return self._after_undo_step(self.undo_stack.undo(self.db_controller))
+
+    def redo(self):
+        return self._after_undo_step(self.undo_stack.redo(self.db_controller))
+
+    def get_undo_label(self):
+        return self.undo_stack.undo_label()
+
+    def get_redo_label(self):
+        return self.undo_stack.redo_label()
+
+    def _after_undo_step(self, command):
+        if command is None:
+            return None
+        # The main list, open project dashboards, the attachment manager and reminders reload as after an external change
+        self._notify_change_listeners()
+        return command.label
+
+    def start_purge_job(self):
+        """Hard-deletes trashed rows and their media in the background once they can't be undone."""
+        if self.purge_job:
+            self.purge_job.stop()
+        self.purge_job = PurgeJob(self.db_controller, self.media_dir, self.undo_stack.protected_batches)
+        self.purge_job.start()
+
+    # --- CHANGE JOURNAL ---
+
+    def get_changes_since(self, cursor, limit=1000, entities=None):
+        """Returns (changes, next_cursor); see DatabaseManager.changes_since."""
+        return self.db_controller.changes_since(cursor, limit, entities)
+
+    def get_journal_head(self):
+        return self.db_controller.journal_head()
+
+    # --- IMAGE SIMILARITY & METADATA ---
+
+    def backfill_image_hashes(self, progress=None):
+        """Hashes attachments that have none yet (older ones, synced ones). Safe from a worker thread."""
+        from image_hash import backfill_hashes
+        return backfill_hashes(self.db_controller, max_pixels=self.max_image_pixels, progress=progress)
+
+    def start_metadata_backfill(self):
+        """
+        Runs backfill_attachment_metadata on a daemon thread. Its commits reach open windows
+        through change polling, so sizes and dimensions fill in without a reload.
+        """
+        db = self.db_controller  # A workspace switch must not redirect a running backfill
+
+        def worker():
+            from attachment_metadata import backfill_metadata
+            try:
+                summary = backfill_metadata(db)
+            except Exception as e:
+                print(f"Attachment metadata backfill failed: {e}")
+                return
+            if summary["total"]:
+                print(f"Attachment metadata: filled {summary['saved']} of {summary['total']} ({summary['failed']} failed)")
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def find_similar_attachments(self, att_id, max_distance):
+        """[(Attachment, distance)] closest first, or None when att_id has no hash yet."""
+        matches = self.db_controller.find_similar_images(att_id, max_distance)
+        if matches is None:
+            return None
+        found = [(self.db_controller.get_attachment_by_id(other_id), distance) for other_id, distance in matches]
+        return [(attachment, distance) for attachment, distance in found if attachment is not None]
+
+    def find_duplicate_attachments(self):
+        """Groups of near-identical attachments, each a list of Attachments."""
+        groups = []
+        for ids in self.db_controller.find_duplicate_groups():
+            group = [a for a in map(self.db_controller.get_attachment_by_id, ids) if a is not None]
+            if len(group) > 1:
+                groups.append(group)
+        return groups
+
+    # --- ATTACHMENT SHARING ---
+
+    def link_attachments_to_project(self, att_ids, pid):
+        if self.db_controller.get_project_by_id(pid) is None:
+            raise ValueError(f"Project ID {pid} does not exist.")
+        self.db_controller.link_attachments(att_ids, pid)
+
+    def get_collections(self):
+        return self.db_controller.get_collections()
+
+    def add_attachments_to_collection(self, att_ids, collection_name):
+        collection_id = self.db_controller.create_collection(collection_name)
+        self.db_controller.add_to_collection(att_ids, collection_id)
+        return collection_id
+
+    def get_project_collection_ids(self, pid):
+        return self.db_controller.get_project_collection_ids(pid)
+
+    def set_project_subscription(self, pid, collection_id, subscribed):
+        if subscribed:
+            self.db_controller.subscribe_project(pid, collection_id)
+        else:
+            self.db_controller.unsubscribe_project(pid, collection_id)
+
+    def open_collections_dialog(self, parent, project, on_close=None):
+        from gui.collections_dialog import CollectionsDialog
+        CollectionsDialog(parent, self, project, on_close)
+
+    # --- WORKSPACES ---
+
+    def get_workspace_names(self):
+        return self.workspaces.config.names() if self.workspaces else []
+
+    def get_active_workspace(self):
+        return self.workspaces.config.active if self.workspaces else None
+
+    def switch_workspace(self, name):
+        """Points the controller at another workspace's database and media folder."""
+        db_manager = self.workspaces.open(name)
+        workspace = self.workspaces.config.get(name)
+        self.db_controller = db_manager
+        self.instrumentation = db_manager.instrumentation
+        self.media_dir = workspace.media_dir
+        self.workspaces.config.active = name
+        self.workspaces.config.save()
+        # Undo entries point at the old database's trash
+        self.undo_stack.clear()
+        if self.purge_job:
+            self.start_purge_job()
+        if self.reminders:
+            self.reminders.stop()
+            self.start_reminders(self.reminders.notify, self.reminders.lead_days)
+        self.start_metadata_backfill()
+        print(f"Switched to workspace '{name}' ({workspace.db_path})")
+
+    def create_workspace(self, name, folder):
+        """Adds a workspace whose database and media live in folder, then switches to it."""
+        self.workspaces.config.add(name, os.path.join(folder, "projects.db"), os.path.join(folder, "media"))
+        self.switch_workspace(name)
+
+    # --- CHANGE DETECTION (other ProMan instances, scripts) ---
+
+    def add_change_listener(self, callback):
+        self.change_listeners.append(callback)
+
+    def remove_change_listener(self, callback):
+        if callback in self.change_listeners:
+            self.change_listeners.remove(callback)
+
+    def start_change_polling(self, interval_ms: int = 2000):
+        """Polls PRAGMA data_version on the Tk loop and notifies listeners about external commits."""
+        def poll():
+            try:
+                changed = self.db_controller.poll_external_changes()
+            except Exception as e:
+                print(f"Change polling failed: {e}")
+                changed = False
+            if changed:
+                self._notify_change_listeners()
+            self.root.after(interval_ms, poll)
+
+        self.root.after(interval_ms, poll)
+
+    def _notify_change_listeners(self):
+        for callback in list(self.change_listeners):
+            callback()
+
+    # --- REMINDERS ---
+
+    def start_reminders(self, notify=None, lead_days=None):
+        """
+        Starts due-date reminders for the current workspace: on the Tk loop when a root is set
+        (notify defaults to a toast), otherwise on a background thread calling notify(reminders).
+        """
+        from reminders import ReminderScheduler, DEFAULT_LEAD_DAYS
+        if self.reminders:
+            self.remove_change_listener(self.reminders.refresh)
+        notify = notify or self._show_reminder_toast
+        self.reminders = ReminderScheduler(self.db_controller, notify, lead_days or DEFAULT_LEAD_DAYS)
+        self.reminders.start(self.root)
+        # Edits from other instances, the API or a sync reach the heap through the journal
+        self.add_change_listener(self.reminders.refresh)
+
+    def stop_reminders(self):
+        if self.reminders:
+            self.remove_change_listener(self.reminders.refresh)
+            self.reminders.stop()
+            self.reminders = None
+
+    def _refresh_reminders(self):
+        """Picks up this window's own project edit right away (only that project is rescheduled)."""
+        if self.reminders:
+            self.reminders.refresh()
+
+    def get_due_overview(self, today=None):
+        """{'overdue': [...], 'this_week': [...]} projects, soonest first."""
+        from reminders import due_overview
+        return due_overview(self.db_controller, today)
+
+    def _show_reminder_toast(self, reminders):
+        from gui.due_window import ReminderToast
+        if self.root: ReminderToast(self.root, reminders, on_open=self.open_due_window)
+
+    def open_due_window(self):
+        from gui.due_window import DueWindow
+        if self.root: DueWindow(self.root, self)
+
+    # --- ANALYTICS ---
+
+    def get_activity_report(self, start=None, end=None, project_ids=None):
+        """ActivityReport for start..end (default: the last year); see analytics.build_report."""
+        from analytics import build_report
+        return build_report(self.db_controller, start, end, project_ids)
+
+    def open_activity_window(self):
+        from gui.activity_window import ActivityWindow
+        if self.root: ActivityWindow(self.root, self)
+
+    # --- ARCHIVES ---
+
+    def export_archive(self, archive_path, project_ids=None, progress=None):
+        """Exports the given projects (all when None) with their media into a portable zip."""
+        from project_archive import export_archive
+        return export_archive(self.db_controller, archive_path, project_ids, progress=progress)
+
+    def import_archive(self, archive_path, progress=None):
+        """Imports (or resumes importing) an archive. Safe to call from a worker thread."""
+        from project_archive import import_archive
+        return import_archive(self.db_controller, archive_path, media_dir=self.media_dir, progress=progress)
+
+    # --- SYNC ---
+
+    def _sync_engine(self):
+        from sync_engine import SyncEngine
+        return SyncEngine(self.db_controller, self.media_dir)
+
+    def get_sync_peer_names(self):
+        return [peer["name"] for peer in self._sync_engine().peers()]
+
+    def export_sync_bundle(self, bundle_path, peer=None, full=False):
+        """Writes the changes peer (name) lacks, or a full snapshot for a new peer. Safe from a worker thread."""
+        return self._sync_engine().export_bundle(bundle_path, peer, full)
+
+    def import_sync_bundle(self, bundle_path):
+        """Applies a peer's bundle. Safe from a worker thread; open windows refresh via change polling."""
+        return self._sync_engine().import_bundle(bundle_path)
+
+    def get_sync_conflicts(self):
+        return self._sync_engine().conflicts()
+
+    def resolve_sync_conflict(self, conflict_id, keep):
+        self._sync_engine().resolve_conflict(conflict_id, keep)
         
     # --- UPDATED: OPEN PROJECT DETAIL WINDOW ---
     def open_project_detail_window(self, project_id: int):
@@ -160,4 +534,8 @@ class ProjectManagementController:
 
     def open_attachment_manager(self):
         from gui.attachment_manager import AttachmentManager
-        if self.root: AttachmentManager(self.root, self)
\ No newline at end of file
+        if self.root: AttachmentManager(self.root, self)
+
+    def open_debug_panel(self):
+        from gui.debug_panel import DebugPanel
+        if self.root: DebugPanel(self.root, self)
\ No newline at end of file
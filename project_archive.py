@@ -0,0 +1,427 @@
+# --- project_archive.py ---
+"""
+Portable ProMan archives: a zip holding manifest.jsonl plus content-addressed
+media (media/<sha256><ext>).
+
+manifest.jsonl is one JSON record per line. The first line is the header,
+and records are ordered so every reference points backwards:
+    header, collection, project, attachment, link, member, subscription, log, attachment_log
+
+Export streams rows straight from SQLite cursors and files straight from
+disk, so memory use does not grow with the database or media size. Archives
+always hold plain text and plain media: an encrypted workspace decrypts on
+export and encrypts again on import, with its own key. Import
+remaps every id, rewrites [ref:ID] in log text, checks each media file's
+SHA-256 while extracting, and records old->new ids in archive_import_map
+inside the same transaction as the rows. Re-running an interrupted import
+continues where it stopped.
+"""
+
+import functools
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+import uuid
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional
+
+from db_controller import DatabaseManager, ATTACHMENT_METADATA_COLUMNS, GLOBAL_COLLECTION_ID
+from db_models import to_iso_date
+from encryption import create_media, media_size, open_media
+
+ARCHIVE_FORMAT = "proman-archive"
+ARCHIVE_VERSION = 1
+MANIFEST_NAME = "manifest.jsonl"
+CHUNK_SIZE = 1024 * 1024
+IMPORT_BATCH_SIZE = 500
+
+# Already-compressed formats are stored as-is; deflating them again only burns CPU.
+PRECOMPRESSED_EXTENSIONS = {".png", ".jpg", ".jpeg", ".gif", ".webp", ".zip"}
+
+REF_PATTERN = re.compile(r"\[ref:(\d+)\]")
+# Checks for file names built from an archive's or a peer's data
+SHA256_PATTERN = re.compile(r"[0-9a-fA-F]{64}")
+MEDIA_EXT_PATTERN = re.compile(r"(\.[A-Za-z0-9]{1,8})?")  # Empty for a file without extension
+
+
+class ArchiveError(Exception):
+    """Raised for malformed archives and checksum mismatches."""
+
+
+def sha256_file(path: str, cipher=None) -> str:
+    """SHA-256 of the file's plaintext, so encrypted and plain copies of one image match."""
+    digest = hashlib.sha256()
+    with open_media(path, cipher) as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def write_media_entry(zf: zipfile.ZipFile, path: str, arcname: str, cipher=None):
+    """Streams a stored media file's plaintext into zf (stored as-is when already compressed)."""
+    info = zipfile.ZipInfo.from_file(path, arcname)
+    info.file_size = media_size(path)
+    info.compress_type = zipfile.ZIP_STORED if os.path.splitext(path)[1].lower() in PRECOMPRESSED_EXTENSIONS else zipfile.ZIP_DEFLATED
+    with open_media(path, cipher) as src, zf.open(info, "w") as dst:
+        shutil.copyfileobj(src, dst, CHUNK_SIZE)
+
+
+def received_media_path(media_dir: str, prefix: str, sha: str, ext: str) -> Optional[str]:
+    """
+    media_dir/<prefix><sha[:16]><ext> for a file from an archive or a peer. None unless sha is a
+    SHA-256 hex digest, ext a plain extension and the resolved path stays directly in media_dir.
+    """
+    if not (isinstance(sha, str) and SHA256_PATTERN.fullmatch(sha) and isinstance(ext, str) and MEDIA_EXT_PATTERN.fullmatch(ext)):
+        return None
+    path = os.path.join(media_dir, f"{prefix}{sha[:16]}{ext}")
+    if os.path.dirname(os.path.realpath(path)) != os.path.realpath(media_dir):
+        return None  # e.g. a symlink planted in media_dir
+    return path
+
+
+def _placeholders(ids: List[int]) -> str:
+    return ",".join("?" * len(ids))
+
+
+# --- EXPORT ---
+
+class ArchiveExporter:
+    def __init__(self, db: DatabaseManager, workers: int = 4, progress: Optional[Callable[[str, int, int], None]] = None):
+        self.db = db
+        self.workers = workers
+        self.progress = progress or (lambda stage, done, total: None)
+
+    def export(self, archive_path: str, project_ids: Optional[List[int]] = None) -> dict:
+        """Writes the given projects (or everything when project_ids is None) to archive_path."""
+        with self.db.connect() as conn:
+            project_filter = self._project_filter(conn, project_ids)
+            attachment_ids = self._attachment_ids(conn, project_filter)
+
+            # 1. Hash every referenced file in parallel (I/O + hashlib both release the GIL)
+            media_paths = self._media_paths(conn, project_filter, attachment_ids)
+            checksums = self._hash_media(media_paths)
+
+            # 2. Manifest goes to a temp file first; records are written as the cursors yield them
+            temp_dir = tempfile.mkdtemp(prefix="proman_export_")
+            try:
+                manifest_path = os.path.join(temp_dir, MANIFEST_NAME)
+                counts = self._write_manifest(conn, manifest_path, project_filter, attachment_ids, checksums)
+
+                # 3. Assemble the zip: manifest + one entry per unique media file
+                partial = archive_path + ".partial"
+                with zipfile.ZipFile(partial, "w", compression=zipfile.ZIP_DEFLATED, allowZip64=True) as zf:
+                    zf.write(manifest_path, MANIFEST_NAME)
+                    written = set()
+                    for i, (path, (digest, arcname)) in enumerate(checksums.items(), start=1):
+                        if arcname not in written:
+                            write_media_entry(zf, path, arcname, self.db.cipher)  # Streams from disk in chunks
+                            written.add(arcname)
+                        self.progress("media", i, len(checksums))
+                os.replace(partial, archive_path)
+            finally:
+                shutil.rmtree(temp_dir, ignore_errors=True)
+
+        counts["media_files"] = len({arc for _digest, arc in checksums.values()})
+        return counts
+
+    def _project_filter(self, conn, project_ids):
+        # Deleted projects still waiting in the trash are not exported
+        live = [row[0] for row in conn.execute("SELECT project_id FROM project WHERE deleted_at IS NULL")]
+        if project_ids is None:
+            return live
+        live = set(live)
+        return [pid for pid in project_ids if pid in live]
+
+    def _attachment_ids(self, conn, project_ids: List[int]) -> List[int]:
+        """Attachments linked to the exported projects plus any their logs reference."""
+        if not project_ids:
+            return []
+        marks = _placeholders(project_ids)
+        ids = {row[0] for row in conn.execute(f"SELECT attachment_id FROM attachment_project WHERE project_id IN ({marks})", project_ids)}
+        ids.update(row[0] for row in conn.execute(f"SELECT attachment_id FROM attachment WHERE project_id IN ({marks})", project_ids))
+        for (content,) in conn.execute(f"SELECT content FROM log WHERE project_id IN ({marks}) AND deleted_at IS NULL", project_ids):
+            ids.update(int(ref) for ref in REF_PATTERN.findall(self.db.open_content(content)))
+        existing = set()
+        id_list = sorted(ids)
+        for start in range(0, len(id_list), 900):
+            chunk = id_list[start:start + 900]
+            existing.update(row[0] for row in conn.execute(f"SELECT attachment_id FROM attachment WHERE attachment_id IN ({_placeholders(chunk)}) AND deleted_at IS NULL", chunk))
+        return sorted(existing)
+
+    def _media_paths(self, conn, project_ids, attachment_ids) -> List[str]:
+        paths = []
+        for start in range(0, len(attachment_ids), 900):
+            chunk = attachment_ids[start:start + 900]
+            paths.extend(row[0] for row in conn.execute(f"SELECT file_path FROM attachment WHERE attachment_id IN ({_placeholders(chunk)})", chunk))
+        for start in range(0, len(project_ids), 900):
+            chunk = project_ids[start:start + 900]
+            paths.extend(row[0] for row in conn.execute(f"SELECT thumbnail_path FROM project WHERE thumbnail_path IS NOT NULL AND project_id IN ({_placeholders(chunk)})", chunk))
+        return sorted({p for p in paths if p and os.path.exists(p)})
+
+    def _hash_media(self, paths: List[str]) -> Dict[str, tuple]:
+        """path -> (sha256, arcname)."""
+        result = {}
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            for i, (path, digest) in enumerate(zip(paths, pool.map(functools.partial(sha256_file, cipher=self.db.cipher), paths)), start=1):
+                ext = os.path.splitext(path)[1].lower()
+                result[path] = (digest, f"media/{digest}{ext}")
+                self.progress("hash", i, len(paths))
+        return result
+
+    def _media_ref(self, path: Optional[str], checksums: dict) -> Optional[dict]:
+        if not path or path not in checksums:
+            return None
+        digest, arcname = checksums[path]
+        return {"name": arcname, "sha256": digest, "size": media_size(path), "original": os.path.basename(path)}
+
+    def _write_manifest(self, conn, manifest_path, project_ids, attachment_ids, checksums) -> dict:
+        counts = {"projects": 0, "logs": 0, "attachments": 0}
+        project_set = set(project_ids)
+
+        with open(manifest_path, "w", encoding="utf-8") as out:
+            def emit(record):
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+            emit({"type": "header", "format": ARCHIVE_FORMAT, "version": ARCHIVE_VERSION,
+                  "archive_id": uuid.uuid4().hex, "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                  "projects": len(project_ids), "attachments": len(attachment_ids)})
+
+            for collection_id, name in conn.execute("SELECT collection_id, name FROM collection"):
+                emit({"type": "collection", "id": collection_id, "name": name})
+
+            for pid, name, priority, due_date, thumbnail in self._rows(conn, "SELECT project_id, name, priority, due_date, thumbnail_path FROM project WHERE project_id IN ({})", project_ids):
+                emit({"type": "project", "id": pid, "name": name, "priority": priority, "due_date": due_date,
+                      "thumbnail": self._media_ref(thumbnail, checksums)})
+                counts["projects"] += 1
+
+            metadata_sql = ", ".join(ATTACHMENT_METADATA_COLUMNS)
+            for aid, path, owner, is_global, is_thumbnail, *metadata in self._rows(conn, f"SELECT attachment_id, file_path, project_id, is_global, is_thumbnail, {metadata_sql} FROM attachment WHERE attachment_id IN ({{}})", attachment_ids):
+                emit({"type": "attachment", "id": aid, "project_id": owner if owner in project_set else None,
+                      "is_global": bool(is_global), "is_thumbnail": bool(is_thumbnail), "media": self._media_ref(path, checksums),
+                      "metadata": dict(zip(ATTACHMENT_METADATA_COLUMNS, metadata))})
+                counts["attachments"] += 1
+
+            for aid, pid in self._rows(conn, "SELECT attachment_id, project_id FROM attachment_project WHERE attachment_id IN ({})", attachment_ids):
+                if pid in project_set:
+                    emit({"type": "link", "attachment_id": aid, "project_id": pid})
+
+            for aid, cid in self._rows(conn, "SELECT attachment_id, collection_id FROM attachment_collection WHERE attachment_id IN ({})", attachment_ids):
+                emit({"type": "member", "attachment_id": aid, "collection_id": cid})
+
+            for pid, cid in self._rows(conn, "SELECT project_id, collection_id FROM project_collection WHERE project_id IN ({})", project_ids):
+                emit({"type": "subscription", "project_id": pid, "collection_id": cid})
+
+            for lid, pid, timestamp, content in self._rows(conn, "SELECT log_id, project_id, timestamp, content FROM log WHERE project_id IN ({}) AND deleted_at IS NULL", project_ids):
+                emit({"type": "log", "id": lid, "project_id": pid, "timestamp": timestamp, "content": self.db.open_content(content)})
+                counts["logs"] += 1
+
+            for aid, lid in self._rows(conn, "SELECT attachment_id, log_id FROM attachment WHERE log_id IS NOT NULL AND attachment_id IN ({})", attachment_ids):
+                emit({"type": "attachment_log", "attachment_id": aid, "log_id": lid})
+
+        return counts
+
+    def _rows(self, conn, sql_template: str, ids: List[int]) -> Iterable[tuple]:
+        """Iterates a cursor in id chunks (stays under SQLite's bound-variable limit, never fetchall)."""
+        for start in range(0, len(ids), 900):
+            chunk = ids[start:start + 900]
+            yield from conn.execute(sql_template.format(_placeholders(chunk)), chunk)
+
+
+# --- IMPORT ---
+
+class ArchiveImporter:
+    def __init__(self, db: DatabaseManager, media_dir: str = "media", progress: Optional[Callable[[str, int, int], None]] = None):
+        self.db = db
+        self.media_dir = media_dir
+        self.progress = progress or (lambda stage, done, total: None)
+
+    def import_archive(self, archive_path: str) -> dict:
+        """Imports (or resumes importing) an archive. Returns counts and the new project ids."""
+        os.makedirs(self.media_dir, exist_ok=True)
+        with zipfile.ZipFile(archive_path) as zf:
+            with zf.open(MANIFEST_NAME) as raw:
+                lines = (line.decode("utf-8") for line in raw)
+                header = json.loads(next(lines))
+                if header.get("format") != ARCHIVE_FORMAT or header.get("version", 0) > ARCHIVE_VERSION:
+                    raise ArchiveError(f"Not a supported ProMan archive: {archive_path}")
+                self.archive_id = header["archive_id"]
+                with self.db.connect() as conn:
+                    self.id_map = self._load_id_map(conn)
+                summary = {"projects": 0, "logs": 0, "attachments": 0, "skipped": 0, "resumed": bool(self.id_map)}
+
+                batch = []
+                for line_number, line in enumerate(lines, start=1):
+                    batch.append(json.loads(line))
+                    if len(batch) >= IMPORT_BATCH_SIZE:
+                        self._import_batch(zf, batch, summary)
+                        batch = []
+                        self.progress("import", line_number, 0)
+                if batch:
+                    self._import_batch(zf, batch, summary)
+
+        summary["project_ids"] = sorted(self.id_map.get("project", {}).values())
+        return summary
+
+    def _load_id_map(self, conn) -> Dict[str, Dict[int, int]]:
+        id_map: Dict[str, Dict[int, int]] = {}
+        for entity, old_id, new_id in conn.execute("SELECT entity, old_id, new_id FROM archive_import_map WHERE archive_id = ?", (self.archive_id,)):
+            id_map.setdefault(entity, {})[old_id] = new_id
+        return id_map
+
+    def _import_batch(self, zf, records: List[dict], summary: dict):
+        """Media first (idempotent), then all rows + id map entries of the batch in one transaction."""
+        for record in records:
+            if record["type"] == "attachment" and record["id"] not in self.id_map.get("attachment", {}):
+                record["local_path"] = self._extract_media(zf, record["media"])
+            elif record["type"] == "project" and record["id"] not in self.id_map.get("project", {}):
+                record["local_path"] = self._extract_media(zf, record["thumbnail"])
+
+        pending_map = []
+        counts = dict(summary)
+
+        def write(conn):
+            # A lock retry runs this again after the rollback: start over from the batch's first record
+            self._forget(pending_map)
+            summary.update(counts)
+            for record in records:
+                self._import_record(conn, record, summary, pending_map)
+            conn.executemany("INSERT INTO archive_import_map (archive_id, entity, old_id, new_id) VALUES (?, ?, ?, ?)",
+                             [(self.archive_id, entity, old, new) for entity, old, new in pending_map])
+        try:
+            self.db.write_transaction(write, "archive import batch")
+        except Exception:
+            self._forget(pending_map)
+            raise
+
+    def _forget(self, pending_map):
+        """Drops ids assigned in a rolled-back transaction."""
+        for entity, old, _new in pending_map:
+            self.id_map.get(entity, {}).pop(old, None)
+        pending_map.clear()
+
+    def _remember(self, pending_map, entity, old_id, new_id):
+        self.id_map.setdefault(entity, {})[old_id] = new_id
+        pending_map.append((entity, old_id, new_id))
+
+    def _mapped(self, entity, old_id):
+        return self.id_map.get(entity, {}).get(old_id) if old_id is not None else None
+
+    def _import_record(self, conn, record, summary, pending_map):
+        kind = record["type"]
+
+        if kind == "collection":
+            if self._mapped("collection", record["id"]) is None:
+                # Collections merge by name ("Global" always maps onto the local Global)
+                conn.execute("INSERT OR IGNORE INTO collection (name) VALUES (?)", (record["name"],))
+                new_id = conn.execute("SELECT collection_id FROM collection WHERE name = ?", (record["name"],)).fetchone()[0]
+                self._remember(pending_map, "collection", record["id"], new_id)
+
+        elif kind == "project":
+            if self._mapped("project", record["id"]) is not None:
+                summary["skipped"] += 1
+                return
+            cursor = conn.execute(
+                "INSERT INTO project (name, priority, due_date, due_date_iso, thumbnail_path) VALUES (?, ?, ?, ?, ?)",
+                (record["name"], record["priority"], record["due_date"], to_iso_date(record["due_date"]), record.get("local_path")),
+            )
+            self._remember(pending_map, "project", record["id"], cursor.lastrowid)
+            summary["projects"] += 1
+
+        elif kind == "attachment":
+            if self._mapped("attachment", record["id"]) is not None:
+                summary["skipped"] += 1
+                return
+            if not record.get("local_path"):
+                return  # Media missing from the archive; nothing to point at
+            metadata = record.get("metadata") or {}  # Absent in archives from before migration 11
+            cursor = conn.execute(
+                f"INSERT INTO attachment (file_path, project_id, is_global, is_thumbnail, {', '.join(ATTACHMENT_METADATA_COLUMNS)}) "
+                f"VALUES (?, ?, ?, ?{', ?' * len(ATTACHMENT_METADATA_COLUMNS)})",
+                (record["local_path"], self._mapped("project", record["project_id"]), int(record["is_global"]), int(record["is_thumbnail"]),
+                 *(metadata.get(c) for c in ATTACHMENT_METADATA_COLUMNS)),
+            )
+            self._remember(pending_map, "attachment", record["id"], cursor.lastrowid)
+            summary["attachments"] += 1
+
+        elif kind == "link":
+            aid, pid = self._mapped("attachment", record["attachment_id"]), self._mapped("project", record["project_id"])
+            if aid and pid:
+                conn.execute("INSERT OR IGNORE INTO attachment_project (attachment_id, project_id) VALUES (?, ?)", (aid, pid))
+
+        elif kind == "member":
+            aid, cid = self._mapped("attachment", record["attachment_id"]), self._mapped("collection", record["collection_id"])
+            if aid and cid:
+                conn.execute("INSERT OR IGNORE INTO attachment_collection (attachment_id, collection_id) VALUES (?, ?)", (aid, cid))
+                if cid == GLOBAL_COLLECTION_ID:
+                    conn.execute("UPDATE attachment SET is_global = 1 WHERE attachment_id = ?", (aid,))
+
+        elif kind == "subscription":
+            pid, cid = self._mapped("project", record["project_id"]), self._mapped("collection", record["collection_id"])
+            if pid and cid:
+                conn.execute("INSERT OR IGNORE INTO project_collection (project_id, collection_id) VALUES (?, ?)", (pid, cid))
+
+        elif kind == "log":
+            if self._mapped("log", record["id"]) is not None:
+                summary["skipped"] += 1
+                return
+            pid = self._mapped("project", record["project_id"])
+            if pid is None:
+                return
+            cursor = conn.execute("INSERT INTO log (project_id, timestamp, content) VALUES (?, ?, ?)",
+                                  (pid, record["timestamp"], self.db.seal_content(self._rewrite_refs(record["content"]))))
+            self._remember(pending_map, "log", record["id"], cursor.lastrowid)
+            summary["logs"] += 1
+
+        elif kind == "attachment_log":
+            aid, lid = self._mapped("attachment", record["attachment_id"]), self._mapped("log", record["log_id"])
+            if aid and lid:
+                conn.execute("UPDATE attachment SET log_id = ? WHERE attachment_id = ?", (lid, aid))
+
+    def _rewrite_refs(self, content: str) -> str:
+        """
+        [ref:OLD] -> [ref:NEW]. A reference to an attachment the archive does not carry becomes
+        the plain text [ref:?OLD]: kept as is, it would link to whatever local attachment has that id.
+        """
+        mapping = self.id_map.get("attachment", {})
+
+        def replace(match):
+            new_id = mapping.get(int(match.group(1)))
+            return f"[ref:{new_id}]" if new_id is not None else f"[ref:?{match.group(1)}]"
+
+        return REF_PATTERN.sub(replace, content)
+
+    def _extract_media(self, zf, media: Optional[dict]) -> Optional[str]:
+        """Streams one media entry to media_dir, verifying its SHA-256. Identical files are reused."""
+        if not media:
+            return None
+        destination = received_media_path(self.media_dir, "imp_", media.get("sha256"), os.path.splitext(media["name"])[1])
+        if destination is None:
+            raise ArchiveError(f"Invalid media entry {media['name']!r} ({media.get('original')})")
+        if os.path.exists(destination) and media_size(destination) == media["size"]:
+            return destination  # Already extracted (resume, or shared between records)
+
+        partial = destination + ".partial"
+        digest = hashlib.sha256()
+        with zf.open(media["name"]) as src, create_media(partial, self.db.cipher) as dst:
+            for chunk in iter(lambda: src.read(CHUNK_SIZE), b""):
+                digest.update(chunk)
+                dst.write(chunk)
+        if digest.hexdigest() != media["sha256"]:
+            os.remove(partial)
+            raise ArchiveError(f"Checksum mismatch for {media['name']} ({media.get('original')})")
+        os.replace(partial, destination)
+        return destination
+
+
+# --- CONVENIENCE WRAPPERS ---
+
+def export_archive(db: DatabaseManager, archive_path: str, project_ids: Optional[List[int]] = None, workers: int = 4, progress=None) -> dict:
+    return ArchiveExporter(db, workers, progress).export(archive_path, project_ids)
+
+def import_archive(db: DatabaseManager, archive_path: str, media_dir: str = "media", progress=None) -> dict:
+    return ArchiveImporter(db, media_dir, progress).import_archive(archive_path)
@@ -0,0 +1,256 @@
+# --- reminders.py ---
+"""
+Due-date reminders. Each project with a due date gets two events:
+
+    due_soon  - lead_days before the due date, at remind_hour
+    overdue   - the day after the due date, at remind_hour
+
+Events sit in a heap ordered by fire time. The scheduler loads the projects
+whose events can still fire once (an indexed range on due_date_iso), then
+follows the change journal: every project insert/update/delete, from this
+window, another instance, the API or a sync, reschedules just that project.
+Superseded heap entries are skipped lazily when they reach the top.
+
+With a Tk root the scheduler runs on root.after(); without one (scripts,
+the API server) a daemon thread drives it and notify is called there.
+
+    python reminders.py [--workspace NAME] [--watch]
+"""
+
+import argparse
+import heapq
+import threading
+from dataclasses import dataclass
+from datetime import date, datetime, time as dt_time, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+from db_controller import DatabaseManager
+from db_models import ProjectQuery, to_iso_date
+
+DEFAULT_LEAD_DAYS = 1
+DEFAULT_REMIND_HOUR = 9
+MAX_WAIT_S = 60  # Wake at least this often: picks up journal changes, survives clock jumps and suspend
+JOURNAL_PAGE = 1000
+
+
+@dataclass(slots=True)
+class Reminder:
+    project_id: int
+    name: str
+    due_date: str   # 'YYYY-MM-DD'
+    kind: str       # "due_soon" or "overdue"
+    fire_at: datetime
+
+    def describe(self) -> str:
+        if self.kind == "overdue":
+            return f"{self.name} is overdue (was due {self.due_date})"
+        days = (date.fromisoformat(self.due_date) - self.fire_at.date()).days
+        if days < 0:
+            return f"{self.name} was due {self.due_date}"
+        return f"{self.name} is due {'today' if days == 0 else 'tomorrow' if days == 1 else f'in {days} days'} ({self.due_date})"
+
+
+def due_overview(db: DatabaseManager, today: Optional[date] = None) -> dict:
+    """Overdue projects (oldest first) and those due in the next 7 days, both as range scans on idx_project_due."""
+    today = today or date.today()
+    return {
+        "overdue": db.query_projects(ProjectQuery(sort_by="due_date", descending=False, due_to=(today - timedelta(days=1)).isoformat())),
+        "this_week": db.query_projects(ProjectQuery(sort_by="due_date", descending=False, due_from=today.isoformat(),
+                                                    due_to=(today + timedelta(days=6)).isoformat())),
+    }
+
+
+class ReminderScheduler:
+    def __init__(self, db: DatabaseManager, notify: Callable[[List[Reminder]], None],
+                 lead_days: int = DEFAULT_LEAD_DAYS, remind_hour: int = DEFAULT_REMIND_HOUR,
+                 clock: Callable[[], datetime] = datetime.now):
+        self.db = db
+        self.notify = notify
+        self.lead_days = lead_days
+        self.remind_hour = remind_hour
+        self.clock = clock
+        self.heap: List[Tuple[datetime, int, int, str]] = []  # (fire_at, project_id, version, kind)
+        self.projects: Dict[int, Tuple[str, str, int]] = {}    # project_id -> (name, due iso, version)
+        self.fired = set()                                     # (project_id, kind, due): once per session
+        self.cursor: Optional[int] = None
+        self.lock = threading.RLock()
+        self._root = None
+        self._after_id = None
+        self._thread = None
+        self._wake = threading.Event()
+        self._stopped = False
+
+    # --- SCHEDULE ---
+
+    def _events(self, due_iso: str, now: datetime) -> List[Tuple[datetime, str]]:
+        """Future events, plus the latest missed one (fired right away) while it is still relevant."""
+        due = date.fromisoformat(due_iso)
+        at = dt_time(self.remind_hour)
+        overdue = datetime.combine(due + timedelta(days=1), at)
+        events = [(datetime.combine(due - timedelta(days=self.lead_days), at), "due_soon"), (overdue, "overdue")]
+        upcoming = [e for e in events if e[0] > now]
+        missed = [e for e in events if e[0] <= now]
+        if missed and now < overdue + timedelta(days=1):
+            upcoming.insert(0, (now, missed[-1][1]))
+        return upcoming
+
+    def _schedule(self, project_id: int, name: str, due_iso: Optional[str], now: datetime):
+        previous = self.projects.get(project_id)
+        if previous is not None and previous[:2] == (name, due_iso):
+            return  # Priority/thumbnail edits don't move reminders
+        if due_iso is None:
+            self.projects.pop(project_id, None)
+            return
+        version = previous[2] + 1 if previous else 0
+        self.projects[project_id] = (name, due_iso, version)
+        for fire_at, kind in self._events(due_iso, now):
+            heapq.heappush(self.heap, (fire_at, project_id, version, kind))
+        if len(self.heap) > 64 and len(self.heap) > 4 * len(self.projects):
+            self._compact()
+
+    def _compact(self):
+        """Drops superseded entries once they outnumber live ones."""
+        self.heap = [e for e in self.heap if e[1] in self.projects and self.projects[e[1]][2] == e[2]]
+        heapq.heapify(self.heap)
+
+    def load(self):
+        """Initial fill: projects whose reminders can still fire (recently overdue or later)."""
+        with self.lock:
+            now = self.clock()
+            self.cursor = self.db.journal_head()  # Before reading, so changes made meanwhile are replayed
+            self.heap, self.projects = [], {}
+            oldest = (now.date() - timedelta(days=1)).isoformat()
+            for project in self.db.query_projects(ProjectQuery(sort_by="due_date", descending=False, due_from=oldest)):
+                self._schedule(project.id, project.name, to_iso_date(project.due_date), now)
+
+    def refresh(self):
+        """Applies project changes from the change journal since the last call."""
+        with self.lock:
+            if self.cursor is None:
+                self.load()
+                return
+            now = self.clock()
+            while True:
+                changes, self.cursor = self.db.changes_since(self.cursor, JOURNAL_PAGE, ["project"])
+                for change in changes:
+                    if change.op == "delete" or change.payload.get("deleted_at"):
+                        # Tombstoned (in the trash) counts as deleted; a restore comes back as an update
+                        self.projects.pop(change.entity_id, None)
+                    else:
+                        payload = change.payload
+                        self._schedule(change.entity_id, payload["name"], to_iso_date(payload["due_date"]), now)
+                if len(changes) < JOURNAL_PAGE:
+                    break
+        self._reschedule()
+
+    def pop_due(self, now: Optional[datetime] = None) -> List[Reminder]:
+        """Removes and returns every event due at `now`, skipping superseded and already shown ones."""
+        now = now or self.clock()
+        due = []
+        with self.lock:
+            while self.heap and self.heap[0][0] <= now:
+                fire_at, project_id, version, kind = heapq.heappop(self.heap)
+                current = self.projects.get(project_id)
+                if current is None or current[2] != version:
+                    continue
+                name, due_iso, _version = current
+                if (project_id, kind, due_iso) in self.fired:
+                    continue
+                self.fired.add((project_id, kind, due_iso))
+                due.append(Reminder(project_id, name, due_iso, kind, fire_at))
+        return due
+
+    def next_fire_time(self) -> Optional[datetime]:
+        with self.lock:
+            while self.heap and (self.heap[0][1] not in self.projects or self.projects[self.heap[0][1]][2] != self.heap[0][2]):
+                heapq.heappop(self.heap)
+            return self.heap[0][0] if self.heap else None
+
+    # --- DRIVING ---
+
+    def _delay_s(self) -> float:
+        next_time = self.next_fire_time()
+        if next_time is None:
+            return MAX_WAIT_S
+        return min(MAX_WAIT_S, max(0.0, (next_time - self.clock()).total_seconds()))
+
+    def tick(self):
+        """Catches up with the journal and delivers due reminders. Runs on the Tk loop or the worker thread."""
+        try:
+            self.refresh()
+            fired = self.pop_due()
+            if fired:
+                self.notify(fired)
+        except Exception as e:
+            print(f"Reminder check failed: {e}")
+            self.db.instrumentation.record_error("reminders", str(e))
+
+    def start(self, root=None):
+        """Loads the heap and starts firing: via root.after() when given a Tk root, else a daemon thread."""
+        self.load()
+        self._stopped = False
+        if root is not None:
+            self._root = root
+            self._after_id = root.after(0, self._tk_tick)
+        else:
+            self._thread = threading.Thread(target=self._thread_loop, daemon=True, name="proman-reminders")
+            self._thread.start()
+
+    def stop(self):
+        self._stopped = True
+        if self._root is not None and self._after_id is not None:
+            self._root.after_cancel(self._after_id)
+            self._after_id = None
+        self._wake.set()
+
+    def _reschedule(self):
+        """A change may have put an event before the current wait: wake up early."""
+        if self._root is not None and self._after_id is not None and not self._stopped:
+            self._root.after_cancel(self._after_id)
+            self._after_id = self._root.after(int(self._delay_s() * 1000), self._tk_tick)
+        elif self._thread is not None:
+            self._wake.set()
+
+    def _tk_tick(self):
+        self._after_id = None
+        self.tick()
+        if not self._stopped:
+            self._after_id = self._root.after(int(self._delay_s() * 1000), self._tk_tick)
+
+    def _thread_loop(self):
+        while not self._stopped:
+            self.tick()
+            self._wake.wait(self._delay_s())
+            self._wake.clear()
+
+
+def main():
+    import time
+    from workspaces import WorkspaceConfig
+
+    parser = argparse.ArgumentParser(description="Show overdue and upcoming projects.")
+    parser.add_argument("--workspace", default=None, help="Workspace from proman.json (default: the active one)")
+    parser.add_argument("--lead-days", type=int, default=DEFAULT_LEAD_DAYS)
+    parser.add_argument("--watch", action="store_true", help="Keep running and print reminders as they fire")
+    args = parser.parse_args()
+
+    db = DatabaseManager(db_path=WorkspaceConfig().get(args.workspace).db_path)
+    overview = due_overview(db)
+    for title, projects in (("Overdue", overview["overdue"]), ("Due this week", overview["this_week"])):
+        print(f"{title} ({len(projects)}):")
+        for p in projects:
+            print(f"  {p.due_date}  P{p.priority}  {p.name}")
+
+    if args.watch:
+        scheduler = ReminderScheduler(db, lambda fired: [print(f"[{datetime.now():%H:%M}] {r.describe()}") for r in fired],
+                                      lead_days=args.lead_days)
+        scheduler.start()
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            scheduler.stop()
+
+
+if __name__ == "__main__":
+    main()
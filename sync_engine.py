@@ -0,0 +1,904 @@
+# --- sync_engine.py ---
+"""
+Two-way sync between ProMan databases (e.g. a desktop and a laptop), either
+through bundle files or directly over a socket:
+
+    python sync_engine.py export laptop.zip --to laptop    # on the desktop
+    python sync_engine.py import laptop.zip                # on the laptop, and back
+    python sync_engine.py serve --token SECRET             # on one machine
+    python sync_engine.py connect desktop:8766 --token SECRET
+
+What travels is a delta: the change journal since the peer's last
+acknowledged cursor, collapsed to the final state of every touched row, plus
+the media those rows reference (content-addressed by SHA-256). The first sync
+with a new peer sends a snapshot of every row instead. Over a socket, media
+the receiver already has is never sent.
+
+Row ids differ between databases, so each side keeps sync_map (their id <->
+our id) and every delta carries the pairs the sender knows. Rows without a
+mapping are matched by content first (same project name, same log text on
+the same day, same file bytes), which makes syncing two copies of one
+database safe.
+
+Conflicts: when both sides changed the same row since they last heard from
+each other, the newer edit wins (last-writer-wins on the edit time, then the
+replica id) and the losing version is kept in sync_conflict for review.
+Both sides pick the same winner, so they converge without a second round.
+
+A deletion travels as an update of deleted_at (the row sits in the trash on
+both sides and an undo syncs the same way); once the trash is purged the
+hard delete follows as a delete.
+
+Deltas and media always travel as plain text and plain bytes, so each side
+may be encrypted with its own key (or not at all, see encryption.py); log
+text is decrypted when a delta is built and sealed again when it is applied.
+"""
+
+import argparse
+import bisect
+import functools
+import hmac
+import json
+import os
+import shutil
+import socket
+import sqlite3
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from db_controller import DatabaseManager, JOURNALED_TABLES
+from db_models import to_iso_date
+from encryption import create_media, media_size, open_media
+from project_archive import CHUNK_SIZE, REF_PATTERN, received_media_path, sha256_file, write_media_entry
+
+SYNC_FORMAT = "proman-sync"
+SYNC_VERSION = 1
+DELTA_NAME = "delta.json"
+DEFAULT_SYNC_PORT = 8766
+MAX_MESSAGE_BYTES = 512 * 1024 * 1024
+LOOPBACK_HOSTS = {"127.0.0.1", "localhost", "::1"}
+
+# Rows with their own id, in the order upserts are applied (referenced rows first; deletes run in reverse)
+ROW_ENTITIES = ["collection", "project", "log", "attachment"]
+# Link tables: (column, entity it points at) for both keys
+LINK_ENTITIES = {
+    "attachment_project": (("attachment_id", "attachment"), ("project_id", "project")),
+    "attachment_collection": (("attachment_id", "attachment"), ("collection_id", "collection")),
+    "project_collection": (("project_id", "project"), ("collection_id", "collection")),
+}
+APPLY_ORDER = ROW_ENTITIES + list(LINK_ENTITIES)
+FOREIGN_KEYS = {"log": {"project_id": "project"}, "attachment": {"project_id": "project", "log_id": "log"}}
+MEDIA_COLUMNS = {"project": "thumbnail_path", "attachment": "file_path"}
+NO_STAMP = ("", "")
+
+
+class SyncError(Exception):
+    """Raised for unusable deltas/bundles and refused connections."""
+
+
+def _id_column(entity: str) -> str:
+    return JOURNALED_TABLES[entity][0]
+
+
+def _data_columns(entity: str) -> Tuple[str, ...]:
+    id_column, columns = JOURNALED_TABLES[entity]
+    return tuple(c for c in columns if c != id_column)
+
+
+def _journal_head(conn) -> int:
+    row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'change_journal'").fetchone()
+    return row[0] if row else 0
+
+
+def _now() -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+
+
+class EchoRanges:
+    """Journal ranges written by applying a peer's delta: seq -> peer_id (or None for local edits)."""
+
+    def __init__(self, conn):
+        rows = sorted(conn.execute("SELECT first_seq, last_seq, peer_id FROM sync_applied"))
+        self.firsts = [r[0] for r in rows]
+        self.rows = rows
+
+    def peer_for(self, seq: int) -> Optional[str]:
+        i = bisect.bisect_right(self.firsts, seq) - 1
+        if i >= 0 and self.rows[i][0] <= seq <= self.rows[i][1]:
+            return self.rows[i][2]
+        return None
+
+
+# --- ENGINE ---
+
+class SyncEngine:
+    def __init__(self, db: DatabaseManager, media_dir: str = "media", name: Optional[str] = None, workers: int = 4):
+        self.db = db
+        self.media_dir = media_dir
+        self.name = name or socket.gethostname()
+        self.workers = workers
+        with self.db.connect() as conn:
+            self.replica_id = conn.execute("SELECT value FROM sync_state WHERE key = 'replica_id'").fetchone()[0]
+
+    def peers(self) -> List[dict]:
+        with self.db.connect() as conn:
+            rows = conn.execute("SELECT peer_id, name, acked, received, last_sync FROM sync_peer ORDER BY name").fetchall()
+        return [dict(zip(("peer_id", "name", "acked", "received", "last_sync"), row)) for row in rows]
+
+    def find_peer(self, name_or_id: str) -> dict:
+        """A known peer by name or replica id (prefix)."""
+        matches = [p for p in self.peers() if p["name"] == name_or_id or p["peer_id"].startswith(name_or_id)]
+        if len(matches) != 1:
+            known = ", ".join(p["name"] or p["peer_id"][:8] for p in self.peers()) or "none yet"
+            raise SyncError(f"Unknown or ambiguous peer '{name_or_id}' (known: {known}).")
+        return matches[0]
+
+    def new_identity(self):
+        """Gives this database a fresh replica id and forgets all peers. Run it on a copied database file."""
+        def renew(conn):
+            conn.execute("UPDATE sync_state SET value = lower(hex(randomblob(16))) WHERE key = 'replica_id'")
+            for table in ("sync_peer", "sync_map", "sync_applied"):
+                conn.execute(f"DELETE FROM {table}")
+            return conn.execute("SELECT value FROM sync_state WHERE key = 'replica_id'").fetchone()[0]
+        self.replica_id = self.db.write_transaction(renew, "sync: new identity")
+
+    # --- BUILD ---
+
+    def build_delta(self, peer_id: Optional[str] = None, since: Optional[int] = None, full: bool = False) -> Tuple[dict, Dict[str, str]]:
+        """
+        The changes peer_id has not acknowledged yet, or a snapshot of everything when the peer
+        is unknown, full is set, or the journal was pruned past its cursor. `since` overrides the
+        stored cursor (the socket protocol asks the peer instead). Returns (delta, sha256 -> path).
+        """
+        with self.db.connect() as conn:
+            conn.isolation_level = None
+            conn.execute("BEGIN")  # One read snapshot for rows, journal and id map
+            try:
+                peer = conn.execute("SELECT acked, received FROM sync_peer WHERE peer_id = ?", (peer_id,)).fetchone() if peer_id else None
+                if since is None and peer is not None:
+                    since = peer[0]
+                if full or (since is not None and self._pruned_past(conn, since)):
+                    since = None
+                head = _journal_head(conn)
+                echoes = EchoRanges(conn)
+                if since is None:
+                    changes = self._snapshot(conn, echoes)
+                else:
+                    changes = self._journal_delta(conn, since, peer_id, echoes)
+                id_map = self._outgoing_id_map(conn, peer_id, changes) if peer_id else {}
+            finally:
+                conn.execute("COMMIT")
+
+        media = self._attach_media(changes)
+        delta = {
+            "format": SYNC_FORMAT, "version": SYNC_VERSION,
+            "replica_id": self.replica_id, "name": self.name, "to": peer_id,
+            "since": since, "head": head, "ack": peer[1] if peer is not None else None,
+            "created": _now(), "id_map": id_map, "changes": changes,
+            "media": {sha: {"ext": os.path.splitext(path)[1].lower(), "size": media_size(path)} for sha, path in media.items()},
+        }
+        return delta, media
+
+    def _pruned_past(self, conn, since: int) -> bool:
+        # Journal seqs never repeat, so a first entry after since + 1 means entries were pruned
+        first = conn.execute("SELECT MIN(seq) FROM change_journal").fetchone()[0]
+        return since < _journal_head(conn) and (first is None or first > since + 1)
+
+    def _stamp(self, conn, entity, entity_id, changed_at, seq, echoes) -> list:
+        """When (and where) the row's current state was written: the local edit, or the synced original."""
+        if echoes.peer_for(seq) is None:
+            return [changed_at, self.replica_id]
+        row = conn.execute("SELECT changed_at, replica_id FROM sync_version WHERE entity = ? AND local_id = ?", (entity, entity_id)).fetchone()
+        return list(row) if row else [changed_at, self.replica_id]
+
+    def _snapshot(self, conn, echoes) -> List[dict]:
+        changes = []
+        for entity in APPLY_ORDER:
+            id_column, columns = JOURNALED_TABLES[entity]
+            latest = {}
+            if entity not in LINK_ENTITIES:
+                # Bare columns next to MAX() come from the row holding the maximum
+                for entity_id, seq, changed_at in conn.execute(
+                        "SELECT entity_id, MAX(seq), changed_at FROM change_journal WHERE entity = ? GROUP BY entity_id", (entity,)):
+                    latest[entity_id] = (seq, changed_at)
+            for values in conn.execute(f"SELECT {', '.join(columns)} FROM {entity}"):
+                row = self._plain_row(entity, dict(zip(columns, values)))
+                change = {"entity": entity, "op": "upsert", "seq": 0, "row": row}
+                if entity not in LINK_ENTITIES:
+                    entity_id = row[id_column]
+                    seq, changed_at = latest.get(entity_id, (0, ""))
+                    change.update(id=entity_id, seq=seq,
+                                  stamp=self._stamp(conn, entity, entity_id, changed_at, seq, echoes) if seq else ["", self.replica_id])
+                changes.append(change)
+        return changes
+
+    def _journal_delta(self, conn, since, peer_id, echoes) -> List[dict]:
+        """Journal entries after since, one per row (its final state), minus what peer_id sent us."""
+        final = {}
+        for seq, entity, entity_id, op, changed_at, payload in conn.execute(
+                "SELECT seq, entity, entity_id, op, changed_at, payload FROM change_journal WHERE seq > ? ORDER BY seq", (since,)):
+            if entity in LINK_ENTITIES:
+                payload = json.loads(payload)
+                key = (entity, tuple(payload.values()))
+            else:
+                key = (entity, entity_id)  # Parsed only if it ends up being sent
+            final[key] = (seq, entity, entity_id, op, changed_at, payload)
+
+        changes = []
+        for seq, entity, entity_id, op, changed_at, payload in sorted(final.values(), key=lambda item: item[0]):
+            if peer_id and echoes.peer_for(seq) == peer_id:
+                continue  # The peer's own change coming back
+            row = payload if entity in LINK_ENTITIES else self._plain_row(entity, json.loads(payload))
+            change = {"entity": entity, "op": "delete" if op == "delete" else "upsert", "seq": seq, "row": row}
+            if entity not in LINK_ENTITIES:
+                change.update(id=entity_id, stamp=self._stamp(conn, entity, entity_id, changed_at, seq, echoes))
+            changes.append(change)
+        return changes
+
+    def _plain_row(self, entity: str, row: dict) -> dict:
+        if entity == "log" and isinstance(row.get("content"), str):
+            row["content"] = self.db.open_content(row["content"])
+        return row
+
+    def _outgoing_id_map(self, conn, peer_id, changes) -> Dict[str, List[list]]:
+        """[our id, their id] for every row the delta mentions that the peer already has under another id."""
+        # entity -> {id: seq of the delete being sent}; a mapping only has to survive until that delete
+        referenced = {entity: {} for entity in ROW_ENTITIES}
+        for change in changes:
+            entity, row = change["entity"], change["row"]
+            if entity in LINK_ENTITIES:
+                for column, target in LINK_ENTITIES[entity]:
+                    referenced[target].setdefault(row[column], None)
+                continue
+            referenced[entity][change["id"]] = change["seq"] if change["op"] == "delete" else None
+            for column, target in FOREIGN_KEYS.get(entity, {}).items():
+                if row.get(column) is not None:
+                    referenced[target].setdefault(row[column], None)
+
+        id_map = {}
+        for entity, ids in referenced.items():
+            pairs = []
+            for local_id, deleted_at in ids.items():
+                found = conn.execute("SELECT remote_id, mapped_seq FROM sync_map WHERE peer_id = ? AND entity = ? AND local_id = ?",
+                                     (peer_id, entity, local_id)).fetchone()
+                if found and not _deleted_since(conn, entity, local_id, found[1], deleted_at):
+                    pairs.append([local_id, found[0]])
+            if pairs:
+                id_map[entity] = pairs
+        return id_map
+
+    def _attach_media(self, changes) -> Dict[str, str]:
+        """Replaces media paths in upserts with {sha256, ext, size}; returns sha256 -> local path."""
+        paths = sorted({c["row"][MEDIA_COLUMNS[c["entity"]]] for c in changes
+                        if c["op"] == "upsert" and c["entity"] in MEDIA_COLUMNS and c["row"].get(MEDIA_COLUMNS[c["entity"]])})
+        paths = [p for p in paths if os.path.exists(p)]
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            checksums = dict(zip(paths, pool.map(functools.partial(sha256_file, cipher=self.db.cipher), paths)))
+        for change in changes:
+            column = MEDIA_COLUMNS.get(change["entity"])
+            if change["op"] == "upsert" and column:
+                path = change["row"].get(column)
+                change["row"][column] = {"sha256": checksums[path], "ext": os.path.splitext(path)[1].lower(),
+                                         "size": media_size(path)} if path in checksums else None
+        return {sha: path for path, sha in checksums.items()}
+
+    # --- APPLY ---
+
+    def media_path(self, sha: str, ext: str) -> str:
+        """Where the peer's file sha goes; both values come from the peer, so they are checked first."""
+        path = received_media_path(self.media_dir, "sync_", sha, ext)
+        if path is None:
+            raise SyncError(f"Invalid media entry in the delta: {str(sha)[:64]!r} {str(ext)[:16]!r}")
+        return os.path.abspath(path)
+
+    def missing_media(self, delta: dict) -> List[str]:
+        """The delta's media files this side does not have yet."""
+        missing = []
+        for sha, info in delta["media"].items():
+            path = self.media_path(sha, info["ext"])
+            if not (os.path.exists(path) and media_size(path) == info["size"]):
+                missing.append(sha)
+        return missing
+
+    def receive_media(self, delta: dict, fetch: Callable[[str, object], None]) -> Dict[str, str]:
+        """
+        Stores missing media via fetch(sha, file) (which writes the plain bytes into file, encrypted
+        on the way to disk in an encrypted workspace), checking each SHA-256. Returns sha256 -> local path.
+        """
+        os.makedirs(self.media_dir, exist_ok=True)
+        for sha in self.missing_media(delta):
+            destination = self.media_path(sha, delta["media"][sha]["ext"])
+            partial = destination + ".partial"
+            with create_media(partial, self.db.cipher) as dst:
+                fetch(sha, dst)
+            if sha256_file(partial, self.db.cipher) != sha:
+                os.remove(partial)
+                raise SyncError(f"Checksum mismatch for media {sha[:16]}")
+            os.replace(partial, destination)
+        return {sha: self.media_path(sha, info["ext"]) for sha, info in delta["media"].items()}
+
+    def apply_delta(self, delta: dict, media_paths: Dict[str, str]) -> dict:
+        """Applies a peer's delta in one transaction (media must already be in place). Returns a summary."""
+        if delta.get("format") != SYNC_FORMAT or delta.get("version", 0) > SYNC_VERSION:
+            raise SyncError("Not a supported ProMan sync delta.")
+        peer_id = delta["replica_id"]
+        if peer_id == self.replica_id:
+            raise SyncError("Both databases have the same sync identity: one is a copy of the other. "
+                            "Run 'python sync_engine.py new-identity' on one of them first.")
+        if delta.get("to") not in (None, self.replica_id):
+            raise SyncError(f"This delta was made for another database ({delta['to'][:8]}).")
+
+        def apply(conn):
+            peer = conn.execute("SELECT received FROM sync_peer WHERE peer_id = ?", (peer_id,)).fetchone()
+            received = peer[0] if peer else 0
+            if delta["since"] is not None and delta["since"] > received:
+                raise SyncError(f"Changes {received + 1}-{delta['since']} from {delta['name']} never arrived here "
+                                f"(a lost bundle?). Export a full bundle there with --full.")
+            start = _journal_head(conn)
+            applier = DeltaApplier(conn, self.replica_id, peer_id, delta.get("ack") or 0, start, media_paths, self.db)
+            summary = applier.apply(delta, skip_through=received if delta["since"] is not None else 0)
+            end = _journal_head(conn)
+            if end > start:
+                conn.execute("INSERT INTO sync_applied (peer_id, first_seq, last_seq) VALUES (?, ?, ?)", (peer_id, start + 1, end))
+            conn.execute("""
+                INSERT INTO sync_peer (peer_id, name, acked, received, last_sync) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(peer_id) DO UPDATE SET name = excluded.name, acked = MAX(acked, excluded.acked),
+                    received = MAX(received, excluded.received), last_sync = excluded.last_sync
+            """, (peer_id, delta["name"], delta.get("ack") or 0, delta["head"], _now()))
+            return summary
+
+        summary = self.db.write_transaction(apply, "sync: apply delta")
+        summary["media"] = len(delta["media"])
+        self._discard_unused(media_paths.values())
+        return summary
+
+    def _discard_unused(self, paths):
+        """Removes received files no row ended up pointing at (e.g. matched to an identical local file)."""
+        with self.db.connect() as conn:
+            for path in paths:
+                used = conn.execute("SELECT 1 FROM attachment WHERE file_path = ? UNION ALL SELECT 1 FROM project WHERE thumbnail_path = ? LIMIT 1",
+                                    (path, path)).fetchone()
+                if not used and os.path.exists(path):
+                    os.remove(path)
+
+    # --- CONFLICTS ---
+
+    def conflicts(self, include_resolved: bool = False) -> List[dict]:
+        sql = "SELECT conflict_id, peer_id, entity, local_id, kept, local_payload, remote_payload, detected_at, resolved FROM sync_conflict"
+        if not include_resolved:
+            sql += " WHERE resolved = 0"
+        with self.db.connect() as conn:
+            rows = conn.execute(sql + " ORDER BY conflict_id").fetchall()
+        keys = ("conflict_id", "peer_id", "entity", "local_id", "kept", "local", "remote", "detected_at", "resolved")
+        result = []
+        for row in rows:
+            item = dict(zip(keys, row))
+            # Payloads hold log text as stored (sealed in encrypted workspaces), so resolving writes it back as is
+            item["local"] = self._plain_row(item["entity"], json.loads(item["local"])) if item["local"] else None
+            item["remote"] = self._plain_row(item["entity"], json.loads(item["remote"])) if item["remote"] else None
+            result.append(item)
+        return result
+
+    def resolve_conflict(self, conflict_id: int, keep: str):
+        """
+        Marks a conflict resolved, writing the chosen version ('local' or 'remote') back if it is
+        not the current one. That write is an ordinary edit, so it syncs to the peer and wins there.
+        """
+        if keep not in ("local", "remote"):
+            raise ValueError("keep must be 'local' or 'remote'")
+        def resolve(conn):
+            row = conn.execute("SELECT entity, local_id, local_payload, remote_payload FROM sync_conflict WHERE conflict_id = ?",
+                               (conflict_id,)).fetchone()
+            if row is None:
+                raise ValueError(f"No conflict {conflict_id}")
+            entity, local_id, local_payload, remote_payload = row
+            chosen = local_payload if keep == "local" else remote_payload
+            if chosen:
+                values = json.loads(chosen)
+                assignments = ", ".join(f"{column} = ?" for column in values)
+                conn.execute(f"UPDATE {entity} SET {assignments} WHERE {_id_column(entity)} = ?", (*values.values(), local_id))
+            conn.execute("UPDATE sync_conflict SET resolved = 1 WHERE conflict_id = ?", (conflict_id,))
+        self.db.write_transaction(resolve, "sync: resolve conflict")
+
+    # --- BUNDLES ---
+
+    def export_bundle(self, bundle_path: str, peer: Optional[str] = None, full: bool = False) -> dict:
+        """Writes a zip with the delta for peer (name or id; a snapshot when None or full) and its media."""
+        peer_id = self.find_peer(peer)["peer_id"] if peer else None
+        delta, media = self.build_delta(peer_id, full=full)
+        partial = bundle_path + ".partial"
+        with zipfile.ZipFile(partial, "w", compression=zipfile.ZIP_DEFLATED, allowZip64=True) as zf:
+            zf.writestr(DELTA_NAME, json.dumps(delta, ensure_ascii=False))
+            for sha, path in media.items():
+                write_media_entry(zf, path, f"media/{sha}{os.path.splitext(path)[1].lower()}", self.db.cipher)
+        os.replace(partial, bundle_path)
+        return {"changes": len(delta["changes"]), "media": len(media), "snapshot": delta["since"] is None}
+
+    def import_bundle(self, bundle_path: str) -> dict:
+        with zipfile.ZipFile(bundle_path) as zf:
+            try:
+                delta = json.loads(zf.read(DELTA_NAME))
+            except KeyError:
+                raise SyncError(f"Not a ProMan sync bundle: {bundle_path}")
+
+            def fetch(sha, dst):
+                with zf.open(f"media/{sha}{delta['media'][sha]['ext']}") as src:
+                    shutil.copyfileobj(src, dst, CHUNK_SIZE)
+
+            media_paths = self.receive_media(delta, fetch)
+        return self.apply_delta(delta, media_paths)
+
+    # --- SOCKET ---
+
+    def serve(self, host: str = "127.0.0.1", port: int = DEFAULT_SYNC_PORT, token: Optional[str] = None, once: bool = False):
+        """Accepts sync sessions one at a time. A token is required unless listening on loopback only."""
+        if host not in LOOPBACK_HOSTS and not token:
+            raise SyncError("Listening beyond localhost needs a --token (or PROMAN_SYNC_TOKEN).")
+        with socket.create_server((host, port)) as server:
+            print(f"ProMan sync listening on {host}:{server.getsockname()[1]}")
+            while True:
+                conn, address = server.accept()
+                with conn:
+                    try:
+                        summary = SyncSession(self, conn, token).respond()
+                        print(f"Synced with {address[0]}: {summary}")
+                    except (SyncError, OSError, ValueError) as e:
+                        print(f"Sync with {address[0]} failed: {e}")
+                if once:
+                    return
+
+    def sync_with(self, host: str, port: int = DEFAULT_SYNC_PORT, token: Optional[str] = None) -> dict:
+        """Runs one two-way sync against a serving peer. Returns what was applied here."""
+        with socket.create_connection((host, port), timeout=60) as conn:
+            return SyncSession(self, conn, token).initiate()
+
+
+def _deleted_since(conn, entity: str, local_id: int, seq: int, before: Optional[int] = None) -> bool:
+    """True when the row was deleted after seq (and before `before`): its id may since belong to a new row."""
+    return conn.execute("SELECT 1 FROM change_journal WHERE entity = ? AND entity_id = ? AND op = 'delete' AND seq > ? AND seq < ? LIMIT 1",
+                        (entity, local_id, seq, before if before is not None else 2 ** 62)).fetchone() is not None
+
+
+# --- APPLYING ONE DELTA ---
+
+class DeltaApplier:
+    """Applies one delta inside the caller's transaction; see SyncEngine.apply_delta."""
+
+    def __init__(self, conn: sqlite3.Connection, replica_id: str, peer_id: str, ack: int, start_seq: int,
+                 media_paths: Dict[str, str], db: DatabaseManager):
+        self.conn = conn
+        self.db = db  # Seals and opens log text (encrypted workspaces); rows here always hold plain text
+        self.replica_id = replica_id
+        self.peer_id = peer_id
+        self.ack = ack            # Our journal seqs up to here were known to the peer when it built the delta
+        self.start_seq = start_seq
+        self.media_paths = media_paths
+        self.echoes = EchoRanges(conn)
+        self.pending_refs: Dict[int, str] = {}  # log_id -> content with [ref:] ids not mapped yet
+        self.summary = {"applied": 0, "unchanged": 0, "skipped": 0, "deleted": 0, "conflicts": 0}
+
+    def apply(self, delta: dict, skip_through: int = 0) -> dict:
+        for entity, pairs in delta["id_map"].items():
+            for their_id, our_id in pairs:
+                self._learn_pair(entity, their_id, our_id)
+
+        order = {entity: i for i, entity in enumerate(APPLY_ORDER)}
+        changes = [c for c in delta["changes"] if not (skip_through and c["seq"] <= skip_through)]
+        upserts = sorted((c for c in changes if c["op"] == "upsert"), key=lambda c: order[c["entity"]])
+        deletes = sorted((c for c in changes if c["op"] == "delete"), key=lambda c: -order[c["entity"]])
+        for change in upserts:
+            if change["entity"] in LINK_ENTITIES:
+                self._link(change, insert=True)
+            else:
+                self._upsert(change)
+        for change in deletes:
+            if change["entity"] in LINK_ENTITIES:
+                self._link(change, insert=False)
+            else:
+                self._delete(change)
+
+        # Logs that referenced attachments arriving later in the same delta
+        for log_id, content in self.pending_refs.items():
+            self.conn.execute("UPDATE log SET content = ? WHERE log_id = ?", (self.db.seal_content(self._rewrite_refs(content)[0]), log_id))
+        return self.summary
+
+    # --- id mapping ---
+
+    def _local(self, entity: str, remote_id: Optional[int]) -> Tuple[Optional[int], bool]:
+        """(our id, row still alive) for the peer's id; (None, False) when never seen."""
+        if remote_id is None:
+            return None, False
+        found = self.conn.execute("SELECT local_id, mapped_seq FROM sync_map WHERE peer_id = ? AND entity = ? AND remote_id = ?",
+                                  (self.peer_id, entity, remote_id)).fetchone()
+        if found is None:
+            return None, False
+        return found[0], not _deleted_since(self.conn, entity, found[0], found[1])
+
+    def _live(self, entity: str, remote_id: Optional[int]) -> Optional[int]:
+        local_id, alive = self._local(entity, remote_id)
+        return local_id if alive else None
+
+    def _remember(self, entity: str, remote_id: int, local_id: int):
+        # REPLACE also drops an older pairing of local_id (unique index idx_sync_map_local)
+        self.conn.execute("INSERT OR REPLACE INTO sync_map (peer_id, entity, remote_id, local_id, mapped_seq) VALUES (?, ?, ?, ?, ?)",
+                          (self.peer_id, entity, remote_id, local_id, _journal_head(self.conn)))
+
+    def _learn_pair(self, entity: str, their_id: int, our_id: int):
+        if entity not in ROW_ENTITIES or self._live(entity, their_id) is not None:
+            return
+        if self._row(entity, our_id) is not None:
+            self._remember(entity, their_id, our_id)
+
+    def _row(self, entity: str, local_id: int) -> Optional[dict]:
+        columns = _data_columns(entity)
+        values = self.conn.execute(f"SELECT {', '.join(columns)} FROM {entity} WHERE {_id_column(entity)} = ?", (local_id,)).fetchone()
+        if not values:
+            return None
+        row = dict(zip(columns, values))
+        if entity == "log":
+            row["content"] = self.db.open_content(row["content"])
+        return row
+
+    # --- versions ---
+
+    def _version(self, entity: str, local_id: int) -> Tuple[tuple, Optional[int]]:
+        """(stamp, seq of the local edit or None) of the row's current state, including deletion."""
+        best, best_seq = NO_STAMP, None
+        latest = self.conn.execute("SELECT seq, changed_at FROM change_journal WHERE entity = ? AND entity_id = ? AND seq <= ? ORDER BY seq DESC LIMIT 1",
+                                   (entity, local_id, self.start_seq)).fetchone()
+        if latest and self.echoes.peer_for(latest[0]) is None:
+            best, best_seq = (latest[1], self.replica_id), latest[0]
+        synced = self.conn.execute("SELECT changed_at, replica_id FROM sync_version WHERE entity = ? AND local_id = ?", (entity, local_id)).fetchone()
+        if synced and tuple(synced) > best:
+            best, best_seq = tuple(synced), None
+        return best, best_seq
+
+    def _set_version(self, entity: str, local_id: int, stamp: tuple):
+        self.conn.execute("INSERT OR REPLACE INTO sync_version (entity, local_id, changed_at, replica_id) VALUES (?, ?, ?, ?)",
+                          (entity, local_id, *stamp))
+
+    def _stored(self, entity: str, values: Optional[dict]) -> Optional[dict]:
+        """values as the table stores them (log text sealed in encrypted workspaces)."""
+        if entity != "log" or not values:
+            return values
+        return {**values, "content": self.db.seal_content(values["content"])}
+
+    def _conflict(self, entity, local_id, kept, local_values, remote_values):
+        local_values, remote_values = self._stored(entity, local_values), self._stored(entity, remote_values)
+        self.conn.execute(
+            "INSERT INTO sync_conflict (peer_id, entity, local_id, kept, local_payload, remote_payload, detected_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (self.peer_id, entity, local_id, kept, json.dumps(local_values) if local_values else None,
+             json.dumps(remote_values) if remote_values else None, _now()),
+        )
+        self.summary["conflicts"] += 1
+
+    def _close_conflicts(self, entity, local_id):
+        self.conn.execute("UPDATE sync_conflict SET resolved = 1 WHERE entity = ? AND local_id = ? AND resolved = 0", (entity, local_id))
+
+    # --- rows ---
+
+    def _translate(self, entity: str, row: dict) -> dict:
+        """The peer's row in our terms: mapped foreign keys, local media paths, rewritten [ref:] ids."""
+        # Rows journaled before a column existed (e.g. attachment metadata) don't carry it: keep ours
+        values = {column: row[column] for column in _data_columns(entity) if column in row}
+        for column, target in FOREIGN_KEYS.get(entity, {}).items():
+            values[column] = self._live(target, values[column])
+        media_column = MEDIA_COLUMNS.get(entity)
+        if media_column:
+            media = values[media_column]
+            values[media_column] = self.media_paths.get(media["sha256"]) if media else None
+        return values
+
+    def _rewrite_refs(self, content: str) -> Tuple[str, bool]:
+        """The peer's [ref:ID] as our ids; False when some attachment is not mapped (yet)."""
+        complete = True
+
+        def replace(match):
+            nonlocal complete
+            local_id = self._live("attachment", int(match.group(1)))
+            if local_id is None:
+                complete = False
+                return match.group(0)
+            return f"[ref:{local_id}]"
+
+        return REF_PATTERN.sub(replace, content), complete
+
+    def _same_file(self, path: Optional[str], media: dict) -> bool:
+        return (bool(path) and os.path.exists(path) and media_size(path) == media["size"]
+                and sha256_file(path, self.db.cipher) == media["sha256"])
+
+    def _match(self, entity: str, values: dict, media: Optional[dict]) -> Optional[int]:
+        """An existing row that is evidently the same one (not yet mapped to another of the peer's rows)."""
+        unmapped = (f"NOT EXISTS (SELECT 1 FROM sync_map m WHERE m.peer_id = ? AND m.entity = '{entity}' "
+                    f"AND m.local_id = {entity}.{_id_column(entity)})")
+        if entity == "collection":
+            found = self.conn.execute("SELECT collection_id FROM collection WHERE name = ?", (values["name"],)).fetchone()
+        elif entity == "project":
+            found = self.conn.execute(f"SELECT project_id FROM project WHERE name = ? AND deleted_at IS NULL AND {unmapped} LIMIT 1",
+                                      (values["name"], self.peer_id)).fetchone()
+        elif entity == "log":
+            # Text is compared after opening it: sealed text differs on every write
+            found = None
+            for log_id, content in self.conn.execute(f"SELECT log_id, content FROM log WHERE project_id IS ? AND timestamp IS ? AND deleted_at IS NULL AND {unmapped}",
+                                                     (values["project_id"], values["timestamp"], self.peer_id)):
+                if self.db.open_content(content) == values["content"]:
+                    found = (log_id,)
+                    break
+        else:
+            found = None
+            if media:
+                for attachment_id, path in self.conn.execute(
+                        f"SELECT attachment_id, file_path FROM attachment WHERE project_id IS ? AND log_id IS ? AND deleted_at IS NULL AND {unmapped}",
+                        (values["project_id"], values["log_id"], self.peer_id)):
+                    if path == values["file_path"] or self._same_file(path, media):
+                        found = (attachment_id,)
+                        break
+        return found[0] if found else None
+
+    def _write_row(self, entity: str, local_id: Optional[int], values: dict) -> int:
+        """Inserts (local_id None, or a free id) or updates a row; returns its id."""
+        values = dict(values)
+        if entity == "project":
+            values["due_date_iso"] = to_iso_date(values["due_date"])
+        elif entity == "log":
+            values["content"] = self.db.seal_content(values["content"])
+        id_column = _id_column(entity)
+        if local_id is not None and self.conn.execute(f"SELECT 1 FROM {entity} WHERE {id_column} = ?", (local_id,)).fetchone():
+            assignments = ", ".join(f"{column} = ?" for column in values)
+            self.conn.execute(f"UPDATE {entity} SET {assignments} WHERE {id_column} = ?", (*values.values(), local_id))
+            return local_id
+        columns = list(values) + ([id_column] if local_id is not None else [])
+        params = list(values.values()) + ([local_id] if local_id is not None else [])
+        cursor = self.conn.execute(f"INSERT INTO {entity} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})", params)
+        return local_id if local_id is not None else cursor.lastrowid
+
+    def _upsert(self, change: dict):
+        entity, remote_id, stamp, row = change["entity"], change["id"], tuple(change["stamp"]), change["row"]
+        media = row.get(MEDIA_COLUMNS[entity]) if entity in MEDIA_COLUMNS else None
+        values = self._translate(entity, row)
+        refs_complete = True
+        if entity == "log":
+            if values["project_id"] is None:
+                self.summary["skipped"] += 1  # Its project is gone here
+                return
+            values["content"], refs_complete = self._rewrite_refs(values["content"])
+        if entity == "attachment" and values["file_path"] is None:
+            values.pop("file_path")  # The peer has no file for it: keep ours
+
+        local_id, alive = self._local(entity, remote_id)
+        if local_id is None:
+            local_id = self._match(entity, values, media)
+            alive = local_id is not None
+            if alive:
+                self._remember(entity, remote_id, local_id)
+        current = self._row(entity, local_id) if alive else None
+        if current is not None and media and self._same_file(current[MEDIA_COLUMNS[entity]], media):
+            values[MEDIA_COLUMNS[entity]] = current[MEDIA_COLUMNS[entity]]  # Same bytes under another name
+        if current is not None and all(current[column] == value for column, value in values.items()):
+            self.summary["unchanged"] += 1
+            return
+
+        if local_id is not None:
+            # We have (or deleted) our own version of this row: the newest edit wins
+            local_stamp, local_seq = self._version(entity, local_id)
+            concurrent = local_seq is not None and local_seq > self.ack
+            if stamp <= local_stamp:
+                if concurrent:
+                    self._conflict(entity, local_id, "local", current, values)
+                self.summary["skipped"] += 1
+                return
+            if concurrent:
+                self._conflict(entity, local_id, "remote", current, values)
+            else:
+                self._close_conflicts(entity, local_id)  # Someone settled it (e.g. resolved on the peer)
+
+        if current is None:
+            if entity == "attachment" and "file_path" not in values:
+                self.summary["skipped"] += 1
+                return
+            # Re-create a row deleted here under its old id while that is free, else insert a new one
+            target = local_id if local_id is not None and self._row(entity, local_id) is None else None
+            local_id = self._write_row(entity, target, values)
+            self._remember(entity, remote_id, local_id)
+        else:
+            self._write_row(entity, local_id, values)
+        self._set_version(entity, local_id, stamp)
+        if not refs_complete:
+            self.pending_refs[local_id] = values["content"]
+        self.summary["applied"] += 1
+
+    def _delete(self, change: dict):
+        entity, stamp = change["entity"], tuple(change["stamp"])
+        local_id = self._live(entity, change["id"])
+        current = self._row(entity, local_id) if local_id is not None else None
+        if current is None:
+            self.summary["unchanged"] += 1
+            return
+        local_stamp, local_seq = self._version(entity, local_id)
+        concurrent = local_seq is not None and local_seq > self.ack
+        orphans = entity == "project" and self.conn.execute("SELECT 1 FROM log WHERE project_id = ? AND deleted_at IS NULL LIMIT 1", (local_id,)).fetchone()
+        if stamp <= local_stamp or orphans:
+            # Edited here after the peer deleted it, or it gained logs the peer never saw: keep it
+            if concurrent or orphans:
+                self._conflict(entity, local_id, "local", current, None)
+            self.summary["skipped"] += 1
+            return
+        if concurrent:
+            self._conflict(entity, local_id, "remote", current, None)
+        id_column = _id_column(entity)
+        self.conn.execute(f"DELETE FROM {entity} WHERE {id_column} = ?", (local_id,))
+        for link, keys in LINK_ENTITIES.items():
+            for column, target in keys:
+                if target == entity:
+                    self.conn.execute(f"DELETE FROM {link} WHERE {column} = ?", (local_id,))
+        self.conn.execute("DELETE FROM sync_version WHERE entity = ? AND local_id = ?", (entity, local_id))
+        self.summary["deleted"] += 1
+
+    def _link(self, change: dict, insert: bool):
+        entity, row = change["entity"], change["row"]
+        (first_column, first_target), (second_column, second_target) = LINK_ENTITIES[entity]
+        first, second = self._live(first_target, row[first_column]), self._live(second_target, row[second_column])
+        if first is None or second is None:
+            self.summary["skipped"] += 1
+            return
+        if insert:
+            cursor = self.conn.execute(f"INSERT OR IGNORE INTO {entity} ({first_column}, {second_column}) VALUES (?, ?)", (first, second))
+        else:
+            cursor = self.conn.execute(f"DELETE FROM {entity} WHERE {first_column} = ? AND {second_column} = ?", (first, second))
+        self.summary["applied" if cursor.rowcount else "unchanged"] += 1
+
+
+# --- SOCKET PROTOCOL ---
+
+class SyncSession:
+    """
+    One exchange over a connected socket. Messages are JSON lines; media follows its
+    {"blob": sha, "size": n} header as n raw bytes.
+
+        initiator -> hello            responder -> hello + cursor it has for us
+        initiator -> delta            responder -> want (missing media)   initiator -> blobs
+        responder -> delta            initiator -> want                   responder -> blobs
+    """
+
+    def __init__(self, engine: SyncEngine, sock: socket.socket, token: Optional[str]):
+        self.engine = engine
+        self.token = token or ""
+        self.rfile = sock.makefile("rb")
+        self.wfile = sock.makefile("wb")
+
+    def _send(self, message: dict):
+        self.wfile.write(json.dumps(message, ensure_ascii=False).encode("utf-8") + b"\n")
+        self.wfile.flush()
+
+    def _receive(self) -> dict:
+        line = self.rfile.readline(MAX_MESSAGE_BYTES)
+        if not line:
+            raise SyncError("The peer closed the connection.")
+        message = json.loads(line)
+        if "error" in message:
+            raise SyncError(f"Peer refused: {message['error']}")
+        return message
+
+    def _hello(self, **extra) -> dict:
+        return {"format": SYNC_FORMAT, "version": SYNC_VERSION, "replica_id": self.engine.replica_id,
+                "name": self.engine.name, "token": self.token, **extra}
+
+    def _received_from(self, peer_id: str) -> Optional[int]:
+        known = [p for p in self.engine.peers() if p["peer_id"] == peer_id]
+        return known[0]["received"] if known else None
+
+    def _push(self, peer_id: str, since: Optional[int]):
+        delta, media = self.engine.build_delta(peer_id, since=since, full=since is None)
+        self._send({"delta": delta})
+        for sha in self._receive()["want"]:
+            path = media[sha]
+            self._send({"blob": sha, "size": media_size(path)})
+            with open_media(path, self.engine.db.cipher) as f:
+                shutil.copyfileobj(f, self.wfile, CHUNK_SIZE)
+            self.wfile.flush()
+
+    def _pull(self) -> Tuple[dict, dict]:
+        delta = self._receive()["delta"]
+        self._send({"want": self.engine.missing_media(delta)})
+
+        def fetch(sha, dst):
+            header = self._receive()
+            if header.get("blob") != sha:
+                raise SyncError("Media arrived out of order.")
+            remaining = header["size"]
+            while remaining:
+                chunk = self.rfile.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    raise SyncError("The peer closed the connection mid-file.")
+                dst.write(chunk)
+                remaining -= len(chunk)
+
+        return delta, self.engine.apply_delta(delta, self.engine.receive_media(delta, fetch))
+
+    def initiate(self) -> dict:
+        self._send(self._hello())
+        hello = self._receive()
+        self._push(hello["replica_id"], hello["received"])
+        _delta, summary = self._pull()
+        return summary
+
+    def respond(self) -> dict:
+        hello = self._receive()
+        if hello.get("format") != SYNC_FORMAT or not hmac.compare_digest(hello.get("token", ""), self.token):
+            self._send({"error": "bad token or not a ProMan sync client"})
+            raise SyncError("Refused a client with a bad token.")
+        self._send(self._hello(received=self._received_from(hello["replica_id"])))
+        delta, summary = self._pull()
+        # delta["ack"] is how far the initiator has our changes (None: never synced with us)
+        self._push(hello["replica_id"], delta["ack"] if delta["ack"] is not None else None)
+        return summary
+
+
+# --- COMMAND LINE ---
+
+def main():
+    from workspaces import WorkspaceConfig
+
+    parser = argparse.ArgumentParser(description="Sync two ProMan databases.")
+    parser.add_argument("--workspace", default=None, help="Workspace from proman.json (default: the active one)")
+    parser.add_argument("--name", default=None, help="How this database introduces itself to peers (default: host name)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("status", help="Show this database's sync id, peers and open conflicts")
+    export = commands.add_parser("export", help="Write a bundle of changes for a peer")
+    export.add_argument("bundle")
+    export.add_argument("--to", default=None, help="Peer name or id (omit for a full snapshot)")
+    export.add_argument("--full", action="store_true", help="Send everything, not just what the peer lacks")
+    imp = commands.add_parser("import", help="Apply a bundle from a peer")
+    imp.add_argument("bundle")
+    serve = commands.add_parser("serve", help="Wait for peers to connect and sync")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=DEFAULT_SYNC_PORT)
+    serve.add_argument("--token", default=os.environ.get("PROMAN_SYNC_TOKEN"))
+    serve.add_argument("--once", action="store_true", help="Exit after one session")
+    connect = commands.add_parser("connect", help="Sync with a serving peer (HOST or HOST:PORT)")
+    connect.add_argument("address")
+    connect.add_argument("--token", default=os.environ.get("PROMAN_SYNC_TOKEN"))
+    commands.add_parser("conflicts", help="List unresolved conflicts")
+    resolve = commands.add_parser("resolve", help="Resolve a conflict")
+    resolve.add_argument("conflict_id", type=int)
+    resolve.add_argument("keep", choices=["local", "remote"])
+    commands.add_parser("new-identity", help="Give a copied database its own sync id")
+    args = parser.parse_args()
+
+    workspace = WorkspaceConfig().get(args.workspace)
+    engine = SyncEngine(DatabaseManager(db_path=workspace.db_path), workspace.media_dir, args.name)
+    try:
+        if args.command == "status":
+            print(f"{engine.name} ({engine.replica_id})")
+            for peer in engine.peers():
+                print(f"  {peer['name']:<20} {peer['peer_id'][:8]}  sent through {peer['acked']}, "
+                      f"received through {peer['received']}, last sync {peer['last_sync']}")
+            print(f"{len(engine.conflicts())} unresolved conflict(s)")
+        elif args.command == "export":
+            print(engine.export_bundle(args.bundle, args.to, args.full))
+        elif args.command == "import":
+            print(engine.import_bundle(args.bundle))
+        elif args.command == "serve":
+            engine.serve(args.host, args.port, args.token, args.once)
+        elif args.command == "connect":
+            host, _, port = args.address.rpartition(":") if ":" in args.address else (args.address, "", "")
+            print(engine.sync_with(host, int(port or DEFAULT_SYNC_PORT), args.token))
+        elif args.command == "conflicts":
+            for c in engine.conflicts():
+                print(f"#{c['conflict_id']} {c['entity']} {c['local_id']} kept {c['kept']} ({c['detected_at']})")
+                print(f"    local:  {c['local']}\n    remote: {c['remote']}")
+        elif args.command == "resolve":
+            engine.resolve_conflict(args.conflict_id, args.keep)
+        elif args.command == "new-identity":
+            engine.new_identity()
+            print(f"New sync id: {engine.replica_id}")
+    except SyncError as e:
+        print(f"Sync failed: {e}")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
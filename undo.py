@@ -0,0 +1,245 @@
+# --- undo.py ---
+"""
+Undo/redo for the destructive actions: deleting a project, a day of logs or
+attachments. Each is a command whose execute() tombstones the rows (see
+TOMBSTONED_TABLES in db_controller) under one trash batch and whose undo()
+restores that batch, so neither copies rows nor touches media files. Redo
+simply executes the command again.
+
+The stack is bounded; a command that falls off it can no longer be undone,
+and its batch becomes eligible for the purge job. PurgeJob hard-deletes
+tombstones older than a grace period (skipping batches still on the stack)
+a few hundred rows at a time on a daemon thread, then removes media files
+no row refers to any more.
+
+    python undo.py [--workspace NAME] trash
+    python undo.py [--workspace NAME] restore BATCH_ID
+    python undo.py [--workspace NAME] purge [--grace-minutes 0]
+"""
+
+import argparse
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Iterable, List, Optional
+
+from db_controller import DatabaseManager, PURGE_BATCH
+
+DEFAULT_UNDO_LIMIT = 50
+PURGE_GRACE_S = 10 * 60  # Tombstones younger than this stay, even off the stack (another window may undo)
+PURGE_INTERVAL_S = 5 * 60
+
+
+class Command:
+    """A reversible change. execute() may run again after undo() (that is redo)."""
+    label = ""
+
+    def execute(self, db: DatabaseManager):
+        raise NotImplementedError
+
+    def undo(self, db: DatabaseManager):
+        raise NotImplementedError
+
+
+class _TrashCommand(Command):
+    """Commands that move rows to the trash: undo restores the batch execute() created."""
+
+    def __init__(self):
+        self.batch_id: Optional[int] = None
+
+    def _tombstone(self, db: DatabaseManager) -> int:
+        raise NotImplementedError
+
+    def execute(self, db: DatabaseManager):
+        self.batch_id = self._tombstone(db)
+
+    def undo(self, db: DatabaseManager):
+        if self.batch_id is not None:
+            db.restore_batch(self.batch_id)
+            self.batch_id = None
+
+
+class DeleteProjectCommand(_TrashCommand):
+    def __init__(self, project_id: int, name: str = ""):
+        super().__init__()
+        self.project_id = project_id
+        self.label = f"Delete project '{name or project_id}'"
+
+    def _tombstone(self, db):
+        return db.delete_project(self.project_id, self.label)
+
+
+class DeleteLogsCommand(_TrashCommand):
+    def __init__(self, project_id: int, date_str: str):
+        super().__init__()
+        self.project_id = project_id
+        self.date_str = date_str
+        self.label = f"Delete logs of {date_str}"
+
+    def _tombstone(self, db):
+        return db.delete_logs_for_date(self.project_id, self.date_str, self.label)
+
+
+class DeleteAttachmentsCommand(_TrashCommand):
+    def __init__(self, attachment_ids: Iterable[int]):
+        super().__init__()
+        self.attachment_ids = list(attachment_ids)
+        self.label = f"Delete {len(self.attachment_ids)} attachment(s)" if len(self.attachment_ids) != 1 else "Delete attachment"
+
+    def _tombstone(self, db):
+        return db.delete_attachments(self.attachment_ids, self.label)
+
+
+class UndoStack:
+    def __init__(self, limit: int = DEFAULT_UNDO_LIMIT):
+        self.limit = limit
+        self.done: List[Command] = []
+        self.undone: List[Command] = []
+        self.lock = threading.Lock()  # The purge thread reads protected_batches()
+
+    def run(self, command: Command, db: DatabaseManager):
+        """Executes command and makes it the next one to undo; a new action clears the redo side."""
+        command.execute(db)
+        with self.lock:
+            self.done.append(command)
+            del self.done[:-self.limit]
+            self.undone.clear()
+
+    def undo(self, db: DatabaseManager) -> Optional[Command]:
+        with self.lock:
+            if not self.done:
+                return None
+            command = self.done.pop()
+        command.undo(db)
+        with self.lock:
+            self.undone.append(command)
+        return command
+
+    def redo(self, db: DatabaseManager) -> Optional[Command]:
+        with self.lock:
+            if not self.undone:
+                return None
+            command = self.undone.pop()
+        command.execute(db)
+        with self.lock:
+            self.done.append(command)
+        return command
+
+    def undo_label(self) -> Optional[str]:
+        with self.lock:
+            return self.done[-1].label if self.done else None
+
+    def redo_label(self) -> Optional[str]:
+        with self.lock:
+            return self.undone[-1].label if self.undone else None
+
+    def protected_batches(self) -> List[int]:
+        """Trash batches an undo can still restore; the purge job leaves them alone."""
+        with self.lock:
+            return [c.batch_id for c in self.done if getattr(c, "batch_id", None) is not None]
+
+    def clear(self):
+        with self.lock:
+            self.done.clear()
+            self.undone.clear()
+
+
+def _utc_iso(moment: datetime) -> str:
+    """Same shape as the tombstones' strftime('%Y-%m-%dT%H:%M:%fZ'), so they compare as text."""
+    return moment.strftime("%Y-%m-%dT%H:%M:%S.") + f"{moment.microsecond // 1000:03d}Z"
+
+
+class PurgeJob:
+    def __init__(self, db: DatabaseManager, media_dir: str, protected_batches: Callable[[], Iterable[int]] = lambda: (),
+                 grace_s: float = PURGE_GRACE_S, interval_s: float = PURGE_INTERVAL_S, batch_size: int = PURGE_BATCH):
+        self.db = db
+        self.media_dir = os.path.abspath(media_dir)
+        self.protected_batches = protected_batches
+        self.grace_s = grace_s
+        self.interval_s = interval_s
+        self.batch_size = batch_size
+        self._thread = None
+        self._wake = threading.Event()
+        self._stopped = False
+
+    def run_once(self) -> dict:
+        """Purges everything eligible, batch by batch; returns the totals."""
+        cutoff = _utc_iso(datetime.now(timezone.utc) - timedelta(seconds=self.grace_s))
+        totals = {"attachments": 0, "logs": 0, "projects": 0, "files": 0}
+        with self.db.instrumentation.timer("db", "purge_trash"):
+            while not self._stopped:
+                result = self.db.purge_trash(cutoff, self.protected_batches(), self.batch_size)
+                totals["files"] += self._remove_files(result.pop("files"))
+                for key, count in result.items():
+                    totals[key] += count
+                if not any(result.values()):
+                    break
+        return totals
+
+    def _remove_files(self, paths: List[str]) -> int:
+        """Deletes files the purged rows left unused, but only inside this workspace's media folder."""
+        removed = 0
+        for path in paths:
+            full = os.path.abspath(path)
+            if os.path.commonpath([full, self.media_dir]) != self.media_dir:
+                continue
+            try:
+                os.remove(full)
+                removed += 1
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                self.db.instrumentation.record_error("purge", f"{e} | {full}")
+        return removed
+
+    def start(self):
+        self._stopped = False
+        self._thread = threading.Thread(target=self._thread_loop, daemon=True, name="proman-purge")
+        self._thread.start()
+
+    def stop(self):
+        self._stopped = True
+        self._wake.set()
+
+    def _thread_loop(self):
+        while not self._stopped:
+            try:
+                totals = self.run_once()
+                if any(totals.values()):
+                    print(f"Trash purged: {totals['projects']} project(s), {totals['logs']} log(s), "
+                          f"{totals['attachments']} attachment(s), {totals['files']} file(s)")
+            except Exception as e:
+                print(f"Trash purge failed: {e}")
+                self.db.instrumentation.record_error("purge", str(e))
+            self._wake.wait(self.interval_s)
+            self._wake.clear()
+
+
+def main():
+    from workspaces import WorkspaceConfig
+
+    parser = argparse.ArgumentParser(description="Inspect, restore or purge deleted items.")
+    parser.add_argument("--workspace", default=None, help="Workspace from proman.json (default: the active one)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("trash", help="List deletions that can still be restored")
+    restore = commands.add_parser("restore", help="Restore one deletion")
+    restore.add_argument("batch_id", type=int)
+    purge = commands.add_parser("purge", help="Delete trashed rows and their files for good")
+    purge.add_argument("--grace-minutes", type=float, default=PURGE_GRACE_S / 60, help="Keep deletions younger than this")
+    args = parser.parse_args()
+
+    workspace = WorkspaceConfig().get(args.workspace)
+    db = DatabaseManager(db_path=workspace.db_path)
+    if args.command == "trash":
+        for batch_id, label, created_at in db.get_trash_batches():
+            print(f"{batch_id:>6}  {created_at}  {label}")
+    elif args.command == "restore":
+        print(f"Restored {db.restore_batch(args.batch_id)} row(s)")
+    elif args.command == "purge":
+        totals = PurgeJob(db, workspace.media_dir, grace_s=args.grace_minutes * 60).run_once()
+        print(f"Purged {totals['projects']} project(s), {totals['logs']} log(s), {totals['attachments']} attachment(s), "
+              f"{totals['files']} file(s)")
+
+
+if __name__ == "__main__":
+    main()
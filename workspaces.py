@@ -0,0 +1,182 @@
+# --- workspaces.py ---
+"""
+Workspaces: named (database, media folder) pairs, so large datasets can be
+split across several databases and disks and switched between at runtime.
+
+Configuration lives in proman.json next to the application (or the file
+named by PROMAN_CONFIG):
+
+    {
+        "active": "default",
+        "workspaces": {
+            "default": {"db_path": "projects.db", "media_dir": "media"},
+            "archive": {"db_path": "D:/proman/archive.db", "media_dir": "D:/proman/media"}
+        }
+    }
+
+Relative paths are resolved against the config file's folder, never the
+working directory. Environment overrides:
+    PROMAN_CONFIG     - config file location
+    PROMAN_WORKSPACE  - workspace to open at startup
+    PROMAN_DB         - database path for the active workspace
+    PROMAN_MEDIA      - media folder for the active workspace
+
+Optional top-level settings: "max_image_pixels" sets the image decode limit
+(PROMAN_MAX_IMAGE_PIXELS takes precedence) and "api_port" starts the local
+JSON API with the GUI (PROMAN_API_PORT takes precedence).
+
+A workspace is encrypted when a key file sits next to its database (see
+encryption.py); nothing about that is stored here.
+"""
+
+import json
+import os
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+from db_controller import DatabaseManager
+from encryption import WorkspaceLockedError, WrongPassphraseError, cipher_for, is_encrypted, unlock
+from instrumentation import Instrumentation
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+CONFIG_FILENAME = "proman.json"
+DEFAULT_WORKSPACE = "default"
+
+
+def app_path(*parts: str) -> str:
+    """Absolute path of a file shipped next to the application (icons etc.)."""
+    return os.path.join(APP_DIR, *parts)
+
+
+@dataclass(slots=True)
+class Workspace:
+    name: str
+    db_path: str
+    media_dir: str
+
+
+class WorkspaceConfig:
+    def __init__(self, path: Optional[str] = None):
+        self.path = os.path.abspath(path or os.environ.get("PROMAN_CONFIG") or app_path(CONFIG_FILENAME))
+        self.base_dir = os.path.dirname(self.path)
+        self.active = DEFAULT_WORKSPACE
+        self.max_image_pixels: Optional[int] = None
+        self.api_port: Optional[int] = None
+        self.workspaces: Dict[str, Workspace] = {}
+        self._configured: Dict[str, Workspace] = {}  # Paths as in the file, before env overrides
+        self._load()
+
+    def _resolve(self, path: str) -> str:
+        return os.path.normpath(os.path.join(self.base_dir, os.path.expanduser(path)))
+
+    def _load(self):
+        data = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Config error in {self.path}: {e}. Falling back to defaults.")
+
+        self.max_image_pixels = data.get("max_image_pixels")
+        self._configured_api_port = data.get("api_port")
+        self.api_port = int(os.environ.get("PROMAN_API_PORT") or data.get("api_port") or 0) or None
+        for name, entry in data.get("workspaces", {}).items():
+            self.workspaces[name] = Workspace(name, self._resolve(entry["db_path"]), self._resolve(entry.get("media_dir", "media")))
+        if not self.workspaces:
+            self.workspaces[DEFAULT_WORKSPACE] = Workspace(DEFAULT_WORKSPACE, self._resolve("projects.db"), self._resolve("media"))
+
+        self.active = os.environ.get("PROMAN_WORKSPACE") or data.get("active") or next(iter(self.workspaces))
+        if self.active not in self.workspaces:
+            print(f"Unknown workspace '{self.active}', using '{next(iter(self.workspaces))}'.")
+            self.active = next(iter(self.workspaces))
+
+        # Environment overrides apply to the startup workspace only and are never saved
+        active = self.workspaces[self.active]
+        self._configured[active.name] = Workspace(active.name, active.db_path, active.media_dir)
+        if os.environ.get("PROMAN_DB"):
+            active.db_path = os.path.abspath(os.environ["PROMAN_DB"])
+        if os.environ.get("PROMAN_MEDIA"):
+            active.media_dir = os.path.abspath(os.environ["PROMAN_MEDIA"])
+
+    def names(self) -> List[str]:
+        return list(self.workspaces)
+
+    def get(self, name: Optional[str] = None) -> Workspace:
+        return self.workspaces[name or self.active]
+
+    def add(self, name: str, db_path: str, media_dir: str) -> Workspace:
+        if name in self.workspaces:
+            raise ValueError(f"Workspace '{name}' already exists.")
+        workspace = Workspace(name, self._resolve(db_path), self._resolve(media_dir))
+        self.workspaces[name] = workspace
+        return workspace
+
+    def save(self):
+        """Writes the config (atomically). Paths inside the config folder are stored relative to it."""
+        def portable(path):
+            relative = os.path.relpath(path, self.base_dir)
+            return path if relative.startswith("..") else relative.replace(os.sep, "/")
+
+        data = {
+            "active": self.active,
+            **({"max_image_pixels": self.max_image_pixels} if self.max_image_pixels else {}),
+            **({"api_port": self._configured_api_port} if self._configured_api_port else {}),
+            "workspaces": {w.name: {"db_path": portable(w.db_path), "media_dir": portable(w.media_dir)} for w in (self._configured.get(n, w) for n, w in self.workspaces.items())},
+        }
+        os.makedirs(self.base_dir, exist_ok=True)
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=4)
+        os.replace(temp_path, self.path)
+
+
+class WorkspaceManager:
+    """Opens each workspace's DatabaseManager once and keeps it, so switching back is instant."""
+
+    def __init__(self, config: WorkspaceConfig, cache_size: int = 0, instrumentation: Optional[Instrumentation] = None,
+                 ask_passphrase: Optional[Callable[[str, bool], Optional[str]]] = None):
+        self.config = config
+        self.cache_size = cache_size
+        # One sink for all workspaces so the debug panel keeps working across switches
+        self.instrumentation = instrumentation or Instrumentation()
+        self.open_databases: Dict[str, DatabaseManager] = {}
+        # (workspace name, previous attempt was wrong) -> passphrase, or None to give up; None: never ask
+        self.ask_passphrase = ask_passphrase
+
+    def open(self, name: Optional[str] = None) -> DatabaseManager:
+        """Returns the workspace's DatabaseManager (own db file and own cache), creating it on first use."""
+        workspace = self.config.get(name)
+        if workspace.name not in self.open_databases:
+            db_dir = os.path.dirname(workspace.db_path)
+            if db_dir:
+                os.makedirs(db_dir, exist_ok=True)
+            os.makedirs(workspace.media_dir, exist_ok=True)
+            self._unlock(workspace)
+            self.open_databases[workspace.name] = DatabaseManager(
+                db_path=workspace.db_path, cache_size=self.cache_size, instrumentation=self.instrumentation
+            )
+        return self.open_databases[workspace.name]
+
+    def _unlock(self, workspace: Workspace):
+        """Asks for the passphrase of an encrypted workspace that is not unlocked in this process yet."""
+        if self.ask_passphrase is None or not is_encrypted(workspace.db_path):
+            return
+        try:
+            if cipher_for(workspace.db_path) is not None:
+                return
+        except WrongPassphraseError:
+            pass  # A stale PROMAN_PASSPHRASE: ask instead
+        wrong = False
+        while True:
+            passphrase = self.ask_passphrase(workspace.name, wrong)
+            if passphrase is None:
+                raise WorkspaceLockedError(f"Workspace '{workspace.name}' is encrypted and was not unlocked.")
+            try:
+                unlock(workspace.db_path, passphrase)
+                return
+            except WrongPassphraseError:
+                wrong = True
+
+    def all_open(self) -> List[DatabaseManager]:
+        return list(self.open_databases.values())